@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+Cálculo vetorizado (NumPy) dos pontos de ancoragem do texto
+
+Em vez de chamar geom.centroid() feature a feature, as geometrias de um
+bloco inteiro são lidas do WKB para arrays NumPy e os pontos de ancoragem
+são calculados de uma vez:
+
+- centroid: centroide (área para polígonos, comprimento para linhas,
+  média para multipontos), igual ao QgsGeometry.centroid();
+- point_on_surface: ponto garantidamente sobre a geometria (centroide do
+  polígono quando ele cai dentro; senão o meio da maior corda horizontal;
+  meio do comprimento para linhas);
+- line_midpoint: ponto na metade do comprimento das linhas (centroide
+  para polígonos).
+
+Geometrias curvas, coleções e WKB inválido não são tratados aqui: elas
+voltam marcadas como inválidas e o chamador usa o caminho do QGIS.
+"""
+
+import struct
+
+import numpy as np
+
+ANCHORS = ["centroid", "point_on_surface", "line_midpoint"]
+
+# Tipo de cada parte/feature
+KIND_NONE = -1
+KIND_POINT = 0
+KIND_LINE = 1
+KIND_POLYGON = 2
+
+# Tipos WKB básicos (sem Z/M) suportados e o tipo de feature correspondente
+WKB_KINDS = {1: KIND_POINT, 2: KIND_LINE, 3: KIND_POLYGON, 4: KIND_POINT, 5: KIND_LINE, 6: KIND_POLYGON}
+
+# Flags do EWKB
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+
+class WKBChunk:
+    """Vértices de um bloco de geometrias, em arrays planos
+
+    coords: (V, 2) com x, y de todos os vértices
+    part_offsets: (P + 1) início de cada parte (ponto, linha ou anel) em coords
+    part_feature: (P) índice da feature dona de cada parte
+    part_hole: (P) True para anéis internos de polígonos
+    feature_kind: (N) KIND_* de cada feature (KIND_NONE se não suportada)
+    """
+
+    def __init__(self, coords, part_offsets, part_feature, part_hole, feature_kind):
+        self.coords = coords
+        self.part_offsets = part_offsets
+        self.part_feature = part_feature
+        self.part_hole = part_hole
+        self.feature_kind = feature_kind
+
+
+def _read_parts(wkb, offset, base, feature, parts):
+    """Lê uma geometria WKB a partir de offset e registra suas partes
+
+    Cada parte é (posição do 1º vértice em wkb, nº de vértices, doubles por
+    vértice, big endian, feature, é buraco). Retorna (offset final, kind).
+    """
+    big_endian = wkb[offset] == 0
+    endian = ">" if big_endian else "<"
+    (wkb_type,) = struct.unpack_from(endian + "I", wkb, offset + 1)
+    offset += 5
+
+    if wkb_type & EWKB_SRID:
+        offset += 4
+    stride = 2 + bool(wkb_type & EWKB_Z) + bool(wkb_type & EWKB_M)
+    wkb_type &= 0x0FFFFFFF
+
+    # WKB ISO: 1000 = Z, 2000 = M, 3000 = ZM
+    dimension = wkb_type // 1000
+    stride += (dimension in (1, 3)) + (dimension in (2, 3))
+    wkb_type %= 1000
+
+    kind = WKB_KINDS.get(wkb_type)
+    if kind is None:
+        raise ValueError(f"Tipo WKB não suportado: {wkb_type}")
+
+    if wkb_type == 1:
+        # Ponto vazio é gravado como NaN
+        (x,) = struct.unpack_from(endian + "d", wkb, offset)
+        if x == x:
+            parts.append((base + offset, 1, stride, big_endian, feature, False))
+        return offset + 8 * stride, kind
+
+    if wkb_type == 2:
+        (count,) = struct.unpack_from(endian + "I", wkb, offset)
+        parts.append((base + offset + 4, count, stride, big_endian, feature, False))
+        return offset + 4 + 8 * stride * count, kind
+
+    if wkb_type == 3:
+        (rings,) = struct.unpack_from(endian + "I", wkb, offset)
+        offset += 4
+        for ring in range(rings):
+            (count,) = struct.unpack_from(endian + "I", wkb, offset)
+            parts.append((base + offset + 4, count, stride, big_endian, feature, ring > 0))
+            offset += 4 + 8 * stride * count
+        return offset, kind
+
+    # Multi*: cada membro é uma geometria WKB completa
+    (members,) = struct.unpack_from(endian + "I", wkb, offset)
+    offset += 4
+    for _ in range(members):
+        offset, _member_kind = _read_parts(wkb, offset, base, feature, parts)
+    return offset, kind
+
+
+def parse_wkb(wkbs):
+    """Converte uma lista de geometrias WKB (bytes) em um WKBChunk"""
+    feature_kind = np.full(len(wkbs), KIND_NONE, dtype=np.int8)
+    parts = []
+    base = 0
+
+    for feature, wkb in enumerate(wkbs):
+        if wkb:
+            first_part = len(parts)
+            try:
+                _end, kind = _read_parts(wkb, 0, base, feature, parts)
+                feature_kind[feature] = kind
+            except (ValueError, struct.error, IndexError):
+                del parts[first_part:]
+        base += len(wkb)
+
+    if not parts:
+        return WKBChunk(np.empty((0, 2)), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64),
+                        np.empty(0, dtype=bool), feature_kind)
+
+    starts, counts, strides, big_endian, part_feature, part_hole = (np.array(column) for column in zip(*parts))
+    counts = counts.astype(np.int64)
+    part_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=part_offsets[1:])
+    total = int(part_offsets[-1])
+
+    # Posição (em bytes) do x de cada vértice: início da parte + i * stride * 8
+    vertex_part = np.repeat(np.arange(len(counts)), counts)
+    index_in_part = np.arange(total, dtype=np.int64) - part_offsets[vertex_part]
+    vertex_start = starts.astype(np.int64)[vertex_part] + index_in_part * strides[vertex_part] * 8
+
+    # Ler x, y de todos os vértices de uma vez. Os doubles do WKB não são
+    # alinhados: agrupa-se os vértices pelo deslocamento (posição % 8) e
+    # cada grupo é lido de uma visão float64 do buffer com esse deslocamento.
+    blob = b"".join(wkbs)
+    vertex_big_endian = big_endian[vertex_part]
+    shift = vertex_start % 8
+    coords = np.empty((total, 2))
+    for offset in range(8):
+        for big in (False, True):
+            selected = (shift == offset) & (vertex_big_endian == big)
+            if not selected.any():
+                continue
+            words = np.frombuffer(blob, dtype=">f8" if big else "<f8", offset=offset, count=(len(blob) - offset) // 8)
+            index = (vertex_start[selected] - offset) // 8
+            coords[selected, 0] = words[index]
+            coords[selected, 1] = words[index + 1]
+
+    return WKBChunk(coords, part_offsets, part_feature.astype(np.int64), part_hole.astype(bool), feature_kind)
+
+
+def _segments(chunk):
+    """Segmentos (pares de vértices consecutivos na mesma parte)"""
+    coords = chunk.coords
+    vertex_count = len(coords)
+    counts = np.diff(chunk.part_offsets)
+    vertex_part = np.repeat(np.arange(len(counts)), counts)
+
+    if vertex_count < 2:
+        empty = np.empty(0)
+        return empty, empty, empty, empty, np.empty(0, dtype=np.int64)
+
+    is_last = np.zeros(vertex_count, dtype=bool)
+    is_last[chunk.part_offsets[1:][counts > 0] - 1] = True
+    mask = ~is_last[:-1]
+
+    x0 = coords[:-1, 0][mask]
+    y0 = coords[:-1, 1][mask]
+    x1 = coords[1:, 0][mask]
+    y1 = coords[1:, 1][mask]
+    return x0, y0, x1, y1, vertex_part[:-1][mask]
+
+
+def _sum_by(index, weights, size):
+    """Soma weights agrupando por index"""
+    return np.bincount(index, weights=weights, minlength=size)
+
+
+def _line_midpoints(x0, y0, x1, y1, seg_feature, length, size):
+    """Ponto na metade do comprimento de cada feature (NaN se não tiver segmentos)"""
+    mid_x = np.full(size, np.nan)
+    mid_y = np.full(size, np.nan)
+    if len(length) == 0:
+        return mid_x, mid_y
+
+    total = _sum_by(seg_feature, length, size)
+    first = np.searchsorted(seg_feature, np.arange(size), side="left")
+    last = np.searchsorted(seg_feature, np.arange(size), side="right") - 1
+    has_segments = last >= first
+
+    cumulative = np.cumsum(length)
+    features = np.nonzero(has_segments)[0]
+    start = cumulative[first[features]] - length[first[features]]
+    target = start + total[features] / 2.0
+
+    seg = np.searchsorted(cumulative, target, side="left")
+    seg = np.clip(seg, first[features], last[features])
+    seg_length = length[seg]
+    t = np.where(seg_length > 0, (target - (cumulative[seg] - seg_length)) / np.where(seg_length > 0, seg_length, 1.0), 0.0)
+    t = np.clip(t, 0.0, 1.0)
+
+    mid_x[features] = x0[seg] + t * (x1[seg] - x0[seg])
+    mid_y[features] = y0[seg] + t * (y1[seg] - y0[seg])
+    return mid_x, mid_y
+
+
+def _inside_polygons(px, py, x0, y0, x1, y1, seg_feature, size):
+    """Regra par-ímpar: o ponto de cada feature está dentro do seu polígono?"""
+    qx = px[seg_feature]
+    qy = py[seg_feature]
+    crosses_y = (y0 > qy) != (y1 > qy)
+    dy = np.where(crosses_y, y1 - y0, 1.0)
+    x_cross = x0 + (qy - y0) * (x1 - x0) / dy
+    crossing = crosses_y & (qx < x_cross)
+    return (np.bincount(seg_feature, weights=crossing, minlength=size) % 2) == 1
+
+
+def _scanline_point(x0, y0, x1, y1):
+    """Meio da maior corda horizontal na altura média do polígono"""
+    scan_y = (min(y0.min(), y1.min()) + max(y0.max(), y1.max())) / 2.0
+    crosses = (y0 > scan_y) != (y1 > scan_y)
+    if not crosses.any():
+        return np.nan, np.nan
+
+    xs = x0[crosses] + (scan_y - y0[crosses]) * (x1[crosses] - x0[crosses]) / (y1[crosses] - y0[crosses])
+    xs.sort()
+    widths = xs[1::2] - xs[0::2][:len(xs) // 2]
+    if len(widths) == 0:
+        return np.nan, np.nan
+    best = int(np.argmax(widths))
+    return (xs[2 * best] + xs[2 * best + 1]) / 2.0, scan_y
+
+
+def anchor_points(chunk, anchor="centroid"):
+    """Calcula o ponto de ancoragem de cada feature do WKBChunk
+
+    Retorna (x, y, válido), arrays com uma posição por feature.
+    """
+    if anchor not in ANCHORS:
+        raise ValueError(f"Ponto de ancoragem inválido: {anchor}")
+
+    size = len(chunk.feature_kind)
+    kind = chunk.feature_kind
+    coords = chunk.coords
+    counts = np.diff(chunk.part_offsets)
+    vertex_feature = np.repeat(chunk.part_feature, counts)
+
+    # Média dos vértices: centroide de pontos/multipontos e reserva para casos degenerados
+    vertex_count = np.bincount(vertex_feature, minlength=size).astype(float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = _sum_by(vertex_feature, coords[:, 0], size) / vertex_count
+        mean_y = _sum_by(vertex_feature, coords[:, 1], size) / vertex_count
+
+    x0, y0, x1, y1, seg_part = _segments(chunk)
+    seg_feature = chunk.part_feature[seg_part]
+    seg_kind = kind[seg_feature]
+
+    # Centroide de linhas: média dos pontos médios ponderada pelo comprimento
+    length = np.hypot(x1 - x0, y1 - y0)
+    line_length = _sum_by(seg_feature, length, size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        line_x = _sum_by(seg_feature, length * (x0 + x1) / 2.0, size) / line_length
+        line_y = _sum_by(seg_feature, length * (y0 + y1) / 2.0, size) / line_length
+    line_x = np.where(line_length > 0, line_x, mean_x)
+    line_y = np.where(line_length > 0, line_y, mean_y)
+
+    # Centroide de polígonos (fórmula do laço), com anéis internos subtraídos.
+    # As coordenadas são relativas ao 1º vértice de cada feature: com
+    # coordenadas grandes (lat/lon) e polígonos pequenos, os produtos
+    # cruzados das coordenadas absolutas se cancelam e perdem precisão.
+    first_vertex = np.minimum(np.searchsorted(vertex_feature, np.arange(size)), max(len(coords) - 1, 0))
+    ref_x = coords[first_vertex, 0] if len(coords) else np.zeros(size)
+    ref_y = coords[first_vertex, 1] if len(coords) else np.zeros(size)
+    sx0 = x0 - ref_x[seg_feature]
+    sy0 = y0 - ref_y[seg_feature]
+    sx1 = x1 - ref_x[seg_feature]
+    sy1 = y1 - ref_y[seg_feature]
+
+    cross = sx0 * sy1 - sx1 * sy0
+    num_parts = len(chunk.part_feature)
+    ring_area2 = _sum_by(seg_part, cross, num_parts)
+    ring_cx6 = _sum_by(seg_part, (sx0 + sx1) * cross, num_parts)
+    ring_cy6 = _sum_by(seg_part, (sy0 + sy1) * cross, num_parts)
+    ring_sign = np.sign(ring_area2) * np.where(chunk.part_hole, -1.0, 1.0)
+
+    area = _sum_by(chunk.part_feature, ring_sign * ring_area2 / 2.0, size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        poly_x = _sum_by(chunk.part_feature, ring_sign * ring_cx6 / 6.0, size) / area + ref_x
+        poly_y = _sum_by(chunk.part_feature, ring_sign * ring_cy6 / 6.0, size) / area + ref_y
+    poly_x = np.where(area != 0, poly_x, line_x)
+    poly_y = np.where(area != 0, poly_y, line_y)
+
+    x = np.where(kind == KIND_POLYGON, poly_x, np.where(kind == KIND_LINE, line_x, mean_x))
+    y = np.where(kind == KIND_POLYGON, poly_y, np.where(kind == KIND_LINE, line_y, mean_y))
+
+    if anchor in ("point_on_surface", "line_midpoint"):
+        lines = seg_kind == KIND_LINE
+        mid_x, mid_y = _line_midpoints(x0[lines], y0[lines], x1[lines], y1[lines], seg_feature[lines], length[lines], size)
+        use_mid = (kind == KIND_LINE) & ~np.isnan(mid_x)
+        x = np.where(use_mid, mid_x, x)
+        y = np.where(use_mid, mid_y, y)
+
+    if anchor == "point_on_surface":
+        polygons = seg_kind == KIND_POLYGON
+        px0, py0, px1, py1, poly_feature = x0[polygons], y0[polygons], x1[polygons], y1[polygons], seg_feature[polygons]
+        inside = _inside_polygons(x, y, px0, py0, px1, py1, poly_feature, size)
+
+        # Os segmentos vêm na ordem das features: cada polígono é uma fatia contígua
+        outside = np.nonzero((kind == KIND_POLYGON) & ~inside)[0]
+        starts = np.searchsorted(poly_feature, outside, side="left")
+        ends = np.searchsorted(poly_feature, outside, side="right")
+        for feature, start, end in zip(outside, starts, ends):
+            if start == end:
+                # Polígono sem segmentos (vazio): inválido, o chamador usa o QGIS
+                x[feature], y[feature] = np.nan, np.nan
+                continue
+            x[feature], y[feature] = _scanline_point(px0[start:end], py0[start:end], px1[start:end], py1[start:end])
+
+    valid = (kind != KIND_NONE) & np.isfinite(x) & np.isfinite(y)
+    return x, y, valid
+
+
+def anchors_from_wkb(wkbs, anchor="centroid"):
+    """Atalho: lê os WKB e calcula os pontos de ancoragem"""
+    return anchor_points(parse_wkb(wkbs), anchor)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark do cálculo dos pontos de ancoragem
+
+Compara o cálculo vetorizado (anchor_points, um bloco inteiro por vez)
+com o laço feature a feature do QGIS: QgsGeometry.centroid() para o
+ancoramento centroid e QgsGeometry.pointOnSurface() para
+point_on_surface. Precisa do módulo qgis (rode no Python do QGIS); sem
+ele só o tempo do caminho vetorizado é mostrado.
+
+Uso:
+    python benchmarks/benchmark_anchor_points.py [vértices totais, padrão 1000000]
+"""
+
+import math
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anchor_points import anchors_from_wkb
+
+CHUNK_SIZE = 5000
+VERTICES_PER_GEOMETRY = 100
+
+
+def polygon_wkb(cx, cy, radius, vertices):
+    """Polígono regular (anel fechado) em WKB little endian"""
+    coords = []
+    for i in range(vertices - 1):
+        angle = 2 * math.pi * i / (vertices - 1)
+        coords.extend((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+    coords.extend(coords[:2])
+    return struct.pack("<BIII%dd" % len(coords), 1, 3, 1, vertices, *coords)
+
+
+def line_wkb(x, y, vertices):
+    """Linha em zigue-zague em WKB little endian"""
+    coords = []
+    for i in range(vertices):
+        coords.extend((x + i, y + (i % 2)))
+    return struct.pack("<BII%dd" % len(coords), 1, 2, vertices, *coords)
+
+
+def synthetic_wkbs(total_vertices):
+    """Metade polígonos, metade linhas, com VERTICES_PER_GEOMETRY vértices cada"""
+    count = max(1, total_vertices // VERTICES_PER_GEOMETRY)
+    return [
+        polygon_wkb(i, i, 1.0, VERTICES_PER_GEOMETRY) if i % 2 == 0 else line_wkb(i, i, VERTICES_PER_GEOMETRY)
+        for i in range(count)
+    ]
+
+
+# Método do QgsGeometry equivalente a cada ponto de ancoragem medido
+QGIS_METHODS = {"centroid": "centroid", "point_on_surface": "pointOnSurface"}
+
+
+def bench_bulk(wkbs, anchor):
+    start = time.perf_counter()
+    for i in range(0, len(wkbs), CHUNK_SIZE):
+        anchors_from_wkb(wkbs[i:i + CHUNK_SIZE], anchor)
+    return time.perf_counter() - start
+
+
+def qgis_geometries(wkbs):
+    from qgis.core import QgsGeometry
+
+    geometries = []
+    for wkb in wkbs:
+        geom = QgsGeometry()
+        geom.fromWkb(wkb)
+        geometries.append(geom)
+    return geometries
+
+
+def bench_per_feature_qgis(geometries, method):
+    # Mesmo trabalho do laço original: ponto de ancoragem + coordenadas de cada feature
+    start = time.perf_counter()
+    for geom in geometries:
+        point = getattr(geom, method)().asPoint()
+        point.x(), point.y()
+    return time.perf_counter() - start
+
+
+def main(total_vertices):
+    wkbs = synthetic_wkbs(total_vertices)
+    print(f"📊 {len(wkbs)} geometrias, {len(wkbs) * VERTICES_PER_GEOMETRY} vértices")
+
+    try:
+        geometries = qgis_geometries(wkbs)
+    except ImportError:
+        geometries = None
+        print("   ⚠️ módulo qgis indisponível: a comparação com o QgsGeometry não foi medida")
+
+    for anchor, method in QGIS_METHODS.items():
+        bulk = bench_bulk(wkbs, anchor)
+        print(f"   • {anchor} vetorizado (blocos de {CHUNK_SIZE}): {bulk:.3f}s")
+        if geometries is not None:
+            loop = bench_per_feature_qgis(geometries, method)
+            print(f"   • {anchor} feature a feature (QgsGeometry.{method}): {loop:.3f}s")
+            print(f"   🚀 aceleração: {loop / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da inferência da U-Net: imagem a imagem x em lotes
+
+Compara o laço antigo do treino (model.predict com np.expand_dims para
+cada imagem de validação) com predict_masks em vários tamanhos de lote,
+em imagens por segundo. Usa a arquitetura do treino com pesos aleatórios
+e imagens uint8 sintéticas; cada modo é executado uma vez antes da
+medição para não contar a compilação.
+
+Uso:
+    python benchmarks/benchmark_batched_inference.py [imagens, padrão 256] [lotes, padrão 1,8,32,64]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from unet_inference import predict_masks
+from unet_model import unet_fast_otimizado
+
+
+def bench_predict_loop(model, images):
+    """Laço antigo: um model.predict por imagem"""
+    model.predict(np.expand_dims(images[0], axis=0), verbose=0)
+    start = time.perf_counter()
+    for image in images:
+        model.predict(np.expand_dims(image, axis=0), verbose=0)
+    return time.perf_counter() - start
+
+
+def bench_predict_masks(model, images, batch_size):
+    """predict_masks com lotes de batch_size imagens"""
+    predict_masks(model, images[:batch_size], batch_size)
+    start = time.perf_counter()
+    predict_masks(model, images, batch_size)
+    return time.perf_counter() - start
+
+
+def main(count, batch_sizes):
+    model = unet_fast_otimizado()
+    images = np.random.default_rng(42).integers(0, 256, (count, 128, 128, 3), dtype=np.uint8)
+    print(f"📊 {count} imagens 128x128")
+
+    before = bench_predict_loop(model, images)
+    print(f"   • model.predict por imagem:   {count / before:8.1f} imagens/s")
+    for batch_size in batch_sizes:
+        after = bench_predict_masks(model, images, batch_size)
+        print(f"   • predict_masks (lote {batch_size:3d}):  {count / after:8.1f} imagens/s  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 256,
+        [int(size) for size in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 8, 32, 64]
+    )
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Memória residente do dataset carregado em float32 e em uint8
+
+Repete o carregamento em memória do treino (lista de pares 128x128 e
+np.array no fim) com dados sintéticos, uma vez guardando imagem /255.0 e
+máscara em float32 (forma antiga) e outra guardando as duas em uint8
+(normalização feita pela camada Rescaling do modelo). Cada modo roda em
+um processo separado; o pico de memória residente vem de getrusage.
+
+Uso:
+    python benchmarks/benchmark_dataset_memory.py [pares, padrão 5000]
+"""
+
+import multiprocessing
+import resource
+import sys
+
+import numpy as np
+
+IMAGE_SIZE = (128, 128)
+
+
+def load(count, dtype):
+    """Carrega count pares como o load_data_otimizado; retorna os bytes dos arrays"""
+    rng = np.random.default_rng(42)
+    images = []
+    masks = []
+    for _ in range(count):
+        img = rng.integers(0, 256, (*IMAGE_SIZE, 3), dtype=np.uint8)
+        mask = rng.integers(0, 2, (*IMAGE_SIZE, 1), dtype=np.uint8)
+        if dtype == np.float32:
+            img = img.astype(np.float32) / 255.0
+            mask = mask.astype(np.float32)
+        images.append(img)
+        masks.append(mask)
+
+    images = np.array(images, dtype=dtype)
+    masks = np.array(masks, dtype=dtype)
+    return images.nbytes + masks.nbytes
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (ru_maxrss é em KB no Linux e em bytes no macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def measure(args):
+    count, dtype_name = args
+    baseline = peak_rss_mb()
+    data_bytes = load(count, np.dtype(dtype_name).type)
+    return data_bytes / 2**20, peak_rss_mb() - baseline
+
+
+def main(count):
+    print(f"📊 {count} pares {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}")
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for dtype_name in ("float32", "uint8"):
+        # Processo novo por modo: o pico de um não contamina o outro
+        with context.Pool(1) as pool:
+            results[dtype_name] = pool.map(measure, [(count, dtype_name)])[0]
+        data_mb, rss_mb = results[dtype_name]
+        print(f"   • {dtype_name:7s}: arrays {data_mb:8.1f} MB, pico residente +{rss_mb:8.1f} MB")
+
+    before = results["float32"][1]
+    after = results["uint8"][1]
+    print(f"   • redução do pico: {before / after:.1f}x" if after > 0 else "   • redução do pico: -")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos motores de exportação DXF (QGIS/OGR x nativo)
+
+Gera N pontos sintéticos com texto e mede o tempo de gravação do DXF em
+cada motor. O motor QGIS/OGR só é medido quando o módulo qgis está
+disponível (ex.: rodando com o Python do QGIS).
+
+Uso:
+    python benchmarks/benchmark_dxf_engines.py [10000 100000 1000000]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dxf_writer import DXFPointTextWriter
+
+CHUNK_SIZE = 5000
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def synthetic_rows(count, seed=42):
+    """Pontos aleatórios em coordenadas geográficas com um texto curto"""
+    rng = random.Random(seed)
+    return [
+        (rng.uniform(-74.0, -34.0), rng.uniform(-33.0, 5.0), f"Ponto {i} - São Paulo")
+        for i in range(count)
+    ]
+
+
+def bench_native(rows, filename):
+    """Grava os pontos com o escritor nativo"""
+    start = time.perf_counter()
+    with DXFPointTextWriter(filename) as writer:
+        for i in range(0, len(rows), CHUNK_SIZE):
+            writer.add_many(rows[i:i + CHUNK_SIZE])
+    return time.perf_counter() - start
+
+
+def bench_ogr(rows, filename):
+    """Grava os pontos com QgsVectorFileWriter (driver DXF, HEADER=MINIMAL)"""
+    from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransformContext, QgsFeature,
+                           QgsField, QgsFields, QgsGeometry, QgsPointXY, QgsVectorFileWriter, QgsWkbTypes)
+
+    fields = QgsFields()
+    fields.append(QgsField("id", 4))  # Integer
+    fields.append(QgsField("text", 10))  # String
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "DXF"
+    options.fileEncoding = "UTF-8"
+    options.datasourceOptions = ["HEADER=MINIMAL"]
+
+    start = time.perf_counter()
+    writer = QgsVectorFileWriter.create(
+        filename,
+        fields,
+        QgsWkbTypes.Point,
+        QgsCoordinateReferenceSystem("EPSG:4326"),
+        QgsCoordinateTransformContext(),
+        options
+    )
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = []
+        for feature_id, (x, y, text) in enumerate(rows[i:i + CHUNK_SIZE], start=i + 1):
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+            feature.setAttributes([feature_id, text])
+            chunk.append(feature)
+        writer.addFeatures(chunk)
+    del writer
+    return time.perf_counter() - start
+
+
+def start_qgis():
+    """Inicializa o QGIS sem interface, se disponível"""
+    try:
+        from qgis.core import QgsApplication
+    except ImportError:
+        return None
+    app = QgsApplication([], False)
+    app.initQgis()
+    return app
+
+
+def main(sizes):
+    app = start_qgis()
+    if app is None:
+        print("⚠️ Módulo qgis indisponível: medindo só o motor nativo")
+
+    print(f"{'features':>10} {'motor':>8} {'tempo (s)':>10} {'features/s':>12} {'MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            rows = synthetic_rows(count)
+            engines = [("nativo", bench_native)]
+            if app is not None:
+                engines.append(("ogr", bench_ogr))
+
+            for name, bench in engines:
+                filename = os.path.join(tmp, f"{name}_{count}.dxf")
+                elapsed = bench(rows, filename)
+                size_mb = os.path.getsize(filename) / (1024 * 1024)
+                print(f"{count:>10} {name:>8} {elapsed:>10.3f} {count / elapsed:>12.0f} {size_mb:>8.1f}")
+                os.remove(filename)
+
+    if app is not None:
+        app.exitQgis()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Comparação das arquiteturas da U-Net: original x leve
+
+Treina cada arquitetura pelo mesmo número de épocas no mesmo conjunto
+sintético (estradas desenhadas sobre ruído) e mostra lado a lado o
+número de parâmetros, a latência de inferência em CPU (lote 1 e lote
+32) e o IoU na validação (threshold escolhido por F1 na varredura e
+threshold fixo 0.5). O resultado também é gravado em JSON.
+
+Uso:
+    python benchmarks/benchmark_model_variants.py [--imagens 512] [--epocas 5] [--larguras 0.5,0.25]
+                                                  [--saida variantes.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf
+
+from benchmark_fast_training import synthetic_roads
+from unet_inference import predict_masks
+from unet_metrics import best_threshold, sweep_at, threshold_sweep
+from unet_model import build_model
+from unet_training import compile_model
+
+
+def latency_ms(model, images, batch_size, repeats=5):
+    """Mediana do tempo por imagem (ms) do predict_masks com lotes de batch_size"""
+    predict_masks(model, images[:batch_size], batch_size)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_masks(model, images, batch_size)
+        times.append((time.perf_counter() - start) / len(images))
+    return 1000.0 * statistics.median(times)
+
+
+def evaluate(name, model, train, validation, epochs, batch_size):
+    """Treina o modelo e mede parâmetros, latência e IoU de validação"""
+    compile_model(model)
+    start = time.perf_counter()
+    model.fit(*train, validation_data=validation, epochs=epochs, batch_size=batch_size, verbose=0)
+    training_time = time.perf_counter() - start
+
+    val_images, val_masks = validation
+    predictions = predict_masks(model, val_images)
+    sweep = threshold_sweep(predictions, val_masks)
+    threshold, index = best_threshold(sweep, 'f1')
+    return {
+        'arquitetura': name,
+        'parametros': int(model.count_params()),
+        'latencia_ms_lote_1': latency_ms(model, val_images[:32], 1),
+        'latencia_ms_lote_32': latency_ms(model, val_images, 32),
+        'treino_s': training_time,
+        'iou_melhor_threshold': float(sweep['iou'][index]),
+        'melhor_threshold': threshold,
+        'iou_threshold_0_5': sweep_at(sweep, 0.5)['iou']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a U-Net original com a variante leve")
+    parser.add_argument('--imagens', type=int, default=512, help="pares sintéticos (85%% treino, 15%% validação)")
+    parser.add_argument('--epocas', type=int, default=5, help="épocas de treino de cada arquitetura")
+    parser.add_argument('--lote', type=int, default=8, help="lote do treino")
+    parser.add_argument('--larguras', default='0.5,0.25', help="multiplicadores de largura da variante leve")
+    parser.add_argument('--saida', default='benchmark_variantes.json', help="arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    images, masks = synthetic_roads(args.imagens, seed=42)
+    split = int(len(images) * 0.85)
+    train = (images[:split], masks[:split])
+    validation = (images[split:], masks[split:])
+    print(f"📊 {args.imagens} imagens sintéticas, {args.epocas} épocas, lote {args.lote}")
+
+    variants = [('unet', 'unet', None)] + [
+        (f'leve x{width}', 'leve', float(width)) for width in args.larguras.split(',')
+    ]
+    results = []
+    for name, architecture, width in variants:
+        tf.keras.backend.clear_session()
+        tf.keras.utils.set_random_seed(42)
+        model = build_model(architecture, width=width) if width else build_model(architecture)
+        results.append(evaluate(name, model, train, validation, args.epocas, args.lote))
+
+    reference = results[0]
+    print(f"\n{'arquitetura':14s} {'parâmetros':>12s} {'ms/img (1)':>11s} {'ms/img (32)':>12s} "
+          f"{'aceleração':>11s} {'IoU':>7s} {'IoU@0.5':>8s}")
+    for result in results:
+        speedup = reference['latencia_ms_lote_32'] / result['latencia_ms_lote_32']
+        print(f"{result['arquitetura']:14s} {result['parametros']:12,d} {result['latencia_ms_lote_1']:11.2f} "
+              f"{result['latencia_ms_lote_32']:12.2f} {speedup:10.1f}x {result['iou_melhor_threshold']:7.3f} "
+              f"{result['iou_threshold_0_5']:8.3f}")
+
+    with open(args.saida, 'w', encoding='utf-8') as results_file:
+        json.dump({'parametros': vars(args), 'resultados': results}, results_file, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da exportação DXF em vários processos
+
+Mede o ParallelKMLToDXFConverter com 1, 2, 4 e 8 processos sobre uma
+origem sintética (WKB + texto gerados em memória, como os blocos lidos
+de uma camada ou de um KML) e compara com a codificação dos mesmos
+blocos em um só processo, sem o pool. A origem é lida uma vez, no
+processo principal, como na exportação real; não precisa do QGIS.
+
+A aceleração depende dos núcleos disponíveis: com um só núcleo os
+processos só somam o custo de enviar os blocos.
+
+Uso:
+    python benchmarks/benchmark_parallel_export.py [features, padrão 200000]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_anchor_points import line_wkb, polygon_wkb
+from dxf_writer import DXF_ENCODING, DXF_FOOTER, FIRST_HANDLE, dxf_header
+from parallel_export import CHUNK_SIZE, HANDLES_PER_FEATURE, ParallelKMLToDXFConverter, encode_chunk
+
+VERTICES_PER_GEOMETRY = 50
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+class _Feedback:
+    """Feedback mínimo (sem cancelamento)"""
+
+    def isCanceled(self):
+        return False
+
+    def setProgress(self, progress):
+        pass
+
+
+class SyntheticSource:
+    """Origem em memória com a interface do KMLToDXFConverter usada na exportação paralela"""
+
+    anchor = "centroid"
+    layer_name = "0"
+    text_height = 1.0
+    bulk = True
+
+    def __init__(self, wkbs, texts, output_file):
+        self.wkbs = wkbs
+        self.texts = texts
+        self.output_file = output_file
+        self.feedback = _Feedback()
+
+    def iter_wkb_text(self, progress_span):
+        return zip(self.wkbs, self.texts)
+
+    def wkb_anchor_points(self, wkbs):
+        return [None] * len(wkbs)
+
+    def remove_partial_output(self):
+        pass
+
+    def report_invalid_features(self):
+        pass
+
+    def invalid_features(self):
+        return []
+
+
+def synthetic_features(count):
+    """Metade polígonos, metade linhas, com um texto por feature"""
+    wkbs = [
+        polygon_wkb(i, i, 1.0, VERTICES_PER_GEOMETRY) if i % 2 == 0 else line_wkb(i, i, VERTICES_PER_GEOMETRY)
+        for i in range(count)
+    ]
+    texts = [f"Lote {i}" for i in range(count)]
+    return wkbs, texts
+
+
+def bench_serial(source):
+    """Os mesmos blocos codificados no processo principal, sem pool"""
+    start = time.perf_counter()
+    handle = FIRST_HANDLE
+    with open(source.output_file, "wb") as out:
+        out.write(dxf_header(0).encode(DXF_ENCODING))
+        for i in range(0, len(source.wkbs), CHUNK_SIZE):
+            wkbs = source.wkbs[i:i + CHUNK_SIZE]
+            data, _fallback = encode_chunk(
+                wkbs, source.texts[i:i + CHUNK_SIZE], source.anchor, source.layer_name, source.text_height, handle
+            )
+            out.write(data)
+            handle += HANDLES_PER_FEATURE * len(wkbs)
+        out.write(DXF_FOOTER.encode(DXF_ENCODING))
+    return time.perf_counter() - start
+
+
+def bench_parallel(source, workers):
+    start = time.perf_counter()
+    converter = ParallelKMLToDXFConverter(source, workers)
+    if not converter.run():
+        raise RuntimeError(converter.error)
+    return time.perf_counter() - start
+
+
+def main(count):
+    wkbs, texts = synthetic_features(count)
+    print(f"📊 {count} features, {VERTICES_PER_GEOMETRY} vértices cada, {os.cpu_count()} núcleo(s)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = SyntheticSource(wkbs, texts, os.path.join(folder, "saida.dxf"))
+        serial = bench_serial(source)
+        print(f"   • um processo, sem pool: {serial:.3f}s")
+
+        for workers in WORKER_COUNTS:
+            elapsed = bench_parallel(source, workers)
+            print(f"   • {workers} processo(s): {elapsed:.3f}s  🚀 {serial / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da leitura da coluna de texto no laço de conversão
+
+Compara o laço antigo (text_field in feature.fields().names() e
+feature[text_field] a cada feature) com o índice resolvido uma vez
+(feature.attribute(índice)), e a leitura da camada com todas as colunas
+com a leitura só da coluna de texto (setSubsetOfAttributes). Precisa do
+módulo qgis (rodar com o Python do QGIS).
+
+Uso:
+    python benchmarks/benchmark_text_field_lookup.py [features, padrão 200000] [colunas, padrão 20]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEXT_FIELD = "Name"
+
+
+def synthetic_layer(count, columns):
+    """Camada de pontos em memória com a coluna de texto e colunas extras"""
+    from qgis.core import QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsVectorLayer
+
+    layer = QgsVectorLayer("Point?crs=EPSG:4326", "bench", "memory")
+    provider = layer.dataProvider()
+    fields = [QgsField(f"extra_{i}", 10) for i in range(columns - 1)]
+    fields.insert(columns // 2, QgsField(TEXT_FIELD, 10))
+    provider.addAttributes(fields)
+    layer.updateFields()
+
+    features = []
+    for i in range(count):
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(i % 360 - 180, i % 180 - 90)))
+        feature.setAttributes([f"valor {i} {j}" for j in range(columns)])
+        features.append(feature)
+    provider.addFeatures(features)
+    return layer
+
+
+def bench_names_lookup(features):
+    """Laço antigo: lista de nomes e busca por nome a cada feature"""
+    start = time.perf_counter()
+    for feature in features:
+        feature[TEXT_FIELD] if TEXT_FIELD in feature.fields().names() else ""
+    return time.perf_counter() - start
+
+
+def bench_cached_index(features):
+    """Laço novo: índice resolvido uma vez"""
+    index = features[0].fields().lookupField(TEXT_FIELD) if features else -1
+    start = time.perf_counter()
+    for feature in features:
+        feature.attribute(index) if index >= 0 else ""
+    return time.perf_counter() - start
+
+
+def bench_read(layer, subset):
+    """Lê todas as features da camada, com todas as colunas ou só a de texto"""
+    from qgis.core import QgsFeatureRequest
+
+    request = QgsFeatureRequest()
+    if subset:
+        request.setSubsetOfAttributes([layer.fields().lookupField(TEXT_FIELD)])
+    start = time.perf_counter()
+    for _feature in layer.getFeatures(request):
+        pass
+    return time.perf_counter() - start
+
+
+def main(count, columns):
+    try:
+        from qgis.core import QgsApplication
+    except ImportError:
+        print("⚠️ Módulo qgis indisponível: rode com o Python do QGIS")
+        return
+
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    layer = synthetic_layer(count, columns)
+    features = list(layer.getFeatures())
+    print(f"📊 {count} features, {columns} colunas")
+
+    before = bench_names_lookup(features)
+    after = bench_cached_index(features)
+    print(f"   • fields().names() + feature[nome]: {before:.3f}s")
+    print(f"   • índice resolvido uma vez:         {after:.3f}s  ({before / after:.1f}x)")
+
+    full = bench_read(layer, subset=False)
+    subset = bench_read(layer, subset=True)
+    print(f"   • leitura com todas as colunas:     {full:.3f}s")
+    print(f"   • leitura só da coluna de texto:    {subset:.3f}s  ({full / subset:.1f}x)")
+
+    app.exitQgis()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Suíte de benchmarks da U-Net: carregamento, passo de treino e inferência
+
+Gera pares imagem/máscara sintéticos (estradas desenhadas sobre ruído)
+em uma pasta temporária e mede:
+
+- carregamento: vazão (imagens/s) do pipeline tf.data a partir dos PNGs,
+  da criação dos shards .npy e da leitura dos shards mapeados em memória;
+- treino: tempo por passo (train_on_batch) do unet_fast_otimizado em
+  vários tamanhos de lote, depois de passos de aquecimento;
+- inferência: imagens/s do predict_masks.
+
+Cada medida é a mediana de várias repetições, com sementes fixas. O
+resultado vai para um JSON com chaves ordenadas (formato estável para
+comparar execuções), além da tabela no terminal.
+
+Uso:
+    python benchmarks/benchmark_unet_suite.py [--imagens 256] [--tamanho 128] [--lotes 1,4,8,16]
+                                              [--passos 10] [--repeticoes 3] [--saida resultados.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from benchmark_fast_training import synthetic_roads
+from unet_data import array_dataset, list_pairs, make_dataset
+from unet_inference import predict_masks
+from unet_model import unet_fast_otimizado
+from unet_shards import build_shards, open_shards
+from unet_training import compile_model
+
+# Versão do formato do JSON de resultados
+RESULTS_VERSION = 1
+
+
+def write_pairs(folder, count, size, seed):
+    """Grava count pares sintéticos em folder/imagens e folder/mascaras; retorna as pastas"""
+    images_folder = os.path.join(folder, 'imagens')
+    masks_folder = os.path.join(folder, 'mascaras')
+    os.makedirs(images_folder)
+    os.makedirs(masks_folder)
+    images, masks = synthetic_roads(count, size, seed)
+    for index, (image, mask) in enumerate(zip(images, masks)):
+        cv2.imwrite(os.path.join(images_folder, f'{index:06d}.png'), image[..., ::-1])
+        cv2.imwrite(os.path.join(masks_folder, f'{index:06d}_mask.png'), mask[..., 0] * 255)
+    return images_folder, masks_folder
+
+
+def median_rate(function, count, repeats):
+    """Mediana de imagens/s de function (que processa count imagens) em repeats execuções"""
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        rates.append(count / (time.perf_counter() - start))
+    return statistics.median(rates)
+
+
+def bench_loading(folder, size, repeats):
+    """Vazão do tf.data a partir dos PNGs, da criação dos shards e da leitura dos shards"""
+    images_folder, masks_folder = os.path.join(folder, 'imagens'), os.path.join(folder, 'mascaras')
+    image_paths, mask_paths = list_pairs(images_folder, masks_folder)
+    count = len(image_paths)
+    shards_folder = os.path.join(folder, 'shards')
+
+    def iterate(dataset):
+        for _batch in dataset:
+            pass
+
+    def build():
+        shutil.rmtree(shards_folder, ignore_errors=True)
+        build_shards(image_paths, mask_paths, shards_folder, size=(size, size))
+
+    results = {
+        'tfdata_png_imagens_por_s': median_rate(
+            lambda: iterate(make_dataset(image_paths, mask_paths, 32, size=(size, size))), count, repeats
+        ),
+        'shards_criacao_imagens_por_s': median_rate(build, count, repeats)
+    }
+    images, masks = open_shards(shards_folder)
+    results['shards_leitura_imagens_por_s'] = median_rate(
+        lambda: iterate(array_dataset(images, masks, np.arange(len(images)), 32)), len(images), repeats
+    )
+    return results
+
+
+def bench_training(images, masks, batch_sizes, steps, repeats):
+    """Tempo mediano por passo de treino e imagens/s para cada tamanho de lote"""
+    size = images.shape[1]
+    results = {}
+    for batch_size in batch_sizes:
+        tf.keras.backend.clear_session()
+        tf.keras.utils.set_random_seed(42)
+        model = compile_model(unet_fast_otimizado(input_size=(size, size, 3)))
+        x = tf.convert_to_tensor(np.resize(images, (batch_size, *images.shape[1:])))
+        y = tf.convert_to_tensor(np.resize(masks, (batch_size, *masks.shape[1:])))
+
+        # Aquecimento: compilação do passo e alocações
+        for _ in range(2):
+            model.train_on_batch(x, y)
+
+        step_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(steps):
+                model.train_on_batch(x, y)
+            step_times.append((time.perf_counter() - start) / steps)
+        step_time = statistics.median(step_times)
+        results[str(batch_size)] = {
+            'ms_por_passo': 1000.0 * step_time,
+            'imagens_por_s': batch_size / step_time
+        }
+    return results
+
+
+def bench_inference(images, batch_size, repeats):
+    """Imagens/s do predict_masks com pesos aleatórios"""
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(42)
+    model = unet_fast_otimizado(input_size=(images.shape[1], images.shape[2], 3))
+    predict_masks(model, images[:batch_size], batch_size)
+    return {
+        'lote': batch_size,
+        'imagens_por_s': median_rate(lambda: predict_masks(model, images, batch_size), len(images), repeats)
+    }
+
+
+def environment():
+    return {
+        'python': sys.version.split()[0],
+        'tensorflow': tf.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+        'threads_intra_op': tf.config.threading.get_intra_op_parallelism_threads(),
+        'threads_inter_op': tf.config.threading.get_inter_op_parallelism_threads()
+    }
+
+
+def rounded(value):
+    """Arredonda os números para 3 casas (deixa o JSON estável e legível)"""
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da U-Net com dados sintéticos")
+    parser.add_argument('--imagens', type=int, default=256, help="pares sintéticos gerados")
+    parser.add_argument('--tamanho', type=int, default=128, help="lado das imagens (múltiplo de 8)")
+    parser.add_argument('--lotes', default='1,4,8,16', help="tamanhos de lote do treino, separados por vírgula")
+    parser.add_argument('--passos', type=int, default=10, help="passos de treino medidos por repetição")
+    parser.add_argument('--repeticoes', type=int, default=3, help="repetições de cada medida (vale a mediana)")
+    parser.add_argument('--lote-inferencia', type=int, default=32, help="lote do predict_masks")
+    parser.add_argument('--saida', default='benchmark_unet.json', help="arquivo JSON de resultados")
+    args = parser.parse_args()
+    if args.tamanho % 8:
+        parser.error("--tamanho precisa ser múltiplo de 8 (três poolings 2x2)")
+
+    batch_sizes = [int(size) for size in args.lotes.split(',')]
+    images, masks = synthetic_roads(args.imagens, args.tamanho, seed=42)
+    print(f"📊 {args.imagens} pares sintéticos {args.tamanho}x{args.tamanho}, {args.repeticoes} repetições")
+
+    folder = tempfile.mkdtemp(prefix='benchmark_unet_')
+    try:
+        write_pairs(folder, args.imagens, args.tamanho, seed=42)
+        loading = bench_loading(folder, args.tamanho, args.repeticoes)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    for name, rate in loading.items():
+        print(f"   • carregamento {name}: {rate:8.1f}")
+
+    training = bench_training(images, masks, batch_sizes, args.passos, args.repeticoes)
+    for batch_size, result in training.items():
+        print(f"   • treino lote {batch_size:>3s}: {result['ms_por_passo']:8.1f} ms/passo, "
+              f"{result['imagens_por_s']:8.1f} imagens/s")
+
+    inference = bench_inference(images, args.lote_inferencia, args.repeticoes)
+    print(f"   • inferência lote {inference['lote']}: {inference['imagens_por_s']:8.1f} imagens/s")
+
+    results = rounded({
+        'versao': RESULTS_VERSION,
+        'parametros': {
+            'imagens': args.imagens,
+            'tamanho': args.tamanho,
+            'lotes': batch_sizes,
+            'passos': args.passos,
+            'repeticoes': args.repeticoes
+        },
+        'carregamento': loading,
+        'treino': training,
+        'inferencia': inference,
+        'ambiente': environment()
+    })
+    with open(args.saida, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True, ensure_ascii=False)
+        results_file.write('\n')
+    print(f"✅ Resultados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
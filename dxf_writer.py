@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Escritor DXF nativo para pontos com texto
+
+Grava diretamente entidades POINT e TEXT em um DXF R12 (AC1009) mínimo
+(só HEADER e ENTITIES, o que o R12 permite), sem passar pelo driver DXF
+do OGR. O texto é acumulado em memória e gravado no disco em blocos
+grandes. Não depende do QGIS.
+
+As coordenadas e alturas são gravadas com o repr de floats finitos;
+pontos com coordenadas NaN ou infinitas são descartados (o AutoCAD
+recusa o arquivo inteiro se encontrar "nan" ou "inf").
+"""
+
+import codecs
+import math
+import os
+
+# Tamanho aproximado (em caracteres) de cada bloco gravado no disco
+BUFFER_SIZE = 1 << 20
+
+# Largura fixa reservada para o $HANDSEED, preenchido ao fechar o arquivo
+HANDSEED_WIDTH = 16
+
+# Primeiro handle usado pelas entidades
+FIRST_HANDLE = 0x100
+
+# Versão gravada ($ACADVER): R12, o único formato que aceita só HEADER e ENTITIES
+DXF_VERSION = "AC1009"
+
+DXF_ENCODING = "cp1252"
+
+
+def _dxf_unicode_escape(error):
+    """Troca caracteres fora do cp1252 pela sequência \\U+XXXX do DXF"""
+    replacement = "".join(
+        "\\U+%04X" % ord(char) if ord(char) <= 0xFFFF else "?"
+        for char in error.object[error.start:error.end]
+    )
+    return replacement, error.end
+
+
+codecs.register_error("dxf_unicode", _dxf_unicode_escape)
+
+
+def dxf_header(handseed):
+    """Cabeçalho mínimo de um DXF com handles habilitados"""
+    return (
+        "0\nSECTION\n2\nHEADER\n"
+        "9\n$ACADVER\n1\n%s\n"
+        "9\n$DWGCODEPAGE\n3\nANSI_1252\n"
+        "9\n$HANDLING\n70\n1\n"
+        "9\n$HANDSEED\n5\n%0*X\n"
+        "0\nENDSEC\n"
+        "0\nSECTION\n2\nENTITIES\n"
+    ) % (DXF_VERSION, HANDSEED_WIDTH, handseed)
+
+
+DXF_FOOTER = "0\nENDSEC\n0\nEOF\n"
+
+POINT_TEMPLATE = "0\nPOINT\n5\n%X\n8\n%s\n10\n%r\n20\n%r\n30\n0.0\n"
+TEXT_TEMPLATE = "0\nTEXT\n5\n%X\n8\n%s\n10\n%r\n20\n%r\n30\n0.0\n40\n%r\n1\n%s\n"
+
+
+def finite_float(value, name="Valor"):
+    """float finito a partir de value; ValueError se for NaN ou infinito"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name}: valor inválido para DXF ({value})")
+    return value
+
+
+def point_text_entities(handle, layer, x, y, text, height):
+    """Entidades POINT + TEXT (R12) de um ponto; retorna (texto DXF, próximo handle)
+
+    Um ponto com coordenadas não finitas não gera entidades ("", handle).
+    """
+    x = float(x)
+    y = float(y)
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return "", handle
+    height = finite_float(height, "Altura do texto")
+    data = POINT_TEMPLATE % (handle, layer, x, y)
+    handle += 1
+    if text:
+        text = str(text).replace("\r", " ").replace("\n", " ")
+        data += TEXT_TEMPLATE % (handle, layer, x, y, height, text)
+        handle += 1
+    return data, handle
+
+
+class DXFPointTextWriter:
+    """Grava pontos com texto em um arquivo DXF
+
+    Cada ponto gera uma entidade POINT e, se o texto não for vazio, uma
+    entidade TEXT no mesmo local. Pontos com coordenadas NaN
+    ou infinitas são descartados e contados em skipped. Use como
+    gerenciador de contexto ou chame close() para finalizar o arquivo.
+    """
+
+    def __init__(self, filename, layer="0", text_height=1.0, buffer_size=BUFFER_SIZE,
+                 first_handle=FIRST_HANDLE):
+        self.filename = filename
+        self.layer = layer
+        self.text_height = finite_float(text_height, "Altura do texto")
+        self.buffer_size = buffer_size
+        self.next_handle = first_handle
+        self.count = 0
+        self.skipped = 0
+
+        self._buffer = []
+        self._buffered = 0
+        self._file = open(filename, "wb")
+        self._file.write(dxf_header(0).encode(DXF_ENCODING))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def add(self, x, y, text, layer=None):
+        """Adiciona um ponto com texto"""
+        self.add_many([(x, y, text)], layer)
+
+    def add_many(self, rows, layer=None):
+        """Adiciona vários pontos a partir de tuplas (x, y, texto)"""
+        layer = self.layer if layer is None else layer
+        height = self.text_height
+        handle = self.next_handle
+        skipped = 0
+        isfinite = math.isfinite
+        parts = []
+        append = parts.append
+
+        for x, y, text in rows:
+            x = float(x)
+            y = float(y)
+            if not (isfinite(x) and isfinite(y)):
+                skipped += 1
+                continue
+            append(POINT_TEMPLATE % (handle, layer, x, y))
+            handle += 1
+            if text:
+                text = str(text).replace("\r", " ").replace("\n", " ")
+                append(TEXT_TEMPLATE % (handle, layer, x, y, height, text))
+                handle += 1
+
+        self.count += handle - self.next_handle
+        self.skipped += skipped
+        self.next_handle = handle
+        self._write("".join(parts))
+
+    def _write(self, data):
+        """Acumula o texto e grava no disco quando o buffer enche"""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Grava o conteúdo acumulado no arquivo"""
+        if self._buffer:
+            data = "".join(self._buffer)
+            self._file.write(data.encode(DXF_ENCODING, "dxf_unicode"))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        """Finaliza o arquivo e grava o $HANDSEED definitivo no cabeçalho"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.write(DXF_FOOTER.encode(DXF_ENCODING))
+        self._file.seek(0)
+        self._file.write(dxf_header(self.next_handle).encode(DXF_ENCODING))
+        self._file.close()
+        self._file = None
+
+
+def dxf_layer_name(name):
+    """Nome de layer DXF válido a partir de um nome qualquer"""
+    name = "".join("_" if char in '<>/\\":;?*|=\'' else char for char in str(name)).strip()
+    return name or "0"
+
+
+def read_dxf_version(filename):
+    """Lê o $ACADVER de um DXF (AC1009, o padrão do R12, se não estiver no cabeçalho)"""
+    with open(filename, "rb") as dxf:
+        lines = iter(dxf)
+        for code in lines:
+            value = next(lines, b"").strip()
+            if code.strip() == b"9" and value == b"$ACADVER":
+                next(lines, None)
+                return next(lines, b"AC1009").strip().decode("ascii")
+            if code.strip() == b"2" and value == b"ENTITIES":
+                break
+    return "AC1009"
+
+
+def merge_dxf_files(filenames, output, first_handle=FIRST_HANDLE, buffer_size=BUFFER_SIZE):
+    """Junta as seções ENTITIES de vários DXF em um único arquivo
+
+    Os arquivos de entrada devem ter sido gravados por DXFPointTextWriter.
+    As entidades são copiadas linha a linha, na ordem dos arquivos, e os
+    handles são renumerados para que não se repitam. Só arquivos R12
+    são aceitos: entidades de outras versões dependem de seções (TABLES,
+    OBJECTS...) que não são copiadas. Retorna o número de entidades
+    gravadas.
+    """
+    other_versions = [
+        f"{os.path.basename(filename)} ({version})"
+        for filename, version in ((filename, read_dxf_version(filename)) for filename in filenames)
+        if version != DXF_VERSION
+    ]
+    if other_versions:
+        raise ValueError(f"Só DXF R12 ({DXF_VERSION}) podem ser mesclados: " + ", ".join(other_versions))
+    handle = first_handle
+
+    with open(output, "wb", buffering=buffer_size) as out:
+        out.write(dxf_header(0).encode(DXF_ENCODING))
+
+        for filename in filenames:
+            with open(filename, "rb", buffering=buffer_size) as dxf:
+                lines = iter(dxf)
+                in_entities = False
+                for code in lines:
+                    value = next(lines, b"")
+                    if not in_entities:
+                        in_entities = code.strip() == b"2" and value.strip() == b"ENTITIES"
+                        continue
+                    if code.strip() == b"0" and value.strip() == b"ENDSEC":
+                        break
+                    if code.strip() == b"5":
+                        value = b"%X\n" % handle
+                        handle += 1
+                    out.write(code)
+                    out.write(value)
+
+        out.write(DXF_FOOTER.encode(DXF_ENCODING))
+        out.seek(0)
+        out.write(dxf_header(handle).encode(DXF_ENCODING))
+
+    return handle - first_handle
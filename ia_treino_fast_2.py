@@ -4,14 +4,32 @@ IA Treino FAST - Versão Otimizada
 Baseado na versão que está funcionando melhor
 """
 
+import argparse
 import numpy as np
 import cv2
 import os
+import shutil
+import tempfile
 import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 import tensorflow as tf
-from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, UpSampling2D, concatenate, BatchNormalization, Dropout
-from tensorflow.keras.models import Model
+
+from unet_artifacts import GRID_LIMIT, GRID_PAGE_SIZE, write_comparisons, write_grids
+from unet_data import CV2_IMAGE_EXTENSIONS, array_dataset, dataset_to_arrays, list_pairs, make_dataset
+from unet_distributed import (
+    checkpoint_callbacks, distributed_dataset, make_strategy, steps_per_epoch, sync_workers, worker_info
+)
+from unet_export import QUANTIZATIONS, export_model
+from unet_inference import predict_masks
+from unet_metrics import THRESHOLD_BINS, THRESHOLD_METRICS, sweep_at, threshold_sweep
+from unet_metrics import best_threshold as best_threshold_for
+from unet_model import ARCHITECTURES, LIGHT_WIDTH, NORMALIZATIONS, build_model
+from unet_profiling import REPORT_NAME, EpochThroughput, RunReport, parse_step_range, profiler_callback
+from unet_shards import build_shards, open_shards
+from unet_training import (
+    MIN_BATCHNORM_BATCH, AccumulatingModel, TrainingCheckpoint, compile_model, configure_precision,
+    inference_model, normalization_for_batch, restore_checkpoint, scaled_learning_rate
+)
 
 print("🚀 IA TREINO FAST - VERSÃO OTIMIZADA")
 print("=" * 50)
@@ -21,12 +39,99 @@ images_folder = 'dataset'
 masks_folder = 'mascara'
 output_folder = 'fast2'
 
+def parse_args():
+    """Opções de linha de comando (ignora argumentos desconhecidos, ex.: do Colab)"""
+    parser = argparse.ArgumentParser(description="Treino da U-Net de detecção de estradas")
+    parser.add_argument('--pipeline', choices=['tfdata', 'shards', 'memoria'], default='memoria',
+                        help="tfdata: lê as imagens em fluxo do disco; shards: pré-processa uma vez em shards "
+                             ".npy mapeados em memória; memoria: carrega tudo com load_data_otimizado")
+    parser.add_argument('--pasta-shards', default='dataset_shards',
+                        help="pasta dos shards pré-processados (pipeline shards)")
+    parser.add_argument('--cache', default=None,
+                        help="cache do pipeline tfdata: 'memoria' ou caminho de arquivo no disco")
+    parser.add_argument('--limite', type=int, default=None, help="número máximo de imagens")
+    parser.add_argument('--batch-inferencia', type=int, default=32,
+                        help="imagens por lote nas previsões de validação")
+    parser.add_argument('--arquitetura', choices=ARCHITECTURES, default='unet',
+                        help="unet: U-Net original; leve: convoluções separáveis (inferência rápida em CPU)")
+    parser.add_argument('--largura', type=float, default=LIGHT_WIDTH,
+                        help="multiplicador de filtros da arquitetura leve")
+    parser.add_argument('--batch', type=int, default=1,
+                        help="imagens por micro-lote no treino (o original usa 1)")
+    parser.add_argument('--acumular', type=int, default=1,
+                        help="micro-lotes cujos gradientes são somados antes de cada atualização")
+    parser.add_argument('--normalizacao', choices=['auto'] + NORMALIZATIONS, default='auto',
+                        help="auto: GroupNormalization se houver acumulação com micro-lotes menores "
+                             f"que {MIN_BATCHNORM_BATCH}, senão BatchNormalization")
+    parser.add_argument('--taxa-aprendizado', type=float, default=None,
+                        help="taxa do Adam (padrão: 0.0001 escalada pela raiz do lote efetivo)")
+    parser.add_argument('--retomar', action='store_true',
+                        help="continuar do último checkpoint em fast2/checkpoints")
+    parser.add_argument('--checkpoint-epocas', type=int, default=1,
+                        help="intervalo, em épocas, entre checkpoints (pesos, otimizador e época)")
+    parser.add_argument('--paciencia', type=int, default=0,
+                        help="épocas sem melhora na perda de validação antes de parar (0 = nunca parar)")
+    parser.add_argument('--rapido', action='store_true',
+                        help="modo rápido: compilação XLA e precisão mista bfloat16 (se o hardware suportar)")
+    parser.add_argument('--distribuido', action='store_true',
+                        help="treino com MultiWorkerMirroredStrategy (cluster em TF_CONFIG; "
+                             "para testar localmente use unet_distributed.py)")
+    parser.add_argument('--metrica-threshold', choices=THRESHOLD_METRICS, default='f1',
+                        help="métrica maximizada na escolha do threshold da máscara")
+    parser.add_argument('--grid-max', type=int, default=GRID_LIMIT,
+                        help="máximo de imagens no grid de comparações (0 = todas)")
+    parser.add_argument('--grid-pagina', type=int, default=GRID_PAGE_SIZE,
+                        help="imagens por arquivo do grid (páginas numeradas)")
+    parser.add_argument('--perfil', type=parse_step_range, default=None, metavar='INICIO,FIM',
+                        help="gravar trace do profiler do TensorBoard nesses passos de treino (pasta perfil/)")
+    parser.add_argument('--exportar', action='store_true',
+                        help="exportar também SavedModel e TFLite (pasta exportado/)")
+    parser.add_argument('--quantizacao', nargs='*', choices=QUANTIZATIONS, default=[],
+                        help="versões TFLite quantizadas a exportar (calibradas com a validação)")
+    args, _unknown = parser.parse_known_args()
+    if args.distribuido and args.acumular > 1:
+        parser.error("--acumular não é suportado com --distribuido (aumente --batch ou o número de trabalhadores)")
+    return args
+
+args = parse_args()
+
+# Estratégia de distribuição: precisa ser criada antes de qualquer operação do TF
+if args.distribuido:
+    strategy = make_strategy()
+    num_workers, worker_index = worker_info()
+    print(f"🖧 Trabalhador {worker_index + 1} de {num_workers}")
+else:
+    strategy = tf.distribute.get_strategy()
+    num_workers, worker_index = 1, 0
+chief = worker_index == 0
+# Lote de cada passo somando todos os trabalhadores
+global_batch = args.batch * num_workers
+
 # Criar pasta de resultados se não existir
 os.makedirs(output_folder, exist_ok=True)
 print(f"📁 Pasta de resultados: {output_folder}")
 
-def load_data_otimizado(limit=None):  # TODAS as imagens do dataset
-    """Carrega dados com verificações melhoradas"""
+# Relatório da execução: tempo e vazão de cada etapa (gravado só pelo coordenador)
+report = RunReport(os.path.join(output_folder, REPORT_NAME), vars(args))
+
+def load_data_otimizado(limit=None, shards_folder=None):  # TODAS as imagens do dataset
+    """Carrega dados com verificações melhoradas
+
+    Com shards_folder, os pares são pré-processados uma vez (em paralelo)
+    para shards uint8 e abertos mapeados em memória, sem cópia. No treino
+    distribuído só o coordenador grava os shards; a pasta precisa ser
+    visível para todos os trabalhadores.
+    """
+    if shards_folder is not None:
+        # Os shards são lidos com cv2, como o carregamento em memória (aceita .tif)
+        image_paths, mask_paths = list_pairs(images_folder, masks_folder, limit, CV2_IMAGE_EXTENSIONS)
+        print(f"🔍 {len(image_paths)} pares imagem/máscara; cache em {shards_folder}/")
+        if chief:
+            build_shards(image_paths, mask_paths, shards_folder)
+        if args.distribuido:
+            sync_workers(strategy)
+        return open_shards(shards_folder)
+    
     images = []
     masks = []
     
@@ -53,7 +158,7 @@ def load_data_otimizado(limit=None):  # TODAS as imagens do dataset
                 
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             img = cv2.resize(img, (128, 128))  # Manter 128x128 que funciona
-            img = img.astype(np.float32) / 255.0
+            # Mantida em uint8: a normalização (/255) é feita pelo modelo
             
             # Carregar máscara
             mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
@@ -64,7 +169,7 @@ def load_data_otimizado(limit=None):  # TODAS as imagens do dataset
             
             # Verificar se máscara tem conteúdo
             if mask.max() > 0:
-                mask = (mask > 0).astype(np.float32)  # Usar threshold baixo
+                mask = (mask > 0).astype(np.uint8)  # Usar threshold baixo (0/1 em uint8)
                 mask = np.expand_dims(mask, axis=-1)
                 
                 images.append(img)
@@ -75,81 +180,184 @@ def load_data_otimizado(limit=None):  # TODAS as imagens do dataset
             else:
                 print(f"   ⚠️ {image_file}: Máscara vazia, pulando...")
     
-    return np.array(images), np.array(masks)
+    return np.array(images, dtype=np.uint8), np.array(masks, dtype=np.uint8)
 
-def unet_fast_otimizado(input_size=(128, 128, 3)):
-    """U-Net MELHORADA - Mais camadas e skip connections"""
-    inputs = Input(input_size)
-    
-    # Encoder - MELHORADO com mais camadas
-    c1 = Conv2D(64, 3, activation='relu', padding='same')(inputs)
-    c1 = Conv2D(64, 3, activation='relu', padding='same')(c1)  # Camada dupla
-    c1 = BatchNormalization()(c1)
-    p1 = MaxPooling2D((2, 2))(c1)
-    
-    c2 = Conv2D(128, 3, activation='relu', padding='same')(p1)
-    c2 = Conv2D(128, 3, activation='relu', padding='same')(c2)  # Camada dupla
-    c2 = BatchNormalization()(c2)
-    p2 = MaxPooling2D((2, 2))(c2)
-    
-    c3 = Conv2D(256, 3, activation='relu', padding='same')(p2)
-    c3 = Conv2D(256, 3, activation='relu', padding='same')(c3)  # Camada dupla
-    c3 = BatchNormalization()(c3)
-    p3 = MaxPooling2D((2, 2))(c3)
-    
-    # Bottleneck - Mais profundo
-    c4 = Conv2D(512, 3, activation='relu', padding='same')(p3)
-    c4 = Conv2D(512, 3, activation='relu', padding='same')(c4)
-    c4 = BatchNormalization()(c4)
-    c4 = Dropout(0.3)(c4)  # Dropout mais forte
-    
-    # Decoder - MELHORADO com skip connections
-    u5 = UpSampling2D((2, 2))(c4)
-    u5 = concatenate([u5, c3])
-    c5 = Conv2D(256, 3, activation='relu', padding='same')(u5)
-    c5 = Conv2D(256, 3, activation='relu', padding='same')(c5)
-    c5 = BatchNormalization()(c5)
-    
-    u6 = UpSampling2D((2, 2))(c5)
-    u6 = concatenate([u6, c2])
-    c6 = Conv2D(128, 3, activation='relu', padding='same')(u6)
-    c6 = Conv2D(128, 3, activation='relu', padding='same')(c6)
-    c6 = BatchNormalization()(c6)
-    
-    u7 = UpSampling2D((2, 2))(c6)
-    u7 = concatenate([u7, c1])
-    c7 = Conv2D(64, 3, activation='relu', padding='same')(u7)
-    c7 = Conv2D(64, 3, activation='relu', padding='same')(c7)
-    
-    outputs = Conv2D(1, 1, activation='sigmoid')(c7)
-    
-    model = Model(inputs=[inputs], outputs=[outputs])
-    return model
+def streaming_datasets(limit=None, cache=None, batch_size=1, shard=None):
+    """Divide os pares de arquivos em treino/validação e cria os datasets tf.data
 
-# Carregar dados
-images, masks = load_data_otimizado()  # TODAS as imagens do dataset
+    Retorna (treino, validação, divisão); divisão são as listas de caminhos
+    (imagens de treino, de validação, máscaras de treino, de validação).
+    """
+    image_paths, mask_paths = list_pairs(images_folder, masks_folder, limit)
+    print(f"🔍 {len(image_paths)} pares imagem/máscara encontrados (leitura em fluxo)")
+    if len(image_paths) < 8:
+        return None, None, None
 
-if len(images) == 0:
-    print("❌ Nenhuma imagem carregada! Verifique os dados.")
-    exit()
-
-print(f"📊 Total de imagens carregadas: {len(images)}")
-
-# Criar modelo
-print("🔧 Criando modelo U-Net Fast Otimizado...")
-model = unet_fast_otimizado()
+    # Mesma divisão 85/15 do carregamento em memória, feita sobre os caminhos
+    train_images, val_images, train_masks, val_masks = train_test_split(
+        image_paths, mask_paths, test_size=0.15, random_state=42
+    )
+    train_cache = val_cache = None
+    if cache == 'memoria':
+        train_cache = val_cache = ''
+    elif cache:
+        # Um arquivo de cache por trabalhador (cada um guarda só a sua parte)
+        suffix = f'_{shard[1]}' if shard is not None else ''
+        train_cache, val_cache = cache + '_treino' + suffix, cache + '_validacao' + suffix
+
+    train_ds = make_dataset(train_images, train_masks, batch_size, shuffle=True, cache=train_cache, shard=shard)
+    val_ds = make_dataset(val_images, val_masks, batch_size, cache=val_cache, shard=shard)
+    return train_ds, val_ds, (train_images, val_images, train_masks, val_masks)
 
-# Compilar com configurações MELHORADAS
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),  # Learning rate menor
-    loss='binary_crossentropy',
-    metrics=['accuracy', 'precision', 'recall']  # Mais métricas
-)
+# Carregar dados
+report.start('carregamento')
+if args.pipeline == 'tfdata':
+    train_ds, val_ds, split = streaming_datasets(
+        args.limite, args.cache, global_batch,
+        shard=(num_workers, worker_index) if args.distribuido else None
+    )
+    if train_ds is None:
+        print("❌ Imagens insuficientes (mínimo 8)! Verifique os dados.")
+        exit()
+elif args.pipeline == 'shards':
+    images, masks = load_data_otimizado(args.limite, shards_folder=args.pasta_shards)
+    print(f"📊 Total de imagens nos shards: {len(images)}")
+    if len(images) < 8:
+        print("❌ Imagens insuficientes (mínimo 8)! Verifique os dados.")
+        exit()
+else:
+    images, masks = load_data_otimizado(args.limite)  # TODAS as imagens do dataset
+
+    if len(images) == 0:
+        print("❌ Nenhuma imagem carregada! Verifique os dados.")
+        exit()
+
+    print(f"📊 Total de imagens carregadas: {len(images)}")
+    print(f"   • Memória: {(images.nbytes + masks.nbytes) / 2**20:.1f} MB (uint8)")
+
+# No pipeline tfdata só os caminhos são listados aqui (a leitura acontece no treino)
+report.stop('carregamento', len(split[0]) + len(split[1]) if args.pipeline == 'tfdata' else len(images))
+
+# Precisão: antes de criar o modelo
+policy = configure_precision(args.rapido)
+if args.rapido:
+    print(f"⚡ Modo rápido: XLA (jit_compile) e política {policy}")
+
+# Lote efetivo = micro-lote x passos acumulados
+effective_batch = args.batch * args.acumular
+normalization = args.normalizacao if args.normalizacao != 'auto' else normalization_for_batch(args.batch, args.acumular)
+learning_rate = args.taxa_aprendizado or scaled_learning_rate(effective_batch)
+print(f"📦 Lote: {args.batch} x {args.acumular} = {effective_batch} | normalização {normalization} | lr {learning_rate:g}")
+
+# Criar modelo (pesos espelhados entre os trabalhadores no modo distribuído)
+print(f"🔧 Criando modelo U-Net ({args.arquitetura})...")
+with strategy.scope():
+    model = build_model(args.arquitetura, normalization=normalization, width=args.largura)
+    if args.acumular > 1:
+        model = AccumulatingModel.from_model(model, args.acumular)
+
+    # Compilar com configurações MELHORADAS (learning rate menor e mais métricas)
+    compile_model(model, fast=args.rapido, learning_rate=learning_rate)
+
+# Checkpoints: no modo distribuído, coordenados entre os trabalhadores (BackupAndRestore)
+callbacks = []
+initial_epoch = 0
+if args.distribuido:
+    callbacks += checkpoint_callbacks(os.path.join(output_folder, 'backup_distribuido'))
+else:
+    checkpoint_folder = os.path.join(output_folder, 'checkpoints')
+    if args.retomar:
+        initial_epoch = restore_checkpoint(model, checkpoint_folder)
+        print(f"♻️ Retomando da época {initial_epoch}" if initial_epoch else "♻️ Nenhum checkpoint: começando do zero")
+    callbacks.append(TrainingCheckpoint(checkpoint_folder, every=args.checkpoint_epocas))
+
+# Parar quando a perda de validação deixar de melhorar (volta aos melhores pesos)
+if args.paciencia > 0:
+    callbacks.append(tf.keras.callbacks.EarlyStopping(
+        monitor='val_loss', patience=args.paciencia, restore_best_weights=True, verbose=1
+    ))
+
+# Tempo e vazão por época; trace do profiler se pedido
+throughput = EpochThroughput(global_batch)
+callbacks.append(throughput)
+if args.perfil:
+    callbacks.append(profiler_callback(os.path.join(output_folder, 'perfil'), args.perfil))
+
+# Distribuído: cada trabalhador lê a sua parte, todos com o mesmo número de passos
+fit_options = {'callbacks': callbacks, 'initial_epoch': initial_epoch}
+
+
+def distributed_fit_options(train_count, val_count):
+    """Passos por época do treino distribuído (os datasets se repetem)"""
+    if not args.distribuido:
+        return fit_options
+    return dict(
+        fit_options,
+        steps_per_epoch=steps_per_epoch(train_count, global_batch),
+        validation_steps=steps_per_epoch(val_count, global_batch)
+    )
 
 print("🎯 Iniciando treinamento otimizado...")
+report.start('treino')
 
 # Treinar (usar validação com dataset completo)
-if len(images) >= 8:
+if args.pipeline == 'tfdata':
+    if args.distribuido:
+        history = model.fit(
+            distributed_dataset(train_ds),
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=distributed_dataset(val_ds),
+            verbose=1 if chief else 2,
+            **distributed_fit_options(len(split[0]), len(split[1]))
+        )
+        # Validação completa (sem divisão entre trabalhadores) para as análises
+        val_ds = make_dataset(split[1], split[3], 32)
+    else:
+        history = model.fit(
+            train_ds,
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=val_ds,
+            verbose=1,
+            **fit_options
+        )
+
+    # As análises abaixo usam a validação em memória (15% dos dados)
+    val_images, val_masks = dataset_to_arrays(val_ds)
+    print(f"📊 Validação: {len(val_images)} imagens")
+    test_image = val_images[0]
+    test_mask_real = val_masks[0]
+elif args.pipeline == 'shards':
+    # Dividir os índices: mesma permutação da divisão dos arrays em memória
+    train_idx, val_idx = train_test_split(np.arange(len(images)), test_size=0.15, random_state=42)
+    print(f"📊 Dataset completo dividido:")
+    print(f"   • Treino: {len(train_idx)} imagens")
+    print(f"   • Validação: {len(val_idx)} imagens")
+
+    if args.distribuido:
+        # Cada trabalhador treina e valida com uma fatia dos índices
+        history = model.fit(
+            distributed_dataset(array_dataset(images, masks, train_idx[worker_index::num_workers],
+                                              batch_size=global_batch, shuffle=True)),
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=distributed_dataset(array_dataset(images, masks, val_idx[worker_index::num_workers],
+                                                              batch_size=global_batch)),
+            verbose=1 if chief else 2,
+            **distributed_fit_options(len(train_idx), len(val_idx))
+        )
+    else:
+        history = model.fit(
+            array_dataset(images, masks, train_idx, batch_size=args.batch, shuffle=True),
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=array_dataset(images, masks, val_idx, batch_size=args.batch),
+            verbose=1,
+            **fit_options
+        )
+
+    # As análises abaixo usam a validação em memória (15% dos dados)
+    val_images, val_masks = dataset_to_arrays(array_dataset(images, masks, val_idx, batch_size=32))
+    test_image = val_images[0]
+    test_mask_real = val_masks[0]
+elif len(images) >= 8:
     # Dividir em treino/validação
     train_images, val_images, train_masks, val_masks = train_test_split(
         images, masks, test_size=0.15, random_state=42  # 15% para validação
@@ -159,165 +367,137 @@ if len(images) >= 8:
     print(f"   • Treino: {len(train_images)} imagens")
     print(f"   • Validação: {len(val_images)} imagens")
     
-    history = model.fit(
-        train_images, train_masks,
-        epochs=35,  # MAIS epochs para aprender melhor
-        validation_data=(val_images, val_masks),
-        verbose=1,
-        batch_size=1  # Batch menor para melhor aprendizado
-    )
+    if args.distribuido:
+        train_idx = np.arange(len(train_images))[worker_index::num_workers]
+        val_idx = np.arange(len(val_images))[worker_index::num_workers]
+        history = model.fit(
+            distributed_dataset(array_dataset(train_images, train_masks, train_idx,
+                                              batch_size=global_batch, shuffle=True)),
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=distributed_dataset(array_dataset(val_images, val_masks, val_idx,
+                                                              batch_size=global_batch)),
+            verbose=1 if chief else 2,
+            **distributed_fit_options(len(train_images), len(val_images))
+        )
+    else:
+        history = model.fit(
+            train_images, train_masks,
+            epochs=35,  # MAIS epochs para aprender melhor
+            validation_data=(val_images, val_masks),
+            verbose=1,
+            batch_size=args.batch,
+            **fit_options
+        )
     test_image = val_images[0]
     test_mask_real = val_masks[0]
 
+report.stop('treino', sum(epoch['imagens'] for epoch in throughput.epochs), epocas=len(throughput.epochs))
+report.metrics['epocas'] = throughput.epochs
 print("✅ Treinamento concluído!")
 
+# Modelo funcional comum (sem o passo de treino com acumulação) para salvar e prever
+model = inference_model(model)
+
+# Todos os trabalhadores participam da gravação (com MultiWorkerMirroredStrategy
+# salvar o modelo envolve operações coletivas); fora o coordenador, os arquivos
+# vão para uma pasta temporária apagada em seguida
+save_folder = output_folder if chief else tempfile.mkdtemp(prefix=f'trabalhador_{worker_index}_')
+
 # 💾 SALVAR O MODELO TREINADO
-model_path = os.path.join(output_folder, 'modelo_fast2.h5')
+report.start('salvar_modelo')
+model_path = os.path.join(save_folder, 'modelo_fast2.h5')
 model.save(model_path)
-print(f"🎯 Modelo salvo em: {model_path}")
+report.stop('salvar_modelo')
+if chief:
+    report.save()
+    print(f"🎯 Modelo salvo em: {model_path}")
+
+if args.exportar:
+    report.start('exportacao')
+    export_folder = os.path.join(save_folder, 'exportado')
+    if chief:
+        print(f"📦 Exportando SavedModel e TFLite para {export_folder}/...")
+    export_report = export_model(model, export_folder, args.quantizacao, val_images)
+    if chief:
+        for name, dados in export_report['tflite'].items():
+            line = f"   • {name}: {dados['tamanho_mb']:.1f} MB"
+            if 'latencia_ms_por_imagem' in dados:
+                line += (f", {dados['latencia_ms_por_imagem']:.1f} ms/imagem,"
+                         f" IoU com Keras {dados['iou_com_keras']:.3f}")
+            print(line)
+    report.stop('exportacao')
+    report.metrics['exportacao'] = export_report
+
+# Só o coordenador gera as análises e as imagens
+if not chief:
+    shutil.rmtree(save_folder, ignore_errors=True)
+    print(f"✅ Trabalhador {worker_index + 1}: treino concluído")
+    exit()
 
 # Fazer previsão EM TODAS AS IMAGENS DE VALIDAÇÃO
 print("🔮 Fazendo previsões em TODAS as imagens de validação...")
 print(f"📊 Total de imagens para processar: {len(val_images)}")
 
-# Processar todas as imagens de validação
-all_predictions = []
-for i, val_img in enumerate(val_images):
-    test_image_input = np.expand_dims(val_img, axis=0)
-    predicted_mask = model.predict(test_image_input, verbose=0)
-    all_predictions.append(predicted_mask[0])
-    print(f"   ✓ Processada imagem {i+1}/{len(val_images)}")
+# Processar todas as imagens de validação em lotes
+report.start('inferencia')
+all_predictions = predict_masks(model, val_images, batch_size=args.batch_inferencia)
+report.stop('inferencia', len(val_images))
+print(f"   ✓ {len(all_predictions)} imagens processadas (lotes de {args.batch_inferencia})")
 
 print(f"📊 Estatísticas das previsões:")
 for i, pred in enumerate(all_predictions):
     print(f"   • Imagem {i+1}: Min={pred.min():.4f}, Max={pred.max():.4f}, Média={pred.mean():.4f}")
 
-# Testar thresholds OTIMIZADOS
+# Thresholds mostrados e salvos para a primeira imagem
 thresholds = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7]
-print(f"\n🎚️ Testando thresholds na primeira imagem:")
-
-# Usar primeira imagem para encontrar melhor threshold
-predicted_mask = all_predictions[0]
 
-resultados_threshold = {}
+# Varredura de thresholds em TODAS as imagens de validação (uma passada, por histograma)
+print(f"\n🎚️ Varrendo {THRESHOLD_BINS} thresholds em todas as {len(all_predictions)} imagens de validação:")
+report.start('threshold')
+sweep = threshold_sweep(all_predictions, val_masks)
+report.stop('threshold', len(all_predictions))
 for thresh in thresholds:
-    mask_test = (predicted_mask > thresh).astype(np.uint8)
-    white_pixels = np.sum(mask_test)
-    percentage = (white_pixels / (128*128)) * 100
-    
-    resultados_threshold[thresh] = {
-        'pixels': white_pixels,
-        'percentage': percentage,
-        'mask': mask_test
-    }
-    
-    print(f"   • Threshold {thresh}: {white_pixels} pixels ({percentage:.1f}%)")
+    dados = sweep_at(sweep, thresh)
+    print(f"   • Threshold {thresh}: precisão {dados['precision']:.3f}, revocação {dados['recall']:.3f}, "
+          f"IoU {dados['iou']:.3f}, F1 {dados['f1']:.3f}")
 
-# Escolher melhor threshold (baseado em ter detecção mas não demais)
-best_threshold = 0.3
-best_score = 0
+# Escolher o threshold que maximiza a métrica pedida
+best_threshold, best_index = best_threshold_for(sweep, args.metrica_threshold)
+best_threshold = round(best_threshold, 3)
+predicted_mask = all_predictions[0]
 
-for thresh, dados in resultados_threshold.items():
-    percentage = dados['percentage']
-    # Score baseado em ter entre 1% e 25% da imagem detectada
-    if 1 <= percentage <= 25:
-        score = 100 - abs(percentage - 8)  # Ideal em torno de 8%
-        if score > best_score:
-            best_score = score
-            best_threshold = thresh
+report.metrics['threshold'] = {
+    'metrica': args.metrica_threshold,
+    'valor': best_threshold,
+    **{name: float(sweep[name][best_index]) for name in ('precision', 'recall', 'iou', 'f1')}
+}
 
-print(f"\n🏆 Melhor threshold escolhido: {best_threshold}")
-print(f"   • Detecção: {resultados_threshold[best_threshold]['percentage']:.1f}%")
+print(f"\n🏆 Melhor threshold escolhido ({args.metrica_threshold}): {best_threshold}")
+print(f"   • Precisão {sweep['precision'][best_index]:.3f}, revocação {sweep['recall'][best_index]:.3f}, "
+      f"IoU {sweep['iou'][best_index]:.3f}, F1 {sweep['f1'][best_index]:.3f}")
 
 # 🖼️ CRIAR COMPARAÇÕES LADO A LADO DE TODAS AS IMAGENS
 print(f"\n🖼️ Criando comparações lado a lado de TODAS as {len(val_images)} imagens...")
 
-# Criar pasta específica para comparações
+# Pasta específica para comparações (PNGs gravados em paralelo, bloco a bloco)
+report.start('artefatos')
 comparacoes_folder = os.path.join(output_folder, 'comparacoes_todas')
-os.makedirs(comparacoes_folder, exist_ok=True)
-
-# Processar cada imagem de validação
-for i in range(len(val_images)):
-    val_img = val_images[i]
-    val_mask_real = val_masks[i]
-    predicted_mask_img = all_predictions[i]
-    
-    # Aplicar melhor threshold
-    best_mask = (predicted_mask_img > best_threshold).astype(np.uint8)
-    
-    # Converter para BGR para salvar
-    original_bgr = cv2.cvtColor(val_img, cv2.COLOR_RGB2BGR)
-    original_display = (original_bgr * 255).astype(np.uint8)
-    
-    # Converter máscaras para 3 canais
-    mask_real_3ch = cv2.cvtColor((val_mask_real.squeeze() * 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
-    mask_pred_3ch = cv2.cvtColor((best_mask.squeeze() * 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
-    
-    # Criar comparação lado a lado: Original | Real | Prevista
-    comparison = np.hstack((original_display, mask_real_3ch, mask_pred_3ch))
-    
-    # Salvar comparação individual
-    comparison_path = os.path.join(comparacoes_folder, f'comparacao_{i+1:02d}.png')
-    cv2.imwrite(comparison_path, comparison)
-    
-    # Salvar também as imagens individuais
-    individual_folder = os.path.join(comparacoes_folder, f'imagem_{i+1:02d}')
-    os.makedirs(individual_folder, exist_ok=True)
-    
-    cv2.imwrite(os.path.join(individual_folder, 'original.png'), original_display)
-    cv2.imwrite(os.path.join(individual_folder, 'mascara_real.png'), mask_real_3ch)
-    cv2.imwrite(os.path.join(individual_folder, 'mascara_prevista.png'), mask_pred_3ch)
-    
-    print(f"   ✓ Comparação {i+1}/{len(val_images)} salva")
-
-# Criar uma imagem GRID com todas as comparações
-print("� Criando GRID com todas as comparações...")
-
-# Calcular dimensões do grid
-num_images = len(val_images)
-cols = min(4, num_images)  # Máximo 4 colunas
-rows = (num_images + cols - 1) // cols  # Arredondar para cima
-
-# Criar grid grande
-grid_height = rows * 128 * 3  # Cada linha tem altura 128, 3 por causa do lado a lado
-grid_width = cols * (128 * 3)  # Cada coluna tem largura 128*3 (original+real+prevista)
-grid = np.zeros((grid_height, grid_width, 3), dtype=np.uint8)
-
-for i in range(num_images):
-    row = i // cols
-    col = i % cols
-    
-    val_img = val_images[i]
-    val_mask_real = val_masks[i]
-    predicted_mask_img = all_predictions[i]
-    best_mask = (predicted_mask_img > best_threshold).astype(np.uint8)
-    
-    # Preparar imagens pequenas para o grid
-    original_small = cv2.resize((cv2.cvtColor(val_img, cv2.COLOR_RGB2BGR) * 255).astype(np.uint8), (128, 128))
-    real_small = cv2.resize((val_mask_real.squeeze() * 255).astype(np.uint8), (128, 128))
-    pred_small = cv2.resize((best_mask.squeeze() * 255).astype(np.uint8), (128, 128))
-    
-    # Converter para 3 canais
-    real_small_3ch = cv2.cvtColor(real_small, cv2.COLOR_GRAY2BGR)
-    pred_small_3ch = cv2.cvtColor(pred_small, cv2.COLOR_GRAY2BGR)
-    
-    # Posição no grid
-    y_start = row * 128
-    y_end = y_start + 128
-    x_start = col * (128 * 3)
-    
-    # Colocar as 3 imagens lado a lado
-    grid[y_start:y_end, x_start:x_start+128] = original_small
-    grid[y_start:y_end, x_start+128:x_start+256] = real_small_3ch
-    grid[y_start:y_end, x_start+256:x_start+384] = pred_small_3ch
-
-# Salvar grid completo
-grid_path = os.path.join(output_folder, 'grid_todas_comparacoes.png')
-cv2.imwrite(grid_path, grid)
+write_comparisons(val_images, val_masks, all_predictions, best_threshold, comparacoes_folder)
+
+# GRID com as comparações (limitado e paginado)
+grid_limit = args.grid_max if args.grid_max > 0 else None
+grid_paths = write_grids(
+    val_images, val_masks, all_predictions, best_threshold,
+    os.path.join(output_folder, 'grid_todas_comparacoes.png'),
+    page_size=args.grid_pagina, limit=grid_limit
+)
+grid_path = grid_paths[0] if grid_paths else os.path.join(output_folder, 'grid_todas_comparacoes.png')
+report.stop('artefatos', len(val_images))
 
 print(f"🎉 TODAS as comparações criadas!")
 print(f"   📁 Pasta individual: {comparacoes_folder}/")
-print(f"   🖼️ Grid completo: {grid_path}")
+print(f"   🖼️ Grid: {len(grid_paths)} página(s), {min(len(val_images), grid_limit or len(val_images))} imagens "
+      f"({grid_path}{' ...' if len(grid_paths) > 1 else ''})")
 
 # Salvar resultados (manter código original para primeira imagem)
 print(f"\n💾 Salvando resultados principais...")
@@ -330,10 +510,10 @@ predicted_mask = all_predictions[0]
 # 1. Imagem original (primeira de validação)
 original_bgr = cv2.cvtColor(test_image, cv2.COLOR_RGB2BGR)
 original_path = os.path.join(output_folder, 'imagem_original.png')
-cv2.imwrite(original_path, (original_bgr * 255).astype(np.uint8))
+cv2.imwrite(original_path, original_bgr)
 
 # 2. Máscara prevista (melhor threshold) - primeira imagem
-best_mask = (predicted_mask > best_threshold).astype(np.uint8)
+best_mask = (predicted_mask >= best_threshold).astype(np.uint8)
 mask_to_save = (best_mask.squeeze() * 255).astype(np.uint8)
 mask_path = os.path.join(output_folder, f'mascara_prevista_threshold_{best_threshold}.png')
 cv2.imwrite(mask_path, mask_to_save)
@@ -345,7 +525,7 @@ cv2.imwrite(real_mask_path, real_mask)
 
 # 4. Todas as máscaras por threshold (primeira imagem)
 for thresh in thresholds:
-    thresh_mask_result = (predicted_mask > thresh).astype(np.uint8)
+    thresh_mask_result = (predicted_mask >= thresh).astype(np.uint8)
     thresh_mask = (thresh_mask_result.squeeze() * 255).astype(np.uint8)
     thresh_path = os.path.join(output_folder, f'mascara_threshold_{thresh:.2f}.png')
     cv2.imwrite(thresh_path, thresh_mask)
@@ -373,7 +553,7 @@ try:
     # Comparação lado a lado
     mask_3ch = cv2.cvtColor(mask_to_save, cv2.COLOR_GRAY2BGR)
     real_mask_3ch = cv2.cvtColor(real_mask, cv2.COLOR_GRAY2BGR)
-    original_display = (original_bgr * 255).astype(np.uint8)
+    original_display = original_bgr
     comparison = np.hstack((original_display, real_mask_3ch, mask_3ch))
     
     plt.subplot(2, 4, 4)
@@ -385,7 +565,7 @@ try:
     for i, thresh in enumerate([0.1, 0.2, 0.3, 0.4]):
         if thresh in thresholds:  # Verificar se threshold existe
             plt.subplot(2, 4, 5 + i)
-            thresh_mask_plot = (predicted_mask > thresh).astype(np.uint8)
+            thresh_mask_plot = (predicted_mask >= thresh).astype(np.uint8)
             plt.imshow(thresh_mask_plot.squeeze(), cmap='gray')
             white_pixels = np.sum(thresh_mask_plot)
             percentage = (white_pixels / (128*128)) * 100
@@ -409,7 +589,7 @@ cv2.imwrite(comparison_path, comparison)
 print(f"\n🎉 RESULTADOS FINAIS:")
 print(f"   📁 Pasta: {output_folder}/")
 print(f"   🎯 Melhor threshold: {best_threshold}")
-best_percentage = (np.sum((predicted_mask > best_threshold).astype(np.uint8)) / (128*128)) * 100
+best_percentage = (np.sum((predicted_mask >= best_threshold).astype(np.uint8)) / (128*128)) * 100
 print(f"   📊 Detecção: {best_percentage:.1f}%")
 print(f"   🖼️ Principais arquivos:")
 print(f"      • {mask_path}")
@@ -422,8 +602,15 @@ print(f"      • {comparacoes_folder}/ (COMPARAÇÕES INDIVIDUAIS)")
 print(f"      • Total de {len(val_images)} imagens processadas!")
 
 print(f"\n💡 Para usar este threshold no script principal:")
-print(f"   predicted_mask_binary = (predicted_mask > {best_threshold}).astype(np.uint8)")
+print(f"   predicted_mask_binary = (predicted_mask >= {best_threshold}).astype(np.uint8)")
 
 print(f"\n🚀 Para carregar o modelo salvo:")
 print(f"   from tensorflow.keras.models import load_model")
 print(f"   model = load_model('{model_path}')")
+
+# Relatório final da execução
+report.save()
+print(f"\n⏱️ Relatório da execução: {report.path}")
+for name, stage in report.stages.items():
+    rate = f", {stage['imagens_por_s']} imagens/s" if stage.get('imagens_por_s') else ""
+    print(f"   • {name}: {stage['segundos']:.1f}s{rate}")
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Reexportação incremental para DXF, guiada por hashes do conteúdo
+
+Ao lado do DXF é gravado um índice (saida.dxf.idx) com o hash de cada
+feature (WKB da geometria + texto) e a posição em bytes das suas entidades
+no arquivo. Na próxima exportação:
+
+- enquanto as features chegam na mesma ordem e com o mesmo hash, nada é
+  gravado; se nada mudou, o DXF e o índice ficam como estão;
+- a partir da primeira diferença, o DXF é regravado: entidades de features
+  inalteradas são copiadas byte a byte do arquivo anterior (com os mesmos
+  handles) e só as features novas ou alteradas são convertidas, com handles
+  a partir do $HANDSEED anterior.
+
+O índice é descartado (exportação completa) se o DXF tiver sido alterado
+por fora ou se as opções de exportação mudarem.
+"""
+
+import hashlib
+import json
+import os
+from array import array
+from bisect import bisect_left
+
+try:
+    from .dxf_writer import BUFFER_SIZE, DXF_ENCODING, DXF_FOOTER, FIRST_HANDLE, dxf_header, point_text_entities
+except ImportError:  # Executado fora do pacote do plugin (linha de comando)
+    from dxf_writer import BUFFER_SIZE, DXF_ENCODING, DXF_FOOTER, FIRST_HANDLE, dxf_header, point_text_entities
+
+# Versão do formato do índice
+INDEX_VERSION = 1
+
+# Features convertidas ou copiadas por bloco
+CHUNK_SIZE = 5000
+
+INDEX_SUFFIX = ".idx"
+
+
+def feature_hash(wkb, text):
+    """Hash de 64 bits da geometria e do texto de uma feature"""
+    digest = hashlib.blake2b(wkb, digest_size=8)
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+class DXFIndex:
+    """Hash, posição e tamanho (em bytes) das entidades de cada feature no DXF"""
+
+    def __init__(self, settings=None, handseed=FIRST_HANDLE):
+        self.settings = settings or {}
+        self.handseed = handseed
+        self.hashes = array("Q")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def append(self, feature_hash_value, offset, length):
+        self.hashes.append(feature_hash_value)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    @classmethod
+    def load(cls, filename):
+        """Lê o índice (None se não existir ou estiver corrompido)"""
+        try:
+            with open(filename, "rb") as index_file:
+                header = json.loads(index_file.readline().decode("utf-8"))
+                if header.get("version") != INDEX_VERSION:
+                    return None
+                index = cls(header["settings"], header["handseed"])
+                count = header["count"]
+                index.hashes.fromfile(index_file, count)
+                index.offsets.fromfile(index_file, count)
+                index.lengths.fromfile(index_file, count)
+                index.dxf_size = header["dxf_size"]
+                index.dxf_mtime = header["dxf_mtime"]
+                return index
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+
+    def save(self, filename, dxf_filename):
+        """Grava o índice, com o tamanho e a data do DXF correspondente"""
+        stat = os.stat(dxf_filename)
+        header = {
+            "version": INDEX_VERSION,
+            "settings": self.settings,
+            "handseed": self.handseed,
+            "count": len(self),
+            "dxf_size": stat.st_size,
+            "dxf_mtime": stat.st_mtime_ns
+        }
+        temp_name = filename + ".tmp"
+        with open(temp_name, "wb") as index_file:
+            index_file.write(json.dumps(header).encode("utf-8") + b"\n")
+            self.hashes.tofile(index_file)
+            self.offsets.tofile(index_file)
+            self.lengths.tofile(index_file)
+        os.replace(temp_name, filename)
+
+    def matches(self, dxf_filename, settings):
+        """Indica se o índice corresponde ao DXF atual e às mesmas opções"""
+        try:
+            stat = os.stat(dxf_filename)
+        except OSError:
+            return False
+        return (
+            self.settings == settings
+            and stat.st_size == self.dxf_size
+            and stat.st_mtime_ns == self.dxf_mtime
+        )
+
+    def _lookup(self):
+        """Hashes ordenados, posição original de cada um e marcas de uso"""
+        if self._sorted is None:
+            # Busca binária em arrays compactos: cabe em memória mesmo com milhões de features
+            order = sorted(range(len(self.hashes)), key=self.hashes.__getitem__)
+            rank = array("I", [0]) * len(order)
+            for position, record in enumerate(order):
+                rank[record] = position
+            self._sorted = (array("Q", (self.hashes[i] for i in order)), array("I", order), rank, bytearray(len(order)))
+        return self._sorted
+
+    def take(self, feature_hash_value):
+        """Registro ainda não usado com esse hash (posição no índice ou None)"""
+        sorted_hashes, order, _rank, used = self._lookup()
+        position = bisect_left(sorted_hashes, feature_hash_value)
+        while position < len(sorted_hashes) and sorted_hashes[position] == feature_hash_value:
+            if not used[position]:
+                used[position] = 1
+                return order[position]
+            position += 1
+        return None
+
+    def discard(self, count):
+        """Marca como usados os primeiros count registros"""
+        _sorted_hashes, _order, rank, used = self._lookup()
+        for record in range(count):
+            used[rank[record]] = 1
+
+
+class IncrementalKMLToDXFConverter:
+    """Exporta para DXF reaproveitando as entidades da exportação anterior
+
+    Tem a mesma interface do KMLToDXFConverter (run, error, feedback e
+    output_file). Usa sempre o motor nativo com entidades TEXT.
+    """
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.output_file = converter.output_file
+        self.index_file = converter.output_file + INDEX_SUFFIX
+        self.feedback = converter.feedback
+        self.error = None
+        # Resumo da última execução: inalteradas, convertidas e removidas
+        self.stats = {"unchanged": 0, "converted": 0, "removed": 0}
+
+    @classmethod
+    def from_layer(cls, layer, text_field, output_file, **options):
+        """Cria o conversor a partir de uma camada vetorial (na thread principal)"""
+        try:
+            from .kml_to_dxf_core import KMLToDXFConverter
+        except ImportError:
+            from kml_to_dxf_core import KMLToDXFConverter
+
+        options["engine"] = "native"
+        return cls(KMLToDXFConverter.from_layer(layer, text_field, output_file, **options))
+
+    @classmethod
+    def from_kml_file(cls, path, text_field, output_file, **options):
+        """Cria o conversor lendo o arquivo KML/KMZ em fluxo"""
+        try:
+            from .kml_to_dxf_core import KMLToDXFConverter
+        except ImportError:
+            from kml_to_dxf_core import KMLToDXFConverter
+
+        options["engine"] = "native"
+        return cls(KMLToDXFConverter.from_kml_file(path, text_field, output_file, **options))
+
+    def invalid_features(self):
+        """Placemarks com geometria inválida na última leitura do KML (nº, name, erro)"""
+        return self.converter.invalid_features()
+
+    def settings(self):
+        """Opções que, se mudarem, invalidam as entidades já gravadas"""
+        converter = self.converter
+        return {
+            "text_field": converter.text_field,
+            "anchor": converter.anchor,
+            "text_height": converter.text_height,
+            "layer_name": converter.layer_name
+        }
+
+    def run(self):
+        """Executa a exportação; retorna True em caso de sucesso"""
+        temp_name = self.output_file + ".tmp"
+        try:
+            old_index = DXFIndex.load(self.index_file)
+            if old_index is not None and not old_index.matches(self.output_file, self.settings()):
+                old_index = None
+
+            ok = self.export(old_index, temp_name)
+            self.error = self.error or self.converter.error
+            self.converter.report_invalid_features()
+            return ok and not self.feedback.isCanceled()
+
+        except Exception as e:
+            self.error = str(e)
+            return False
+
+        finally:
+            if os.path.exists(temp_name):
+                try:
+                    os.remove(temp_name)
+                except OSError:
+                    pass
+
+    def export(self, old_index, temp_name):
+        """Compara as features com o índice anterior e regrava só o necessário"""
+        self.stats = {"unchanged": 0, "converted": 0, "removed": 0}
+        old_count = len(old_index) if old_index is not None else 0
+        handseed = old_index.handseed if old_index is not None else FIRST_HANDLE
+        new_index = DXFIndex(self.settings())
+        header_size = len(dxf_header(0).encode(DXF_ENCODING))
+
+        out = None
+        old_dxf = None
+        pending = []
+        position = 0
+
+        try:
+            for wkb, text in self.converter.iter_wkb_text(100):
+                value = feature_hash(wkb, text)
+
+                # Mesma ordem e mesmo conteúdo da exportação anterior: nada a gravar ainda
+                if out is None and position < old_count and old_index.hashes[position] == value:
+                    position += 1
+                    continue
+
+                if out is None:
+                    out, old_dxf = self.start_rewrite(old_index, position, new_index, temp_name, header_size)
+
+                # Inalteradas e alteradas passam pelo mesmo bloco: o DXF e o
+                # índice ficam na ordem da fonte e a próxima execução sem
+                # mudanças não precisa regravar nada
+                record = old_index.take(value) if old_index is not None else None
+                pending.append((value, wkb, text, record))
+                if len(pending) >= CHUNK_SIZE:
+                    handseed = self.write_records(out, old_dxf, old_index, pending, handseed, new_index)
+                    pending = []
+
+                position += 1
+
+            if self.feedback.isCanceled():
+                return False
+
+            # Nenhuma diferença e nenhuma feature removida: o DXF atual já está certo
+            if out is None and position == old_count and old_index is not None:
+                self.stats = {"unchanged": old_count, "converted": 0, "removed": 0}
+                self.feedback.setProgress(100)
+                return True
+
+            if out is None:
+                out, old_dxf = self.start_rewrite(old_index, position, new_index, temp_name, header_size)
+
+            if pending:
+                handseed = self.write_records(out, old_dxf, old_index, pending, handseed, new_index)
+
+            out.write(DXF_FOOTER.encode(DXF_ENCODING))
+            out.seek(0)
+            out.write(dxf_header(handseed).encode(DXF_ENCODING))
+
+        finally:
+            if out is not None:
+                out.close()
+            if old_dxf is not None:
+                old_dxf.close()
+
+        os.replace(temp_name, self.output_file)
+        new_index.handseed = handseed
+        new_index.save(self.index_file, self.output_file)
+
+        # Uma feature alterada some do índice e volta convertida: não conta como removida
+        self.stats["removed"] = max(0, old_count - self.stats["unchanged"] - self.stats["converted"])
+        self.feedback.setProgress(100)
+        return True
+
+    def start_rewrite(self, old_index, position, new_index, temp_name, header_size):
+        """Abre o DXF novo e copia de uma vez as entidades das features já conferidas"""
+        out = open(temp_name, "wb", buffering=BUFFER_SIZE)
+        out.write(dxf_header(0).encode(DXF_ENCODING))
+        if old_index is None:
+            return out, None
+
+        old_dxf = open(self.output_file, "rb")
+        if position:
+            # O cabeçalho tem tamanho fixo: as posições das entidades não mudam
+            end = old_index.offsets[position - 1] + old_index.lengths[position - 1]
+            old_dxf.seek(header_size)
+            remaining = end - header_size
+            while remaining > 0:
+                data = old_dxf.read(min(BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                out.write(data)
+                remaining -= len(data)
+
+            new_index.hashes.extend(old_index.hashes[:position])
+            new_index.offsets.extend(old_index.offsets[:position])
+            new_index.lengths.extend(old_index.lengths[:position])
+            # Essas entidades já foram copiadas e não podem ser reaproveitadas de novo
+            old_index.discard(position)
+
+        self.stats["unchanged"] += position
+        return out, old_dxf
+
+    def write_records(self, out, old_dxf, old_index, pending, handseed, new_index):
+        """Grava um bloco de features na ordem da fonte
+
+        Cada item é (hash, wkb, texto, registro no índice anterior). Com
+        registro, as entidades são copiadas do DXF anterior; sem, a feature
+        é convertida (os pontos de ancoragem do bloco são calculados de uma
+        vez).
+        """
+        converter = self.converter
+        converted = [wkb for _value, wkb, _text, record in pending if record is None]
+        points = iter(converter.wkb_anchor_points(converted) if converted else [])
+        layer = converter.layer_name
+        height = converter.text_height
+
+        for value, _wkb, text, record in pending:
+            offset = out.tell()
+            if record is not None:
+                length = old_index.lengths[record]
+                old_dxf.seek(old_index.offsets[record])
+                out.write(old_dxf.read(length))
+                new_index.append(value, offset, length)
+                continue
+
+            point = next(points)
+            if point is not None:
+                data, handseed = point_text_entities(handseed, layer, float(point[0]), float(point[1]), text, height)
+                out.write(data.encode(DXF_ENCODING, "dxf_unicode"))
+            new_index.append(value, offset, out.tell() - offset)
+
+        self.stats["unchanged"] += len(pending) - len(converted)
+        self.stats["converted"] += len(converted)
+        return handseed
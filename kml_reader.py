@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Leitor KML/KMZ em fluxo, sem carregar o documento inteiro
+
+Percorre o arquivo com iterparse e, a cada Placemark lido, gera a geometria
+(em WKB 2D) e os campos de texto (name, description e ExtendedData). Os
+elementos já processados são removidos da árvore, então a memória usada não
+cresce com o tamanho do documento. Arquivos KMZ são descompactados em fluxo.
+Placemarks com coordenadas inválidas saem sem geometria e ficam listados
+em invalid, sem interromper a leitura. Não depende do QGIS.
+"""
+
+import os
+import struct
+import sys
+import zipfile
+from array import array
+from xml.etree.ElementTree import iterparse
+
+# Byte de ordem do WKB gerado (ordem nativa, a mesma do array("d"))
+WKB_BYTE_ORDER = 1 if sys.byteorder == "little" else 0
+
+# Elementos que agrupam Placemarks e não podem ser descartados
+CONTAINERS = {"kml", "Document", "Folder"}
+
+
+def _local_name(tag):
+    """Nome do elemento sem o namespace"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_coordinates(text):
+    """Lê "lon,lat[,alt] lon,lat[,alt] ..." e retorna array("d") com x, y"""
+    values = array("d")
+    if not text:
+        return values
+    # Alguns arquivos usam espaço depois da vírgula: juntar antes de separar as tuplas
+    for item in text.replace(", ", ",").split():
+        parts = item.split(",")
+        if len(parts) >= 2:
+            values.append(float(parts[0]))
+            values.append(float(parts[1]))
+    return values
+
+
+def _wkb_header(wkb_type):
+    return struct.pack("=BI", WKB_BYTE_ORDER, wkb_type)
+
+
+def _point_wkb(values):
+    return _wkb_header(1) + values[:2].tobytes()
+
+
+def _line_wkb(values):
+    return _wkb_header(2) + struct.pack("=I", len(values) // 2) + values.tobytes()
+
+
+def _polygon_wkb(rings):
+    data = [_wkb_header(3), struct.pack("=I", len(rings))]
+    for values in rings:
+        data.append(struct.pack("=I", len(values) // 2))
+        data.append(values.tobytes())
+    return b"".join(data)
+
+
+class _CountingReader:
+    """Envolve um arquivo contando os bytes lidos (para o progresso)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.position = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.position += len(data)
+        return data
+
+
+class KMLStreamReader:
+    """Lê Placemarks de um arquivo KML ou KMZ em fluxo
+
+    invalid lista (nº do Placemark, name, erro) dos Placemarks da última
+    leitura cuja geometria não pôde ser lida.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.invalid = []
+        self._reader = None
+        self._size = 0
+
+    def _open(self):
+        """Abre o KML (ou o .kml principal de dentro do KMZ) como fluxo de bytes"""
+        if zipfile.is_zipfile(self.path):
+            archive = zipfile.ZipFile(self.path)
+            names = [info for info in archive.infolist() if info.filename.lower().endswith(".kml")]
+            if not names:
+                archive.close()
+                raise ValueError(f"Nenhum .kml dentro de {self.path}")
+            # Por convenção o documento principal é doc.kml ou o primeiro .kml
+            info = next((info for info in names if os.path.basename(info.filename).lower() == "doc.kml"), names[0])
+            self._size = info.file_size
+            return archive, archive.open(info)
+
+        self._size = os.path.getsize(self.path)
+        stream = open(self.path, "rb")
+        return None, stream
+
+    def progress(self):
+        """Fração do arquivo já lida (0 a 1)"""
+        if self._reader is None or not self._size:
+            return 0.0
+        return min(1.0, self._reader.position / self._size)
+
+    def iter_placemarks(self):
+        """Gera (wkb, campos) para cada Placemark; wkb é b"" se não houver geometria"""
+        archive, stream = self._open()
+        self._reader = _CountingReader(stream)
+        self.invalid = []
+        try:
+            stack = []
+            in_placemark = 0
+            number = 0
+            for event, element in iterparse(self._reader, events=("start", "end")):
+                if event == "start":
+                    stack.append(element)
+                    if _local_name(element.tag) == "Placemark":
+                        in_placemark += 1
+                    continue
+
+                stack.pop()
+                tag = _local_name(element.tag)
+                if tag == "Placemark":
+                    in_placemark -= 1
+                    number += 1
+                    fields = self._placemark_fields(element)
+                    try:
+                        wkb = self._placemark_geometry(element)
+                    except ValueError as e:
+                        # Coordenadas malformadas: a feature segue sem geometria
+                        self.invalid.append((number, fields.get("name", ""), str(e)))
+                        wkb = b""
+                    yield wkb, fields
+                elif in_placemark or tag in CONTAINERS:
+                    continue
+
+                # Descartar o elemento já processado para a memória não crescer
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+        finally:
+            stream.close()
+            if archive is not None:
+                archive.close()
+
+    def iter_geometry_text(self, text_field):
+        """Gera (wkb, texto) com o valor do campo text_field de cada Placemark"""
+        key = text_field.lower()
+        for wkb, fields in self.iter_placemarks():
+            yield wkb, fields.get(key, "")
+
+    def peek_fields(self, limit=100):
+        """Nomes dos campos encontrados nos primeiros Placemarks"""
+        names = ["name", "description"]
+        for index, (_wkb, fields) in enumerate(self.iter_placemarks()):
+            for name in fields:
+                if name not in names:
+                    names.append(name)
+            if index + 1 >= limit:
+                break
+        return names
+
+    def _placemark_fields(self, placemark):
+        """name, description e ExtendedData (chaves em minúsculas)"""
+        fields = {}
+        for child in placemark:
+            tag = _local_name(child.tag)
+            if tag in ("name", "description"):
+                fields[tag] = (child.text or "").strip()
+            elif tag == "ExtendedData":
+                for data in child.iter():
+                    data_tag = _local_name(data.tag)
+                    if data_tag == "Data" and data.get("name"):
+                        value = next((item for item in data if _local_name(item.tag) == "value"), None)
+                        fields[data.get("name").lower()] = ((value.text if value is not None else "") or "").strip()
+                    elif data_tag == "SimpleData" and data.get("name"):
+                        fields[data.get("name").lower()] = (data.text or "").strip()
+        return fields
+
+    def _placemark_geometry(self, placemark):
+        """Geometria do Placemark em WKB (b"" se não houver)"""
+        for child in placemark:
+            wkb, _kind = self._geometry_wkb(child)
+            if wkb:
+                return wkb
+        return b""
+
+    def _geometry_wkb(self, element):
+        """Converte um elemento de geometria KML em (wkb, tipo WKB simples)"""
+        tag = _local_name(element.tag)
+
+        if tag == "Point":
+            values = _parse_coordinates(self._child_text(element, "coordinates"))
+            return (_point_wkb(values), 1) if len(values) >= 2 else (b"", None)
+
+        if tag in ("LineString", "LinearRing"):
+            values = _parse_coordinates(self._child_text(element, "coordinates"))
+            return (_line_wkb(values), 2) if len(values) >= 4 else (b"", None)
+
+        if tag == "Track":
+            # gx:Track: cada gx:coord é "lon lat alt"
+            values = array("d")
+            for coord in element:
+                if _local_name(coord.tag) == "coord" and coord.text:
+                    parts = coord.text.split()
+                    if len(parts) >= 2:
+                        values.append(float(parts[0]))
+                        values.append(float(parts[1]))
+            return (_line_wkb(values), 2) if len(values) >= 4 else (b"", None)
+
+        if tag == "Polygon":
+            rings = []
+            for boundary in element:
+                boundary_tag = _local_name(boundary.tag)
+                if boundary_tag not in ("outerBoundaryIs", "innerBoundaryIs"):
+                    continue
+                for ring in boundary:
+                    if _local_name(ring.tag) == "LinearRing":
+                        values = _parse_coordinates(self._child_text(ring, "coordinates"))
+                        if len(values) >= 6:
+                            # Anel externo sempre primeiro
+                            if boundary_tag == "outerBoundaryIs":
+                                rings.insert(0, values)
+                            else:
+                                rings.append(values)
+            return (_polygon_wkb(rings), 3) if rings else (b"", None)
+
+        if tag in ("MultiGeometry", "MultiTrack"):
+            members = []
+            for child in element:
+                wkb, kind = self._geometry_wkb(child)
+                if wkb:
+                    members.append((wkb, kind))
+            if not members:
+                return b"", None
+            kinds = {kind for _wkb, kind in members}
+            # Multi* se todos os membros forem do mesmo tipo simples; senão coleção
+            wkb_type = {1: 4, 2: 5, 3: 6}.get(kinds.pop(), 7) if len(kinds) == 1 else 7
+            return _wkb_header(wkb_type) + struct.pack("=I", len(members)) + b"".join(wkb for wkb, _kind in members), wkb_type
+
+        return b"", None
+
+    def _child_text(self, element, name):
+        for child in element:
+            if _local_name(child.tag) == name:
+                return child.text
+        return None
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Plugin QGIS para converter KML para DXF preservando texto
+
+Os diálogos (Qt Widgets) só são importados quando a ferramenta é aberta,
+para que o provedor do Processing carregue rápido e funcione sem iface
+(por exemplo no qgis_process).
+"""
+
+import os
+from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
+from qgis.core import QgsApplication
+
+from .processing_provider import KMLToDXFProvider
+
+
+class KMLToDXFPlugin:
+    def __init__(self, iface):
+        self.iface = iface
+        self.plugin_dir = os.path.dirname(__file__)
+        
+        # Inicializar locale
+        locale = (QSettings().value('locale/userLocale') or '')[0:2]
+        locale_path = os.path.join(
+            self.plugin_dir,
+            'i18n',
+            'KMLToDXF_{}.qm'.format(locale)
+        )
+        
+        if os.path.exists(locale_path):
+            self.translator = QTranslator()
+            self.translator.load(locale_path)
+            QCoreApplication.installTranslator(self.translator)
+            
+        # Declarar variáveis de instância
+        self.actions = []
+        self.dialog = None
+        self.batch_dialog = None
+        self.provider = None
+        self.menu = self.tr(u'&KML para DXF')
+        
+    def tr(self, message):
+        return QCoreApplication.translate('KMLToDXF', message)
+        
+    def add_action(self, icon_path, text, callback, enabled_flag=True,
+                   add_to_menu=True, add_to_toolbar=True, status_tip=None,
+                   whats_this=None, parent=None):
+        from qgis.PyQt.QtGui import QIcon
+        from qgis.PyQt.QtWidgets import QAction
+        
+        icon = QIcon(icon_path)
+        action = QAction(icon, text, parent)
+        action.triggered.connect(callback)
+        action.setEnabled(enabled_flag)
+        
+        if status_tip is not None:
+            action.setStatusTip(status_tip)
+            
+        if whats_this is not None:
+            action.setWhatsThis(whats_this)
+            
+        if add_to_toolbar:
+            self.iface.addToolBarIcon(action)
+            
+        if add_to_menu:
+            self.iface.addPluginToMenu(self.menu, action)
+            
+        self.actions.append(action)
+        return action
+        
+    def initProcessing(self):
+        """Registra o provedor do Processing (também usado pelo qgis_process)"""
+        if self.provider is None:
+            self.provider = KMLToDXFProvider()
+            QgsApplication.processingRegistry().addProvider(self.provider)
+            
+    def initGui(self):
+        """Cria as entradas no menu e toolbar"""
+        self.initProcessing()
+        
+        icon_path = os.path.join(self.plugin_dir, 'icon.png')
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Converter KML para DXF'),
+            callback=self.run,
+            parent=self.iface.mainWindow()
+        )
+        self.add_action(
+            icon_path,
+            text=self.tr(u'Converter KML para DXF em lote'),
+            callback=self.run_batch,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow()
+        )
+        
+    def unload(self):
+        """Remove as entradas do menu e toolbar"""
+        for action in self.actions:
+            self.iface.removePluginMenu(self.tr(u'&KML para DXF'), action)
+            self.iface.removeToolBarIcon(action)
+            
+        if self.provider is not None:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+            
+    def run(self):
+        """Executa o plugin"""
+        from .qgis_kml_to_dxf_plugin import KMLToDXFDialog
+        
+        # Reaproveitar o diálogo se houver uma conversão em andamento
+        if self.dialog is None or self.dialog.task is None:
+            self.dialog = KMLToDXFDialog(self.iface.mainWindow())
+        self.dialog.show()
+        self.dialog.raise_()
+        self.dialog.activateWindow()
+        
+    def run_batch(self):
+        """Executa a conversão em lote"""
+        from .qgis_kml_to_dxf_plugin import KMLToDXFBatchDialog
+        
+        if self.batch_dialog is None or not self.batch_dialog.is_running():
+            self.batch_dialog = KMLToDXFBatchDialog(self.iface.mainWindow())
+        self.batch_dialog.show()
+        self.batch_dialog.raise_()
+        self.batch_dialog.activateWindow()
+
+
+# Função para criar o plugin
+def classFactory(iface):
+    return KMLToDXFPlugin(iface)
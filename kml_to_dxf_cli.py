@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Conversão KML para DXF pela linha de comando, sem interface gráfica
+
+Uso (com o Python do QGIS):
+    python kml_to_dxf_cli.py entrada.kml -o saida.dxf --campo-texto Name
+    python kml_to_dxf_cli.py pasta/*.kml -o pasta_saida/ --motor native
+    python kml_to_dxf_cli.py grande.kmz -o saida.dxf --leitor-kml --campo-texto name
+    python kml_to_dxf_cli.py nacional.gpkg -o saida.dxf --motor native --processos 32
+    python kml_to_dxf_cli.py diario.kml -o diario.dxf --motor native --incremental
+
+Com mais de uma entrada, -o deve ser uma pasta e cada entrada gera um DXF
+com o mesmo nome. O código de saída é 0 se todas as conversões deram certo
+e 1 se alguma falhou, para uso em scripts.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv):
+    """Lê os argumentos (antes de carregar o QGIS, para o --help ser imediato)"""
+    parser = argparse.ArgumentParser(description="Converte camadas KML em DXF preservando texto")
+    parser.add_argument("entradas", nargs="+", help="arquivos KML/KMZ (ou qualquer fonte OGR)")
+    parser.add_argument("-o", "--saida", required=True, help="arquivo DXF (uma entrada) ou pasta de saída")
+    parser.add_argument("--campo-texto", default="Name", help="coluna com o texto (padrão: Name)")
+    parser.add_argument("--camada", help="nome da camada dentro do arquivo de entrada")
+    parser.add_argument("--motor", choices=["ogr", "native"], default="ogr", help="motor de exportação")
+    parser.add_argument("--altura-texto", type=float, default=1.0, help="altura do texto (motor nativo)")
+    parser.add_argument("--ancoragem", choices=["centroid", "point_on_surface", "line_midpoint"],
+                        default="centroid", help="ponto de ancoragem do texto em linhas e polígonos")
+    parser.add_argument("--sem-fluxo", action="store_true",
+                        help="usar a camada temporária em memória (motor ogr)")
+    parser.add_argument("--leitor-kml", action="store_true",
+                        help="ler arquivos .kml/.kmz em fluxo, sem carregar a camada pelo OGR")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos paralelos (só motor nativo; 0 = um por núcleo)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="só converter o que mudou desde a última exportação (motor nativo; "
+                             "grava um índice saida.dxf.idx ao lado do DXF)")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="não mostrar o progresso")
+    return parser.parse_args(argv)
+
+
+def output_paths(args):
+    """Arquivo DXF de saída de cada entrada"""
+    if len(args.entradas) == 1 and not os.path.isdir(args.saida):
+        return [args.saida]
+
+    os.makedirs(args.saida, exist_ok=True)
+    return [
+        os.path.join(args.saida, os.path.splitext(os.path.basename(path))[0] + ".dxf")
+        for path in args.entradas
+    ]
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if len(args.entradas) > 1 and os.path.splitext(args.saida)[1].lower() == ".dxf":
+        print("❌ Com várias entradas, --saida deve ser uma pasta", file=sys.stderr)
+        return 2
+
+    if args.processos != 1 and args.motor != "native":
+        print("❌ --processos requer --motor native", file=sys.stderr)
+        return 2
+
+    if args.incremental and (args.motor != "native" or args.processos != 1):
+        print("❌ --incremental requer --motor native e um único processo", file=sys.stderr)
+        return 2
+
+    # Carregar o QGIS só agora, sem interface gráfica
+    from qgis.core import QgsApplication, QgsFeedback, QgsVectorLayer
+    from incremental_export import IncrementalKMLToDXFConverter
+    from kml_to_dxf_core import KMLToDXFConverter
+    from parallel_export import ParallelKMLToDXFConverter
+
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    feedback = QgsFeedback()
+    signal.signal(signal.SIGINT, lambda *_: feedback.cancel())
+    if not args.silencioso:
+        feedback.progressChanged.connect(
+            lambda progress: print(f"\r   {progress:5.1f}%", end="", file=sys.stderr, flush=True)
+        )
+
+    failures = 0
+    try:
+        for path, output_file in zip(args.entradas, output_paths(args)):
+            options = dict(
+                streaming=not args.sem_fluxo,
+                engine=args.motor,
+                text_height=args.altura_texto,
+                anchor=args.ancoragem,
+                feedback=feedback
+            )
+
+            start = time.perf_counter()
+            factory = IncrementalKMLToDXFConverter if args.incremental else KMLToDXFConverter
+            if args.processos != 1:
+                factory = ParallelKMLToDXFConverter
+                options["workers"] = args.processos or None
+            if args.leitor_kml and path.lower().endswith((".kml", ".kmz")):
+                converter = factory.from_kml_file(path, args.campo_texto, output_file, **options)
+            else:
+                uri = path if not args.camada else f"{path}|layername={args.camada}"
+                layer = QgsVectorLayer(uri, os.path.basename(path), "ogr")
+                if not layer.isValid():
+                    print(f"❌ {path}: não foi possível abrir a camada", file=sys.stderr)
+                    failures += 1
+                    continue
+                converter = factory.from_layer(layer, args.campo_texto, output_file, **options)
+
+            ok = converter.run()
+            if not args.silencioso:
+                print("", file=sys.stderr)
+
+            if ok and args.incremental:
+                stats = converter.stats
+                print(f"✓ {path} -> {output_file} ({time.perf_counter() - start:.1f}s, "
+                      f"{stats['unchanged']} inalteradas, {stats['converted']} convertidas, "
+                      f"{stats['removed']} removidas)")
+            elif ok:
+                print(f"✓ {path} -> {output_file} ({time.perf_counter() - start:.1f}s)")
+            else:
+                print(f"❌ {path}: {converter.error or 'cancelado'}", file=sys.stderr)
+                failures += 1
+
+            for number, name, error in getattr(converter, "invalid_features", list)():
+                print(f"⚠️ {path}: Placemark {number} ({name or 'sem nome'}) sem geometria: {error}", file=sys.stderr)
+
+            if feedback.isCanceled():
+                break
+    finally:
+        app.exitQgis()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo da conversão KML para DXF, sem dependência de interface gráfica
+
+Usado pela tarefa do diálogo, pelo algoritmo do Processing e pela linha
+de comando.
+"""
+
+import os
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransformContext, QgsFeature, QgsFeatureRequest, QgsFeedback, QgsField, QgsFields, QgsGeometry, QgsPointXY, QgsProject, QgsVectorFileWriter, QgsVectorLayer, QgsVectorLayerFeatureSource, QgsWkbTypes
+
+try:
+    from .dxf_writer import DXFPointTextWriter
+    from .kml_reader import KMLStreamReader
+except ImportError:  # Executado fora do pacote do plugin (linha de comando)
+    from dxf_writer import DXFPointTextWriter
+    from kml_reader import KMLStreamReader
+
+# NumPy é opcional: sem ele, os pontos de ancoragem são calculados feature a feature
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    anchors_from_wkb = None
+else:
+    try:
+        from .anchor_points import anchors_from_wkb
+    except ImportError:
+        from anchor_points import anchors_from_wkb
+
+# Número de features convertidas por bloco antes de gravar no destino
+CHUNK_SIZE = 5000
+
+# Motores de exportação disponíveis
+ENGINES = ["ogr", "native"]
+
+# Onde o texto de linhas e polígonos é ancorado
+ANCHORS = ["centroid", "point_on_surface", "line_midpoint"]
+
+
+class KMLToDXFConverter:
+    """Converte uma fonte de features em pontos com texto e grava o DXF
+
+    A fonte pode ser qualquer objeto com getFeatures() (QgsVectorLayerFeatureSource,
+    QgsProcessingFeatureSource...) ou um KMLStreamReader, que lê o arquivo
+    KML/KMZ em fluxo sem carregar uma camada. Progresso e cancelamento
+    passam pelo QgsFeedback informado.
+    """
+    
+    def __init__(self, source, crs, feature_count, text_field, output_file, transform_context,
+                 streaming=True, engine="ogr", text_height=1.0, layer_name="0", anchor="centroid",
+                 bulk=True, feedback=None, fields=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Motor de exportação inválido: {engine}")
+        if anchor not in ANCHORS:
+            raise ValueError(f"Ponto de ancoragem inválido: {anchor}")
+            
+        self.source = source
+        self.crs = crs
+        self.feature_count = feature_count
+        self.text_field = text_field
+        self.output_file = output_file
+        self.transform_context = transform_context
+        self.streaming = streaming
+        self.engine = engine
+        self.text_height = text_height
+        self.layer_name = layer_name
+        self.anchor = anchor
+        self.bulk = bulk and anchors_from_wkb is not None
+        self.feedback = feedback if feedback is not None else QgsFeedback()
+        self.error = None
+        
+        # Índice da coluna de texto, resolvido uma única vez (None: resolver na 1ª feature)
+        if fields is None and callable(getattr(source, "fields", None)):
+            fields = source.fields()
+        self.text_index = fields.lookupField(text_field) if fields is not None else None
+        
+    @classmethod
+    def from_layer(cls, layer, text_field, output_file, **options):
+        """Cria o conversor a partir de uma camada vetorial
+
+        Deve ser chamado na thread principal; a conversão em si pode rodar
+        em outra thread, pois só usa a fonte de features da camada.
+        """
+        return cls(
+            QgsVectorLayerFeatureSource(layer),
+            layer.crs(),
+            layer.featureCount(),
+            text_field,
+            output_file,
+            QgsProject.instance().transformContext(),
+            fields=layer.fields(),
+            **options
+        )
+        
+    @classmethod
+    def from_kml_file(cls, path, text_field, output_file, **options):
+        """Cria o conversor lendo o arquivo KML/KMZ direto, sem camada do QGIS
+
+        O texto vem de name, description ou de um campo do ExtendedData
+        (sem diferenciar maiúsculas). Coordenadas KML são sempre WGS 84.
+        """
+        return cls(
+            KMLStreamReader(path),
+            QgsCoordinateReferenceSystem("EPSG:4326"),
+            0,
+            text_field,
+            output_file,
+            QgsCoordinateTransformContext(),
+            **options
+        )
+        
+    def run(self):
+        """Executa a conversão; retorna True em caso de sucesso"""
+        try:
+            if self.engine == "native":
+                ok = self.write_dxf_native()
+            elif self.streaming:
+                ok = self.write_dxf_streaming()
+            else:
+                ok = self.write_dxf_from_memory_layer()
+                
+            if self.feedback.isCanceled():
+                self.remove_partial_output()
+                return False
+                
+            self.report_invalid_features()
+            return ok
+            
+        except Exception as e:
+            self.error = str(e)
+            return False
+            
+    def invalid_features(self):
+        """Placemarks com geometria inválida na última leitura do KML (nº, name, erro)"""
+        return list(getattr(self.source, "invalid", []))
+        
+    def report_invalid_features(self):
+        """Avisa no feedback (Processing) os Placemarks ignorados por geometria inválida"""
+        push_warning = getattr(self.feedback, "pushWarning", None)
+        if push_warning is None:
+            return
+        for number, name, error in self.invalid_features():
+            push_warning(f"Placemark {number} ({name or 'sem nome'}) sem geometria: {error}")
+            
+    def output_fields(self):
+        """Campos da camada de saída"""
+        fields = QgsFields()
+        fields.append(QgsField("id", 4))  # Integer
+        fields.append(QgsField("text", 10))  # String
+        return fields
+        
+    def dxf_save_options(self):
+        """Opções do QgsVectorFileWriter para o driver DXF"""
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = "DXF"
+        options.fileEncoding = "UTF-8"
+        
+        # Configurações específicas para DXF
+        options.datasourceOptions = [
+            "HEADER=MINIMAL"  # Cabeçalho mínimo para compatibilidade
+        ]
+        return options
+        
+    def write_dxf_streaming(self):
+        """Converte e grava as features direto no DXF, bloco a bloco (memória constante)"""
+        fields = self.output_fields()
+        
+        writer = QgsVectorFileWriter.create(
+            self.output_file,
+            fields,
+            QgsWkbTypes.Point,
+            self.crs,
+            self.transform_context,
+            self.dxf_save_options()
+        )
+        
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            self.error = f"Erro ao criar arquivo DXF: {writer.errorMessage()}"
+            return False
+            
+        try:
+            for chunk in self.iter_converted_chunks(fields, 100):
+                if not writer.addFeatures(chunk):
+                    self.error = f"Erro ao gravar no arquivo DXF: {writer.errorMessage()}"
+                    return False
+        finally:
+            # O arquivo só é finalizado quando o writer é destruído
+            del writer
+            
+        return not self.feedback.isCanceled()
+        
+    def write_dxf_native(self):
+        """Grava o DXF com o escritor nativo (POINT + TEXT em blocos grandes)"""
+        with DXFPointTextWriter(self.output_file, layer=self.layer_name, text_height=self.text_height) as writer:
+            for rows in self.iter_anchor_rows(100):
+                writer.add_many(rows)
+                
+        return not self.feedback.isCanceled()
+        
+    def write_dxf_from_memory_layer(self):
+        """Cria a camada temporária em memória e exporta com writeAsVectorFormatV3"""
+        # Criar camada temporária para pontos com texto (0% a 70%)
+        temp_layer = self.create_point_layer_with_text()
+        
+        if self.feedback.isCanceled():
+            return False
+            
+        if not temp_layer:
+            self.error = "Erro ao criar camada temporária!"
+            return False
+            
+        # Exportar para DXF (70% a 100%), com feedback próprio para o writer
+        writer_feedback = QgsFeedback()
+        writer_feedback.progressChanged.connect(lambda progress: self.feedback.setProgress(70 + progress * 0.3))
+        self.feedback.canceled.connect(writer_feedback.cancel)
+        
+        options = self.dxf_save_options()
+        options.feedback = writer_feedback
+        
+        error = QgsVectorFileWriter.writeAsVectorFormatV3(
+            temp_layer,
+            self.output_file,
+            self.transform_context,
+            options
+        )
+        
+        if error[0] != QgsVectorFileWriter.NoError:
+            self.error = f"Erro ao criar arquivo DXF: {error[1]}"
+            return False
+            
+        return True
+        
+    def remove_partial_output(self):
+        """Remove o arquivo DXF incompleto deixado por uma exportação cancelada"""
+        if os.path.exists(self.output_file):
+            try:
+                os.remove(self.output_file)
+            except OSError:
+                pass
+                
+    def text_value(self, feature):
+        """Valor da coluna de texto da feature ("" se a coluna não existir)"""
+        if self.text_index is None:
+            self.text_index = feature.fields().lookupField(self.text_field)
+        return feature.attribute(self.text_index) if self.text_index >= 0 else ""
+        
+    def feature_request(self):
+        """Requisição que busca só a coluna de texto (e a geometria)"""
+        request = QgsFeatureRequest()
+        if self.text_index is not None:
+            request.setSubsetOfAttributes([self.text_index] if self.text_index >= 0 else [])
+        return request
+        
+    def anchor_geometry(self, geom):
+        """Ponto onde o texto é ancorado (None se a geometria não é suportada)"""
+        if geom.type() == QgsWkbTypes.PointGeometry:
+            # Se já é ponto, usar diretamente
+            return geom
+        elif geom.type() == QgsWkbTypes.LineGeometry:
+            # Para linhas, o centroide ou o ponto na metade do comprimento
+            if self.anchor == "centroid":
+                return geom.centroid()
+            return geom.interpolate(geom.length() / 2.0)
+        elif geom.type() == QgsWkbTypes.PolygonGeometry:
+            # Para polígonos, o centroide ou um ponto garantidamente interno
+            if self.anchor == "point_on_surface":
+                return geom.pointOnSurface()
+            return geom.centroid()
+        return None
+        
+    def anchor_point(self, geom):
+        """Coordenadas do ponto de ancoragem (None se não houver)"""
+        point_geom = self.anchor_geometry(geom)
+        if point_geom is None or point_geom.isEmpty():
+            return None
+            
+        # Multipontos viram um único ponto de ancoragem
+        if point_geom.isMultipart():
+            point_geom = point_geom.centroid()
+            
+        return point_geom.asPoint()
+        
+    def anchor_rows(self, features):
+        """Converte um bloco de features em tuplas (x, y, texto)"""
+        rows = []
+        
+        if not self.bulk:
+            for feature in features:
+                point = self.anchor_point(feature.geometry())
+                if point is not None:
+                    rows.append((point.x(), point.y(), str(self.text_value(feature))))
+            return rows
+            
+        # Cálculo vetorizado do bloco inteiro; o QGIS só é usado para o que o NumPy não trata
+        geometries = [feature.geometry() for feature in features]
+        xs, ys, valid = anchors_from_wkb([bytes(geom.asWkb()) for geom in geometries], self.anchor)
+        
+        for feature, geom, x, y, ok in zip(features, geometries, xs.tolist(), ys.tolist(), valid.tolist()):
+            if not ok:
+                point = self.anchor_point(geom)
+                if point is None:
+                    continue
+                x, y = point.x(), point.y()
+            rows.append((x, y, str(self.text_value(feature))))
+            
+        return rows
+        
+    def wkb_anchor_points(self, wkbs):
+        """Ponto de ancoragem (x, y) de cada geometria WKB (None se não houver)"""
+        if self.bulk:
+            xs, ys, valid = anchors_from_wkb(wkbs, self.anchor)
+            points = [(x, y) if ok else None for x, y, ok in zip(xs.tolist(), ys.tolist(), valid.tolist())]
+        else:
+            points = [None] * len(wkbs)
+            
+        # O QGIS só é usado para o que o cálculo vetorizado não trata
+        for index, wkb in enumerate(wkbs):
+            if points[index] is None and wkb:
+                geom = QgsGeometry()
+                geom.fromWkb(wkb)
+                point = self.anchor_point(geom)
+                if point is not None:
+                    points[index] = (point.x(), point.y())
+                    
+        return points
+        
+    def wkb_anchor_rows(self, wkbs, texts):
+        """Converte um bloco de geometrias WKB e textos em tuplas (x, y, texto)"""
+        return [
+            (point[0], point[1], text)
+            for point, text in zip(self.wkb_anchor_points(wkbs), texts)
+            if point is not None
+        ]
+        
+    def iter_reader_rows(self, progress_span):
+        """Lê o KML em fluxo e gera blocos de até CHUNK_SIZE tuplas (x, y, texto)"""
+        wkbs = []
+        texts = []
+        last_progress = -1
+        
+        for wkb, text in self.source.iter_geometry_text(self.text_field):
+            if self.feedback.isCanceled():
+                return
+                
+            wkbs.append(wkb)
+            texts.append(text)
+            if len(wkbs) < CHUNK_SIZE:
+                continue
+                
+            # O total de Placemarks não é conhecido: progresso pelos bytes lidos
+            progress = int(self.source.progress() * progress_span)
+            if progress != last_progress:
+                self.feedback.setProgress(progress)
+                last_progress = progress
+                
+            yield self.wkb_anchor_rows(wkbs, texts)
+            wkbs = []
+            texts = []
+            
+        if wkbs and not self.feedback.isCanceled():
+            yield self.wkb_anchor_rows(wkbs, texts)
+            
+    def iter_wkb_text(self, progress_span):
+        """Gera (wkb, texto) de cada feature da origem, seja camada ou leitor KML"""
+        if isinstance(self.source, KMLStreamReader):
+            last_progress = -1
+            for index, (wkb, text) in enumerate(self.source.iter_geometry_text(self.text_field)):
+                if index % CHUNK_SIZE == 0:
+                    if self.feedback.isCanceled():
+                        return
+                    progress = int(self.source.progress() * progress_span)
+                    if progress != last_progress:
+                        self.feedback.setProgress(progress)
+                        last_progress = progress
+                yield wkb, text
+            return
+            
+        for feature in self.iter_source_features(progress_span):
+            geom = feature.geometry()
+            yield (b"" if geom.isNull() else bytes(geom.asWkb())), str(self.text_value(feature))
+            
+    def iter_source_features(self, progress_span):
+        """Percorre a camada de origem atualizando o progresso e parando se cancelada"""
+        total = max(self.feature_count, 1)
+        last_progress = -1
+        
+        for index, feature in enumerate(self.source.getFeatures(self.feature_request())):
+            if self.feedback.isCanceled():
+                return
+                
+            # Atualizar progresso só quando o percentual muda
+            progress = int(index * progress_span / total)
+            if progress != last_progress:
+                self.feedback.setProgress(progress)
+                last_progress = progress
+                
+            yield feature
+            
+    def iter_anchor_rows(self, progress_span):
+        """Lê a camada de origem e gera blocos de até CHUNK_SIZE tuplas (x, y, texto)"""
+        if isinstance(self.source, KMLStreamReader):
+            yield from self.iter_reader_rows(progress_span)
+            return
+            
+        features = []
+        
+        for feature in self.iter_source_features(progress_span):
+            features.append(feature)
+            if len(features) >= CHUNK_SIZE:
+                yield self.anchor_rows(features)
+                features = []
+                
+        if features:
+            yield self.anchor_rows(features)
+            
+    def iter_converted_chunks(self, fields, progress_span):
+        """Lê a camada de origem e gera listas de até CHUNK_SIZE pontos convertidos"""
+        feature_id = 1
+        # Lista reaproveitada entre as features; setAttributes copia os valores
+        attributes = [None, None]
+        
+        for rows in self.iter_anchor_rows(progress_span):
+            chunk = []
+            for x, y, text in rows:
+                new_feature = QgsFeature(fields)
+                new_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+                attributes[0] = feature_id
+                attributes[1] = text
+                new_feature.setAttributes(attributes)
+                chunk.append(new_feature)
+                feature_id += 1
+                
+            yield chunk
+            
+    def create_point_layer_with_text(self):
+        """Cria uma camada de pontos com o texto como atributo"""
+        try:
+            fields = self.output_fields()
+            
+            # Criar camada temporária
+            temp_layer = QgsVectorLayer(
+                "Point?crs=" + self.crs.authid(),
+                "temp_points",
+                "memory"
+            )
+            
+            temp_layer.dataProvider().addAttributes(fields)
+            temp_layer.updateFields()
+            
+            # Adicionar features à camada
+            for chunk in self.iter_converted_chunks(fields, 70):
+                temp_layer.dataProvider().addFeatures(chunk)
+                
+            if self.feedback.isCanceled():
+                return None
+                
+            temp_layer.updateExtents()
+            
+            return temp_layer
+            
+        except Exception as e:
+            print(f"Erro ao criar camada de pontos: {str(e)}")
+            return None
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação KML para DXF em vários processos
+
+A origem (camada ou arquivo KML) é lida uma única vez, no processo
+principal, em blocos de CHUNK_SIZE features (WKB da geometria + texto).
+Cada bloco vai para um processo de trabalho, que calcula os pontos de
+ancoragem com NumPy e codifica as entidades POINT/TEXT em bytes; o
+processo principal grava os blocos no DXF na ordem de leitura. Os
+processos de trabalho não abrem a origem nem dependem do QGIS: a leitura
+não se repete e o trabalho de CPU é dividido entre eles.
+
+Cada feature tem dois handles reservados (POINT e TEXT), a partir do
+início do seu bloco, então os blocos podem ser codificados em qualquer
+ordem sem handles repetidos. Geometrias que o cálculo vetorizado não
+trata (curvas, coleções) voltam para o processo principal, que usa o
+QgsGeometry como no caminho de um processo só.
+"""
+
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .dxf_writer import BUFFER_SIZE, DXF_ENCODING, DXF_FOOTER, FIRST_HANDLE, dxf_header, point_text_entities
+except ImportError:  # Executado fora do pacote do plugin (linha de comando)
+    from dxf_writer import BUFFER_SIZE, DXF_ENCODING, DXF_FOOTER, FIRST_HANDLE, dxf_header, point_text_entities
+
+# NumPy é obrigatório nos processos de trabalho; sem ele a conversão roda em um só processo
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    anchors_from_wkb = None
+else:
+    try:
+        from .anchor_points import anchors_from_wkb
+    except ImportError:
+        from anchor_points import anchors_from_wkb
+
+# Features por bloco enviado a um processo
+CHUNK_SIZE = 5000
+
+# Blocos em andamento por processo (limita a memória usada pelos blocos)
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Handles reservados por feature: POINT e TEXT
+HANDLES_PER_FEATURE = 2
+
+
+def python_executable():
+    """Interpretador Python para os processos (no QGIS, sys.executable é o próprio QGIS)"""
+    executable = sys.executable
+    if os.path.basename(executable).lower().startswith("python"):
+        return executable
+
+    for name in ("python.exe", "python3.exe", os.path.join("bin", "python3"), os.path.join("bin", "python")):
+        candidate = os.path.join(sys.exec_prefix, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return executable
+
+
+def encode_chunk(wkbs, texts, anchor, layer, height, first_handle):
+    """Codifica um bloco de features em entidades DXF (roda no processo de trabalho)
+
+    A feature i do bloco usa os handles first_handle + 2 * i e o
+    seguinte. Retorna (bytes das entidades, índices das features com
+    geometria que o cálculo vetorizado não tratou).
+    """
+    xs, ys, valid = anchors_from_wkb(wkbs, anchor)
+    parts = []
+    fallback = []
+    for index, (x, y, ok, text) in enumerate(zip(xs.tolist(), ys.tolist(), valid.tolist(), texts)):
+        if not ok:
+            if wkbs[index]:
+                fallback.append(index)
+            continue
+        data, _handle = point_text_entities(first_handle + HANDLES_PER_FEATURE * index, layer, x, y, text, height)
+        parts.append(data)
+    return "".join(parts).encode(DXF_ENCODING, "dxf_unicode"), fallback
+
+
+class ParallelKMLToDXFConverter:
+    """Converte uma camada ou arquivo KML em DXF usando vários processos
+
+    Tem a mesma interface do KMLToDXFConverter (run, error, feedback e
+    output_file), então pode ser usado pela tarefa do diálogo, pelo
+    Processing e pela linha de comando. Usa sempre o motor nativo; a
+    leitura da origem fica com o KMLToDXFConverter recebido.
+    """
+
+    def __init__(self, converter, workers=None):
+        self.converter = converter
+        self.output_file = converter.output_file
+        self.feedback = converter.feedback
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.error = None
+
+    @classmethod
+    def from_layer(cls, layer, text_field, output_file, workers=None, **options):
+        """Cria o conversor a partir de uma camada vetorial (na thread principal)"""
+        try:
+            from .kml_to_dxf_core import KMLToDXFConverter
+        except ImportError:
+            from kml_to_dxf_core import KMLToDXFConverter
+
+        options["engine"] = "native"
+        return cls(KMLToDXFConverter.from_layer(layer, text_field, output_file, **options), workers)
+
+    @classmethod
+    def from_kml_file(cls, path, text_field, output_file, workers=None, **options):
+        """Cria o conversor lendo o arquivo KML/KMZ em fluxo"""
+        try:
+            from .kml_to_dxf_core import KMLToDXFConverter
+        except ImportError:
+            from kml_to_dxf_core import KMLToDXFConverter
+
+        options["engine"] = "native"
+        return cls(KMLToDXFConverter.from_kml_file(path, text_field, output_file, **options), workers)
+
+    def run(self):
+        """Executa a conversão; retorna True em caso de sucesso"""
+        if anchors_from_wkb is None or not self.converter.bulk:
+            return self.run_single_process()
+
+        try:
+            ok = self.write_dxf()
+            if self.feedback.isCanceled():
+                self.converter.remove_partial_output()
+                return False
+            self.converter.report_invalid_features()
+            return ok
+
+        except Exception as e:
+            self.error = str(e)
+            return False
+
+    def run_single_process(self):
+        """Conversão em um só processo (sem NumPy ou com o cálculo vetorizado desligado)"""
+        ok = self.converter.run()
+        self.error = self.converter.error
+        return ok
+
+    def invalid_features(self):
+        """Placemarks com geometria inválida na última leitura do KML (nº, name, erro)"""
+        return self.converter.invalid_features()
+
+    def iter_chunks(self):
+        """Lê a origem uma vez e gera blocos (wkbs, textos) de até CHUNK_SIZE features"""
+        wkbs = []
+        texts = []
+        for wkb, text in self.converter.iter_wkb_text(90):
+            wkbs.append(wkb)
+            texts.append(text)
+            if len(wkbs) >= CHUNK_SIZE:
+                yield wkbs, texts
+                wkbs = []
+                texts = []
+
+        if wkbs and not self.feedback.isCanceled():
+            yield wkbs, texts
+
+    def write_dxf(self):
+        """Distribui a codificação dos blocos entre os processos e grava o DXF em ordem"""
+        converter = self.converter
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(python_executable())
+        handle = FIRST_HANDLE
+
+        with open(self.output_file, "wb", buffering=BUFFER_SIZE) as out, \
+                ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            out.write(dxf_header(0).encode(DXF_ENCODING))
+            in_flight = deque()
+
+            for wkbs, texts in self.iter_chunks():
+                future = pool.submit(
+                    encode_chunk, wkbs, texts, converter.anchor, converter.layer_name, converter.text_height, handle
+                )
+                in_flight.append((future, wkbs, texts, handle))
+                handle += HANDLES_PER_FEATURE * len(wkbs)
+
+                # Gravar na ordem de leitura, sem acumular blocos sem limite
+                while len(in_flight) >= self.workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                    self.write_chunk(out, *in_flight.popleft())
+
+            if self.feedback.isCanceled():
+                for future, *_chunk in in_flight:
+                    future.cancel()
+                return False
+
+            while in_flight:
+                self.write_chunk(out, *in_flight.popleft())
+
+            out.write(DXF_FOOTER.encode(DXF_ENCODING))
+            out.seek(0)
+            out.write(dxf_header(handle).encode(DXF_ENCODING))
+
+        self.feedback.setProgress(100)
+        return True
+
+    def write_chunk(self, out, future, wkbs, texts, first_handle):
+        """Grava um bloco codificado e, depois dele, as features que precisaram do QGIS"""
+        data, fallback = future.result()
+        out.write(data)
+        if not fallback:
+            return
+
+        converter = self.converter
+        points = converter.wkb_anchor_points([wkbs[index] for index in fallback])
+        for index, point in zip(fallback, points):
+            if point is None:
+                continue
+            data, _handle = point_text_entities(
+                first_handle + HANDLES_PER_FEATURE * index, converter.layer_name,
+                point[0], point[1], texts[index], converter.text_height
+            )
+            out.write(data.encode(DXF_ENCODING, "dxf_unicode"))
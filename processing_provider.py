@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Provedor do Processing com o algoritmo de conversão KML para DXF
+
+Permite rodar a conversão pela caixa de ferramentas, em modelos, em lote
+e sem interface gráfica com o qgis_process:
+
+    qgis_process run kmltodxf:kmltodxf -- INPUT=entrada.kml TEXT_FIELD=Name OUTPUT=saida.dxf
+    qgis_process run kmltodxf:kmlfiletodxf -- INPUT=grande.kmz TEXT_FIELD=name OUTPUT=saida.dxf
+"""
+
+import os
+from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingException, QgsProcessingParameterBoolean,
+                       QgsProcessingParameterEnum, QgsProcessingParameterFeatureSource, QgsProcessingParameterField,
+                       QgsProcessingParameterFile, QgsProcessingParameterFileDestination, QgsProcessingParameterNumber,
+                       QgsProcessingParameterString, QgsProcessingProvider)
+
+from .incremental_export import IncrementalKMLToDXFConverter
+from .kml_to_dxf_core import ANCHORS, ENGINES, KMLToDXFConverter
+from .parallel_export import ParallelKMLToDXFConverter
+
+
+class KMLToDXFAlgorithm(QgsProcessingAlgorithm):
+    """Converte uma camada em pontos com texto e grava um DXF"""
+
+    INPUT = "INPUT"
+    TEXT_FIELD = "TEXT_FIELD"
+    ENGINE = "ENGINE"
+    STREAMING = "STREAMING"
+    TEXT_HEIGHT = "TEXT_HEIGHT"
+    ANCHOR = "ANCHOR"
+    WORKERS = "WORKERS"
+    INCREMENTAL = "INCREMENTAL"
+    OUTPUT = "OUTPUT"
+
+    def name(self):
+        return "kmltodxf"
+
+    def displayName(self):
+        return "Converter KML para DXF"
+
+    def shortHelpString(self):
+        return (
+            "Converte pontos, linhas e polígonos em pontos (linhas e polígonos pelo centroide, "
+            "por um ponto sobre a superfície ou pelo meio da linha) "
+            "e grava um DXF preservando a coluna de texto escolhida. O motor nativo grava "
+            "entidades POINT + TEXT diretamente, sem o driver DXF do OGR."
+        )
+
+    def createInstance(self):
+        return KMLToDXFAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT,
+            "Camada KML",
+            [QgsProcessing.TypeVectorAnyGeometry]
+        ))
+        self.addParameter(QgsProcessingParameterField(
+            self.TEXT_FIELD,
+            "Coluna de texto",
+            parentLayerParameterName=self.INPUT,
+            type=QgsProcessingParameterField.String
+        ))
+        self.add_export_parameters()
+        self.addParameter(QgsProcessingParameterNumber(
+            self.WORKERS,
+            "Processos paralelos (motor nativo; 0 = um por núcleo)",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=1
+        ))
+
+    def add_export_parameters(self):
+        """Parâmetros de exportação comuns aos algoritmos"""
+        self.addParameter(QgsProcessingParameterEnum(
+            self.ENGINE,
+            "Motor de exportação",
+            options=["QGIS/OGR (QgsVectorFileWriter)", "Nativo rápido (POINT + TEXT)"],
+            defaultValue=0
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.STREAMING,
+            "Exportação em fluxo (sem camada temporária em memória)",
+            defaultValue=True
+        ))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.TEXT_HEIGHT,
+            "Altura do texto (motor nativo)",
+            type=QgsProcessingParameterNumber.Double,
+            minValue=0.000001,
+            defaultValue=1.0
+        ))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.ANCHOR,
+            "Ancoragem do texto em linhas e polígonos",
+            options=["Centroide", "Ponto sobre a superfície", "Meio da linha"],
+            defaultValue=0
+        ))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.INCREMENTAL,
+            "Exportação incremental (motor nativo; reaproveita o DXF anterior)",
+            defaultValue=False
+        ))
+        self.addParameter(QgsProcessingParameterFileDestination(
+            self.OUTPUT,
+            "Arquivo DXF",
+            "Arquivos DXF (*.dxf)"
+        ))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        output_file = self.parameterAsFileOutput(parameters, self.OUTPUT, context)
+        options = self.export_options(parameters, context, feedback)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+
+        incremental = self.is_incremental(parameters, context, options)
+        converter = KMLToDXFConverter(
+            source,
+            source.sourceCrs(),
+            source.featureCount(),
+            self.parameterAsString(parameters, self.TEXT_FIELD, context),
+            output_file,
+            context.transformContext(),
+            **options
+        )
+        if incremental:
+            # Só as features novas ou alteradas são convertidas; o resto é copiado do DXF anterior
+            converter = IncrementalKMLToDXFConverter(converter)
+        elif workers != 1 and options["engine"] == "native":
+            # A origem é lida uma vez aqui; os processos só calculam e codificam os blocos
+            converter = ParallelKMLToDXFConverter(converter, workers or None)
+        return self.run_converter(converter, output_file, feedback)
+
+    def export_options(self, parameters, context, feedback):
+        """Opções do conversor lidas dos parâmetros de exportação"""
+        return dict(
+            streaming=self.parameterAsBoolean(parameters, self.STREAMING, context),
+            engine=ENGINES[self.parameterAsEnum(parameters, self.ENGINE, context)],
+            text_height=self.parameterAsDouble(parameters, self.TEXT_HEIGHT, context),
+            anchor=ANCHORS[self.parameterAsEnum(parameters, self.ANCHOR, context)],
+            feedback=feedback
+        )
+
+    def is_incremental(self, parameters, context, options):
+        """Indica se a exportação incremental foi pedida (só existe no motor nativo)"""
+        incremental = self.parameterAsBoolean(parameters, self.INCREMENTAL, context)
+        if incremental and options["engine"] != "native":
+            raise QgsProcessingException("A exportação incremental requer o motor nativo")
+        return incremental
+
+    def run_converter(self, converter, output_file, feedback):
+        """Executa a conversão e transforma falhas em QgsProcessingException"""
+        if not converter.run() and not feedback.isCanceled():
+            raise QgsProcessingException(converter.error or "Erro ao criar arquivo DXF")
+
+        return {self.OUTPUT: output_file}
+
+
+class KMLFileToDXFAlgorithm(KMLToDXFAlgorithm):
+    """Converte um arquivo KML/KMZ lido em fluxo, sem carregar a camada"""
+
+    def name(self):
+        return "kmlfiletodxf"
+
+    def displayName(self):
+        return "Converter arquivo KML/KMZ para DXF (leitura em fluxo)"
+
+    def shortHelpString(self):
+        return (
+            "Lê os Placemarks do arquivo KML ou KMZ em fluxo, sem carregar o documento "
+            "inteiro nem criar uma camada, e grava o DXF como o algoritmo \"Converter KML "
+            "para DXF\". A coluna de texto pode ser name, description ou um campo do "
+            "ExtendedData."
+        )
+
+    def createInstance(self):
+        return KMLFileToDXFAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFile(
+            self.INPUT,
+            "Arquivo KML/KMZ",
+            fileFilter="Arquivos KML (*.kml *.kmz)"
+        ))
+        self.addParameter(QgsProcessingParameterString(
+            self.TEXT_FIELD,
+            "Campo de texto",
+            defaultValue="name"
+        ))
+        self.add_export_parameters()
+
+    def processAlgorithm(self, parameters, context, feedback):
+        path = self.parameterAsFile(parameters, self.INPUT, context)
+        if not path or not os.path.isfile(path):
+            raise QgsProcessingException(f"Arquivo não encontrado: {path}")
+
+        output_file = self.parameterAsFileOutput(parameters, self.OUTPUT, context)
+        options = self.export_options(parameters, context, feedback)
+        factory = KMLToDXFConverter
+        if self.is_incremental(parameters, context, options):
+            factory = IncrementalKMLToDXFConverter
+        converter = factory.from_kml_file(
+            path,
+            self.parameterAsString(parameters, self.TEXT_FIELD, context),
+            output_file,
+            **options
+        )
+        return self.run_converter(converter, output_file, feedback)
+
+
+class KMLToDXFProvider(QgsProcessingProvider):
+    """Provedor com os algoritmos do plugin"""
+
+    def id(self):
+        return "kmltodxf"
+
+    def name(self):
+        return "KML para DXF"
+
+    def icon(self):
+        from qgis.PyQt.QtGui import QIcon
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(KMLToDXFAlgorithm())
+        self.addAlgorithm(KMLFileToDXFAlgorithm())
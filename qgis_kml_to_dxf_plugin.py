@@ -1,22 +1,32 @@
             
 # -*- coding: utf-8 -*-
 """
-Plugin QGIS para converter KML para DXF preservando texto
+Diálogos e tarefas do plugin QGIS para converter KML para DXF preservando texto
 """
 
 import os
+import csv
+import shutil
+import tempfile
 from qgis.PyQt.QtCore import QSettings, QTranslator, qVersion, QCoreApplication, Qt
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QAction, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QFileDialog, QMessageBox, QProgressBar
-from qgis.core import QgsProject, QgsVectorLayer, QgsVectorFileWriter, QgsWkbTypes, QgsFeature, QgsGeometry, QgsFields, QgsField, QgsPointXY, QgsLayerTreeLayer
+from qgis.PyQt.QtWidgets import QAction, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox, QDoubleSpinBox, QSpinBox, QPushButton, QFileDialog, QMessageBox, QProgressBar, QListWidget, QListWidgetItem, QAbstractItemView, QTableWidget, QTableWidgetItem, QHeaderView
+from qgis.core import QgsApplication, QgsProject, QgsTask, QgsVectorLayer, QgsVectorFileWriter, QgsWkbTypes, QgsFeature, QgsGeometry, QgsFields, QgsField, QgsPointXY, QgsLayerTreeLayer
 from qgis.utils import iface
 import processing
 
+from .dxf_writer import dxf_layer_name, merge_dxf_files
+from .kml_reader import KMLStreamReader
+from .incremental_export import IncrementalKMLToDXFConverter
+from .kml_to_dxf_core import KMLToDXFConverter
+from .parallel_export import ParallelKMLToDXFConverter
+
 class KMLToDXFDialog(QDialog):
     def __init__(self, parent=None):
         super(KMLToDXFDialog, self).__init__(parent)
         self.setWindowTitle("Converter KML para DXF")
-        self.setModal(True)
+        # Não modal: o QGIS continua utilizável enquanto a tarefa roda
+        self.setModal(False)
         self.resize(400, 200)
         
         # Layout principal
@@ -28,6 +38,10 @@ class KMLToDXFDialog(QDialog):
         self.layer_combo = QComboBox()
         self.populate_layer_combo()
         layer_layout.addWidget(self.layer_combo)
+        self.open_kml_btn = QPushButton("Arquivo...")
+        self.open_kml_btn.setToolTip("Ler um arquivo KML/KMZ em fluxo, sem carregá-lo no projeto")
+        self.open_kml_btn.clicked.connect(self.open_kml_file)
+        layer_layout.addWidget(self.open_kml_btn)
         layout.addLayout(layer_layout)
         
         # Seleção da coluna de texto
@@ -39,7 +53,7 @@ class KMLToDXFDialog(QDialog):
         
         # Botão para atualizar campos
         self.update_fields_btn = QPushButton("Atualizar Campos")
-        self.update_fields_btn.clicked.connect(self.update_text_fields)
+        self.update_fields_btn.clicked.connect(self.refresh_text_fields)
         layout.addWidget(self.update_fields_btn)
         
         # Seleção do arquivo de saída
@@ -53,6 +67,52 @@ class KMLToDXFDialog(QDialog):
         output_layout.addWidget(self.browse_btn)
         layout.addLayout(output_layout)
         
+        # Motor de exportação
+        engine_layout = QHBoxLayout()
+        engine_layout.addWidget(QLabel("Motor:"))
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("QGIS/OGR (QgsVectorFileWriter)", "ogr")
+        self.engine_combo.addItem("Nativo rápido (POINT + TEXT)", "native")
+        engine_layout.addWidget(self.engine_combo)
+        engine_layout.addWidget(QLabel("Altura do texto:"))
+        self.text_height_spin = QDoubleSpinBox()
+        self.text_height_spin.setDecimals(6)
+        self.text_height_spin.setRange(0.000001, 1000000.0)
+        self.text_height_spin.setValue(1.0)
+        self.text_height_spin.setEnabled(False)
+        engine_layout.addWidget(self.text_height_spin)
+        layout.addLayout(engine_layout)
+        
+        # Processos paralelos (motor nativo): a origem é lida uma vez e os blocos são codificados em paralelo
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Processos:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(1)
+        self.workers_spin.setEnabled(False)
+        workers_layout.addWidget(self.workers_spin)
+        layout.addLayout(workers_layout)
+        
+        # Reexportação incremental (motor nativo): só regrava o que mudou desde a última exportação
+        self.incremental_check = QCheckBox("Exportação incremental (reaproveita o DXF anterior)")
+        self.incremental_check.setEnabled(False)
+        layout.addWidget(self.incremental_check)
+        
+        # Ponto de ancoragem do texto em linhas e polígonos
+        anchor_layout = QHBoxLayout()
+        anchor_layout.addWidget(QLabel("Ancoragem:"))
+        self.anchor_combo = QComboBox()
+        self.anchor_combo.addItem("Centroide", "centroid")
+        self.anchor_combo.addItem("Ponto sobre a superfície", "point_on_surface")
+        self.anchor_combo.addItem("Meio da linha", "line_midpoint")
+        anchor_layout.addWidget(self.anchor_combo)
+        layout.addLayout(anchor_layout)
+        
+        # Modo de exportação (só se aplica ao motor QGIS/OGR; o nativo sempre grava em fluxo)
+        self.streaming_check = QCheckBox("Exportação em fluxo (sem camada temporária em memória)")
+        self.streaming_check.setChecked(True)
+        layout.addWidget(self.streaming_check)
+        
         # Barra de progresso
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -63,7 +123,7 @@ class KMLToDXFDialog(QDialog):
         self.convert_btn = QPushButton("Converter")
         self.convert_btn.clicked.connect(self.convert_kml_to_dxf)
         self.cancel_btn = QPushButton("Cancelar")
-        self.cancel_btn.clicked.connect(self.reject)
+        self.cancel_btn.clicked.connect(self.cancel_or_close)
         button_layout.addWidget(self.convert_btn)
         button_layout.addWidget(self.cancel_btn)
         layout.addLayout(button_layout)
@@ -73,9 +133,23 @@ class KMLToDXFDialog(QDialog):
         # Conectar sinal de mudança de camada
         self.layer_combo.currentTextChanged.connect(self.update_text_fields)
         
+        # Habilitar as opções de cada motor
+        self.engine_combo.currentIndexChanged.connect(self.update_engine_options)
+        
         # Variável para armazenar o arquivo de saída
         self.output_file = None
         
+        # Arquivos KML/KMZ abertos para leitura em fluxo (fora do projeto)
+        self.kml_files = set()
+        
+        # Colunas de texto já lidas, por id da camada ou caminho do arquivo
+        self.text_fields_cache = {}
+        # Camadas observadas: id -> (camada, slot ligado ao updatedFields)
+        self.watched_layers = {}
+        
+        # Tarefa de conversão em andamento
+        self.task = None
+        
     def populate_layer_combo(self):
         """Popula o combo box com as camadas vetoriais do projeto"""
         self.layer_combo.clear()
@@ -94,6 +168,20 @@ class KMLToDXFDialog(QDialog):
         #         if isinstance(layer, QgsVectorLayer):
         #             self.layer_combo.addItem(layer.name(), layer.id())
                 
+    def open_kml_file(self):
+        """Adiciona um arquivo KML/KMZ, que será lido em fluxo na conversão"""
+        filename, _ = QFileDialog.getOpenFileName(
+            self,
+            "Abrir arquivo KML",
+            "",
+            "Arquivos KML (*.kml *.kmz)"
+        )
+        
+        if filename:
+            self.kml_files.add(filename)
+            self.layer_combo.addItem(f"{os.path.basename(filename)} (arquivo)", filename)
+            self.layer_combo.setCurrentIndex(self.layer_combo.count() - 1)
+            
     def get_vector_layers_from_tree(self, group):
         """Recursivamente obtém todas as camadas vetoriais da árvore de camadas"""
         layers = []
@@ -106,20 +194,56 @@ class KMLToDXFDialog(QDialog):
                 layers.extend(self.get_vector_layers_from_tree(child))
         return layers
                 
+    def refresh_text_fields(self):
+        """Relê as colunas de texto da camada selecionada, ignorando o cache"""
+        self.text_fields_cache.pop(self.layer_combo.currentData(), None)
+        self.update_text_fields()
+        
     def update_text_fields(self):
         """Atualiza os campos de texto disponíveis baseado na camada selecionada"""
         self.text_combo.clear()
         
-        if self.layer_combo.currentData():
-            layer_id = self.layer_combo.currentData()
-            layer = QgsProject.instance().mapLayer(layer_id)
+        key = self.layer_combo.currentData()
+        if not key:
+            return
             
-            if layer:
-                fields = layer.fields()
-                for field in fields:
-                    if field.type() == 10:  # QString
-                        self.text_combo.addItem(field.name())
-                        
+        if key not in self.text_fields_cache:
+            names = self.read_text_fields(key)
+            if names is None:
+                return
+            self.text_fields_cache[key] = names
+            
+        self.text_combo.addItems(self.text_fields_cache[key])
+        
+    def read_text_fields(self, key):
+        """Nomes das colunas de texto de uma camada ou arquivo KML (None se não der para ler)"""
+        if key in self.kml_files:
+            # Campos dos primeiros Placemarks do arquivo
+            try:
+                return KMLStreamReader(key).peek_fields()
+            except Exception as e:
+                QMessageBox.warning(self, "Aviso", f"Não foi possível ler o arquivo: {str(e)}")
+                return None
+                
+        layer = QgsProject.instance().mapLayer(key)
+        if not layer:
+            return None
+            
+        # Campos novos ou removidos invalidam o cache dessa camada
+        if key not in self.watched_layers:
+            slot = lambda key=key: self.text_fields_cache.pop(key, None)
+            layer.updatedFields.connect(slot)
+            self.watched_layers[key] = (layer, slot)
+        return [field.name() for field in layer.fields() if field.type() == 10]  # QString
+        
+    def update_engine_options(self):
+        """Habilita as opções que valem para o motor selecionado"""
+        native = self.engine_combo.currentData() == "native"
+        self.text_height_spin.setEnabled(native)
+        self.workers_spin.setEnabled(native)
+        self.incremental_check.setEnabled(native)
+        self.streaming_check.setEnabled(not native)
+        
     def browse_output_file(self):
         """Abre diálogo para selecionar arquivo de saída"""
         filename, _ = QFileDialog.getSaveFileName(
@@ -149,9 +273,9 @@ class KMLToDXFDialog(QDialog):
                 QMessageBox.warning(self, "Aviso", "Selecione um arquivo de saída!")
                 return
                 
-            # Obter camada selecionada
+            # Obter camada selecionada (ou o caminho do arquivo KML lido em fluxo)
             layer_id = self.layer_combo.currentData()
-            layer = QgsProject.instance().mapLayer(layer_id)
+            layer = layer_id if layer_id in self.kml_files else QgsProject.instance().mapLayer(layer_id)
             
             if not layer:
                 QMessageBox.critical(self, "Erro", "Camada não encontrada!")
@@ -162,203 +286,571 @@ class KMLToDXFDialog(QDialog):
             
             # Mostrar barra de progresso
             self.progress_bar.setVisible(True)
-            self.progress_bar.setRange(0, 0)  # Progresso indeterminado
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(0)
             
-            # Desabilitar botões
+            # Desabilitar botões (Cancelar continua ativo para interromper a tarefa)
             self.convert_btn.setEnabled(False)
-            self.cancel_btn.setEnabled(False)
             
-            # Processar a conversão
+            # Processar a conversão em segundo plano
             self.process_conversion(layer, text_field)
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro durante a conversão: {str(e)}")
-        finally:
-            # Restaurar interface
-            self.progress_bar.setVisible(False)
-            self.convert_btn.setEnabled(True)
-            self.cancel_btn.setEnabled(True)
+            self.restore_interface()
             
+    def restore_interface(self):
+        """Restaura a interface após o término da conversão"""
+        self.task = None
+        self.progress_bar.setVisible(False)
+        self.convert_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        
     def process_conversion(self, layer, text_field):
-        """Processa a conversão da camada"""
-        try:
-            # Criar camada temporária para pontos com texto
-            temp_layer = self.create_point_layer_with_text(layer, text_field)
+        """Dispara a tarefa de conversão no gerenciador de tarefas do QGIS"""
+        options = dict(
+            streaming=self.streaming_check.isChecked(),
+            engine=self.engine_combo.currentData(),
+            text_height=self.text_height_spin.value(),
+            anchor=self.anchor_combo.currentData()
+        )
+        if self.engine_combo.currentData() == "native":
+            options["workers"] = self.workers_spin.value()
+            options["incremental"] = self.incremental_check.isChecked()
+        
+        # Manter referência à tarefa, senão o Python a coleta antes de terminar
+        if layer in self.kml_files:
+            self.task = KMLToDXFTask.from_kml_file(layer, text_field, self.output_file, **options)
+        else:
+            self.task = KMLToDXFTask.from_layer(layer, text_field, self.output_file, **options)
+        self.task.progressChanged.connect(lambda progress: self.progress_bar.setValue(int(progress)))
+        self.task.taskCompleted.connect(self.on_conversion_completed)
+        self.task.taskTerminated.connect(self.on_conversion_terminated)
+        QgsApplication.taskManager().addTask(self.task)
+        
+    def on_conversion_completed(self):
+        """Chamado na thread principal quando a tarefa termina com sucesso"""
+        output_file = self.task.output_file
+        self.restore_interface()
+        QMessageBox.information(
+            self, 
+            "Sucesso", 
+            f"Arquivo DXF criado com sucesso!\nLocalização: {output_file}"
+        )
+        self.accept()
+        
+    def on_conversion_terminated(self):
+        """Chamado na thread principal quando a tarefa falha ou é cancelada"""
+        task = self.task
+        self.restore_interface()
+        if task.isCanceled():
+            QMessageBox.information(self, "Cancelado", "Conversão cancelada pelo usuário.")
+        else:
+            QMessageBox.critical(self, "Erro", f"Erro no processamento: {task.error}")
             
-            if not temp_layer:
-                QMessageBox.critical(self, "Erro", "Erro ao criar camada temporária!")
-                return
+    def cancel_or_close(self):
+        """Cancela a tarefa em andamento ou fecha o diálogo"""
+        if self.task is not None:
+            self.cancel_btn.setEnabled(False)
+            self.task.cancel()
+        else:
+            self.reject()
+            
+    def closeEvent(self, event):
+        """Cancela a tarefa em andamento ao fechar a janela"""
+        if self.task is not None:
+            self.task.cancel()
+        super(KMLToDXFDialog, self).closeEvent(event)
+        
+    def done(self, result):
+        """Desconecta as camadas observadas ao fechar (accept, reject ou o X da janela)"""
+        self.unwatch_layers()
+        super(KMLToDXFDialog, self).done(result)
+        
+    def unwatch_layers(self):
+        """Desliga o updatedFields das camadas, para o diálogo fechado não ficar preso a elas"""
+        for layer, slot in self.watched_layers.values():
+            try:
+                layer.updatedFields.disconnect(slot)
+            except (RuntimeError, TypeError):
+                # Camada já removida do projeto (objeto C++ apagado)
+                pass
+        self.watched_layers.clear()
+        self.text_fields_cache.clear()
+
+
+class KMLToDXFTask(QgsTask):
+    """Tarefa em segundo plano que cria os pontos com texto e exporta o DXF"""
+    
+    def __init__(self, name, converter):
+        super(KMLToDXFTask, self).__init__(
+            f"Convertendo {name} para DXF",
+            QgsTask.CanCancel
+        )
+        self.converter = converter
+        self.converter.feedback.progressChanged.connect(self.setProgress)
+        self.output_file = converter.output_file
+        self.error = None
+        
+    @classmethod
+    def from_layer(cls, layer, text_field, output_file, **options):
+        """Tarefa que converte uma camada do projeto
+
+        Com incremental (motor nativo) só o que mudou desde a última exportação
+        é convertido. Com workers > 1 (motor nativo) o cálculo dos pontos e a
+        codificação do DXF são divididos entre processos.
+        """
+        workers = options.pop("workers", 1)
+        incremental = options.pop("incremental", False)
+        
+        # Tudo que depende da camada é lido aqui, na thread principal.
+        # Na thread da tarefa só se usa a fonte de features, que é thread-safe.
+        if incremental and options.get("engine") == "native":
+            converter = IncrementalKMLToDXFConverter.from_layer(layer, text_field, output_file, **options)
+        elif workers > 1 and options.get("engine") == "native":
+            converter = ParallelKMLToDXFConverter.from_layer(layer, text_field, output_file, workers=workers, **options)
+        else:
+            converter = KMLToDXFConverter.from_layer(layer, text_field, output_file, **options)
+        return cls(layer.name(), converter)
+        
+    @classmethod
+    def from_kml_file(cls, path, text_field, output_file, **options):
+        """Tarefa que lê o arquivo KML/KMZ em fluxo, sem carregar a camada"""
+        workers = options.pop("workers", 1)
+        if options.pop("incremental", False) and options.get("engine") == "native":
+            converter = IncrementalKMLToDXFConverter.from_kml_file(path, text_field, output_file, **options)
+        elif workers > 1 and options.get("engine") == "native":
+            converter = ParallelKMLToDXFConverter.from_kml_file(path, text_field, output_file, workers=workers, **options)
+        else:
+            converter = KMLToDXFConverter.from_kml_file(path, text_field, output_file, **options)
+        return cls(os.path.basename(path), converter)
+        
+    def cancel(self):
+        """Propaga o cancelamento para o conversor"""
+        self.converter.feedback.cancel()
+        super(KMLToDXFTask, self).cancel()
+        
+    def run(self):
+        """Executa a conversão (thread de segundo plano)"""
+        ok = self.converter.run()
+        self.error = self.converter.error
+        return ok
+
+
+class KMLToDXFBatchDialog(QDialog):
+    """Diálogo para converter várias camadas/arquivos KML de uma vez"""
+    
+    def __init__(self, parent=None):
+        super(KMLToDXFBatchDialog, self).__init__(parent)
+        self.setWindowTitle("Converter KML para DXF em lote")
+        self.setModal(False)
+        self.resize(600, 500)
+        
+        # Layout principal
+        layout = QVBoxLayout()
+        
+        # Lista de fontes (camadas do projeto e arquivos .kml)
+        layout.addWidget(QLabel("Camadas / arquivos KML:"))
+        self.source_list = QListWidget()
+        self.source_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        layout.addWidget(self.source_list)
+        
+        self.add_folder_btn = QPushButton("Adicionar pasta com KML...")
+        self.add_folder_btn.clicked.connect(self.add_kml_folder)
+        layout.addWidget(self.add_folder_btn)
+        
+        # Arquivos da pasta podem ser lidos em fluxo, sem abrir a camada pelo OGR
+        self.stream_files_check = QCheckBox("Ler arquivos KML/KMZ em fluxo (sem carregar a camada)")
+        self.stream_files_check.setChecked(True)
+        layout.addWidget(self.stream_files_check)
+        
+        # Coluna de texto (editável: arquivos da pasta só são abertos na conversão)
+        text_layout = QHBoxLayout()
+        text_layout.addWidget(QLabel("Coluna de Texto:"))
+        self.text_combo = QComboBox()
+        self.text_combo.setEditable(True)
+        text_layout.addWidget(self.text_combo)
+        layout.addLayout(text_layout)
+        
+        # Motor de exportação
+        engine_layout = QHBoxLayout()
+        engine_layout.addWidget(QLabel("Motor:"))
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("QGIS/OGR (QgsVectorFileWriter)", "ogr")
+        self.engine_combo.addItem("Nativo rápido (POINT + TEXT)", "native")
+        engine_layout.addWidget(self.engine_combo)
+        engine_layout.addWidget(QLabel("Altura do texto:"))
+        self.text_height_spin = QDoubleSpinBox()
+        self.text_height_spin.setDecimals(6)
+        self.text_height_spin.setRange(0.000001, 1000000.0)
+        self.text_height_spin.setValue(1.0)
+        engine_layout.addWidget(self.text_height_spin)
+        layout.addLayout(engine_layout)
+        
+        # Ponto de ancoragem do texto em linhas e polígonos
+        anchor_layout = QHBoxLayout()
+        anchor_layout.addWidget(QLabel("Ancoragem:"))
+        self.anchor_combo = QComboBox()
+        self.anchor_combo.addItem("Centroide", "centroid")
+        self.anchor_combo.addItem("Ponto sobre a superfície", "point_on_surface")
+        self.anchor_combo.addItem("Meio da linha", "line_midpoint")
+        anchor_layout.addWidget(self.anchor_combo)
+        layout.addLayout(anchor_layout)
+        
+        # Um DXF por fonte ou um único DXF com um layer por fonte
+        self.merge_check = QCheckBox("Mesclar em um único DXF (um layer por fonte, motor nativo)")
+        self.merge_check.toggled.connect(self.update_output_mode)
+        layout.addWidget(self.merge_check)
+        
+        # Seleção da saída
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(QLabel("Saída:"))
+        self.output_line = QLabel("Selecione a pasta...")
+        self.output_line.setStyleSheet("border: 1px solid gray; padding: 5px;")
+        output_layout.addWidget(self.output_line)
+        self.browse_btn = QPushButton("Procurar")
+        self.browse_btn.clicked.connect(self.browse_output)
+        output_layout.addWidget(self.browse_btn)
+        layout.addLayout(output_layout)
+        
+        # Progresso geral
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
+        # Relatório por fonte
+        self.report_table = QTableWidget(0, 3)
+        self.report_table.setHorizontalHeaderLabels(["Fonte", "Status", "Mensagem"])
+        self.report_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        layout.addWidget(self.report_table)
+        
+        # Botões
+        button_layout = QHBoxLayout()
+        self.convert_btn = QPushButton("Converter")
+        self.convert_btn.clicked.connect(self.start_batch)
+        self.cancel_btn = QPushButton("Cancelar")
+        self.cancel_btn.clicked.connect(self.cancel_or_close)
+        button_layout.addWidget(self.convert_btn)
+        button_layout.addWidget(self.cancel_btn)
+        layout.addLayout(button_layout)
+        
+        self.setLayout(layout)
+        
+        # Estado do lote
+        self.output_path = None
+        self.jobs = []
+        self.pending = []
+        self.running = []
+        self.temp_dir = None
+        self.merge_task = None
+        self.cancelled = False
+        self.max_workers = max(1, os.cpu_count() or 1)
+        
+        self.populate_sources()
+        
+    def populate_sources(self):
+        """Popula a lista com as camadas vetoriais do projeto e os campos de texto"""
+        self.source_list.clear()
+        self.text_combo.clear()
+        text_fields = []
+        
+        for layer_id, layer in QgsProject.instance().mapLayers().items():
+            if isinstance(layer, QgsVectorLayer):
+                item = QListWidgetItem(layer.name())
+                item.setData(Qt.UserRole, ("layer", layer_id))
+                self.source_list.addItem(item)
                 
-            # Exportar para DXF
-            options = QgsVectorFileWriter.SaveVectorOptions()
-            options.driverName = "DXF"
-            options.fileEncoding = "UTF-8"
-            
-            # Configurações específicas para DXF
-            options.datasourceOptions = [
-                "HEADER=MINIMAL"  # Cabeçalho mínimo para compatibilidade
-            ]
-            
-            transform_context = QgsProject.instance().transformContext()
-            
-            error = QgsVectorFileWriter.writeAsVectorFormatV3(
-                temp_layer,
-                self.output_file,
-                transform_context,
-                options
-            )
+                for field in layer.fields():
+                    if field.type() == 10 and field.name() not in text_fields:  # QString
+                        text_fields.append(field.name())
+                        
+        self.text_combo.addItems(text_fields)
+        if "Name" in text_fields:
+            self.text_combo.setCurrentText("Name")
             
-            if error[0] == QgsVectorFileWriter.NoError:
-                QMessageBox.information(
-                    self, 
-                    "Sucesso", 
-                    f"Arquivo DXF criado com sucesso!\nLocalização: {self.output_file}"
-                )
-                self.accept()
-            else:
-                QMessageBox.critical(
-                    self, 
-                    "Erro", 
-                    f"Erro ao criar arquivo DXF: {error[1]}"
-                )
+    def add_kml_folder(self):
+        """Adiciona (já selecionados) todos os .kml/.kmz de uma pasta"""
+        folder = QFileDialog.getExistingDirectory(self, "Pasta com arquivos KML")
+        if not folder:
+            return
+            
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith((".kml", ".kmz")):
+                item = QListWidgetItem(filename)
+                item.setData(Qt.UserRole, ("file", os.path.join(folder, filename)))
+                self.source_list.addItem(item)
+                item.setSelected(True)
                 
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro no processamento: {str(e)}")
+    def update_output_mode(self):
+        """Ajusta a saída e o motor ao modo (pasta ou arquivo mesclado)"""
+        merged = self.merge_check.isChecked()
+        if merged:
+            self.engine_combo.setCurrentIndex(self.engine_combo.findData("native"))
+        self.engine_combo.setEnabled(not merged)
+        self.output_path = None
+        self.output_line.setText("Selecione o arquivo..." if merged else "Selecione a pasta...")
+        
+    def browse_output(self):
+        """Seleciona a pasta de saída ou o arquivo DXF mesclado"""
+        if self.merge_check.isChecked():
+            path, _ = QFileDialog.getSaveFileName(self, "Salvar arquivo DXF", "", "Arquivos DXF (*.dxf)")
+        else:
+            path = QFileDialog.getExistingDirectory(self, "Pasta de saída")
             
-    def create_point_layer_with_text(self, source_layer, text_field):
-        """Cria uma camada de pontos com o texto como atributo"""
-        try:
-            # Criar campos para a nova camada
-            fields = QgsFields()
-            fields.append(QgsField("id", 4))  # Integer
-            fields.append(QgsField("text", 10))  # String
-            
-            # Criar camada temporária
-            temp_layer = QgsVectorLayer(
-                "Point?crs=" + source_layer.crs().authid(),
-                "temp_points",
-                "memory"
-            )
+        if path:
+            self.output_path = path
+            self.output_line.setText(path)
             
-            temp_layer.dataProvider().addAttributes(fields)
-            temp_layer.updateFields()
+    def start_batch(self):
+        """Valida as opções e dispara as conversões"""
+        items = self.source_list.selectedItems()
+        if not items:
+            QMessageBox.warning(self, "Aviso", "Selecione ao menos uma camada ou arquivo!")
+            return
             
-            # Processar features
-            features_to_add = []
-            feature_id = 1
+        text_field = self.text_combo.currentText()
+        if not text_field:
+            QMessageBox.warning(self, "Aviso", "Informe a coluna de texto!")
+            return
             
-            for feature in source_layer.getFeatures():
-                geom = feature.geometry()
-                text_value = feature[text_field] if text_field in feature.fields().names() else ""
-                
-                if geom.type() == QgsWkbTypes.PointGeometry:
-                    # Se já é ponto, usar diretamente
-                    new_feature = QgsFeature(fields)
-                    new_feature.setGeometry(geom)
-                    new_feature.setAttributes([feature_id, str(text_value)])
-                    features_to_add.append(new_feature)
-                    feature_id += 1
-                    
-                elif geom.type() == QgsWkbTypes.LineGeometry:
-                    # Para linhas, usar o centroide
-                    centroid = geom.centroid()
-                    new_feature = QgsFeature(fields)
-                    new_feature.setGeometry(centroid)
-                    new_feature.setAttributes([feature_id, str(text_value)])
-                    features_to_add.append(new_feature)
-                    feature_id += 1
+        if not self.output_path:
+            QMessageBox.warning(self, "Aviso", "Selecione a saída!")
+            return
+            
+        merged = self.merge_check.isChecked()
+        if merged:
+            self.temp_dir = tempfile.mkdtemp(prefix="kml_to_dxf_")
+            
+        # Montar os trabalhos (um por fonte)
+        self.jobs = []
+        used_names = set()
+        self.report_table.setRowCount(0)
+        
+        for row, item in enumerate(items):
+            kind, value = item.data(Qt.UserRole)
+            name = os.path.splitext(item.text())[0] if kind == "file" else item.text()
+            
+            # Nome de arquivo único para cada fonte
+            base_name = dxf_layer_name(name)
+            file_name = base_name
+            suffix = 2
+            while file_name.lower() in used_names:
+                file_name = f"{base_name}_{suffix}"
+                suffix += 1
+            used_names.add(file_name.lower())
+            
+            output_dir = self.temp_dir if merged else self.output_path
+            job = {
+                "row": row,
+                "name": name,
+                "kind": kind,
+                "value": value,
+                "layer_name": file_name,
+                "output": os.path.join(output_dir, file_name + ".dxf"),
+                "progress": 0.0,
+                "status": "Aguardando",
+                "message": "",
+                "task": None,
+                "layer": None
+            }
+            self.jobs.append(job)
+            
+            self.report_table.insertRow(row)
+            self.report_table.setItem(row, 0, QTableWidgetItem(name))
+            self.report_table.setItem(row, 1, QTableWidgetItem(job["status"]))
+            self.report_table.setItem(row, 2, QTableWidgetItem(""))
+            
+        self.pending = list(self.jobs)
+        self.running = []
+        self.text_field = text_field
+        self.engine = self.engine_combo.currentData()
+        self.text_height = self.text_height_spin.value()
+        self.anchor = self.anchor_combo.currentData()
+        self.merged = merged
+        self.cancelled = False
+        self.stream_files = self.stream_files_check.isChecked()
+        
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.convert_btn.setEnabled(False)
+        
+        self.start_next_jobs()
+        
+    def start_next_jobs(self):
+        """Inicia trabalhos pendentes até o limite de núcleos da CPU"""
+        while self.pending and len(self.running) < self.max_workers:
+            job = self.pending.pop(0)
+            options = dict(
+                engine=self.engine,
+                text_height=self.text_height,
+                anchor=self.anchor,
+                layer_name=job["layer_name"] if self.merged else "0"
+            )
+            
+            if job["kind"] == "file" and self.stream_files:
+                task = KMLToDXFTask.from_kml_file(job["value"], self.text_field, job["output"], **options)
+            else:
+                if job["kind"] == "layer":
+                    layer = QgsProject.instance().mapLayer(job["value"])
+                else:
+                    layer = QgsVectorLayer(job["value"], job["name"], "ogr")
                     
-                elif geom.type() == QgsWkbTypes.PolygonGeometry:
-                    # Para polígonos, usar o centroide
-                    centroid = geom.centroid()
-                    new_feature = QgsFeature(fields)
-                    new_feature.setGeometry(centroid)
-                    new_feature.setAttributes([feature_id, str(text_value)])
-                    features_to_add.append(new_feature)
-                    feature_id += 1
+                if layer is None or not layer.isValid():
+                    self.finish_job(job, "Erro", "Não foi possível abrir a camada")
+                    continue
                     
-            # Adicionar features à camada
-            temp_layer.dataProvider().addFeatures(features_to_add)
-            temp_layer.updateExtents()
+                # Manter a camada viva enquanto a tarefa lê suas features
+                job["layer"] = layer
+                task = KMLToDXFTask.from_layer(layer, self.text_field, job["output"], **options)
+            task.progressChanged.connect(lambda progress, job=job: self.on_job_progress(job, progress))
+            task.taskCompleted.connect(lambda job=job: self.on_job_finished(job, True))
+            task.taskTerminated.connect(lambda job=job: self.on_job_finished(job, False))
+            job["task"] = task
+            job["status"] = "Convertendo"
+            self.update_job_row(job)
+            self.running.append(job)
+            QgsApplication.taskManager().addTask(task)
             
-            return temp_layer
+        if not self.pending and not self.running and self.merge_task is None:
+            self.finish_batch()
             
-        except Exception as e:
-            print(f"Erro ao criar camada de pontos: {str(e)}")
-            return None
-
-
-class KMLToDXFPlugin:
-    def __init__(self, iface):
-        self.iface = iface
-        self.plugin_dir = os.path.dirname(__file__)
-        
-        # Inicializar locale
-        locale = QSettings().value('locale/userLocale')[0:2]
-        locale_path = os.path.join(
-            self.plugin_dir,
-            'i18n',
-            'KMLToDXF_{}.qm'.format(locale)
-        )
+    def on_job_progress(self, job, progress):
+        """Atualiza o progresso de um trabalho e o progresso geral"""
+        if job["task"] is None:
+            return
+        job["progress"] = progress
+        total = sum(item["progress"] for item in self.jobs)
+        self.progress_bar.setValue(int(total / len(self.jobs)))
+        self.report_table.item(job["row"], 1).setText(f"{int(progress)}%")
         
-        if os.path.exists(locale_path):
-            self.translator = QTranslator()
-            self.translator.load(locale_path)
-            QCoreApplication.installTranslator(self.translator)
+    def on_job_finished(self, job, ok):
+        """Registra o resultado de um trabalho e inicia o próximo"""
+        task = job["task"]
+        if job in self.running:
+            self.running.remove(job)
             
-        # Declarar variáveis de instância
-        self.actions = []
-        self.menu = self.tr(u'&KML para DXF')
+        if ok:
+            self.finish_job(job, "OK", job["output"] if not self.merged else "")
+        elif task.isCanceled():
+            self.finish_job(job, "Cancelado", "")
+        else:
+            self.finish_job(job, "Erro", task.error or "")
+            
+        self.start_next_jobs()
         
-    def tr(self, message):
-        return QCoreApplication.translate('KMLToDXF', message)
+    def finish_job(self, job, status, message):
+        """Marca um trabalho como terminado"""
+        job["status"] = status
+        job["message"] = message
+        job["progress"] = 100.0
+        job["task"] = None
+        job["layer"] = None
+        self.update_job_row(job)
         
-    def add_action(self, icon_path, text, callback, enabled_flag=True,
-                   add_to_menu=True, add_to_toolbar=True, status_tip=None,
-                   whats_this=None, parent=None):
+    def update_job_row(self, job):
+        """Atualiza a linha do trabalho no relatório"""
+        self.report_table.item(job["row"], 1).setText(job["status"])
+        self.report_table.item(job["row"], 2).setText(job["message"])
         
-        icon = QIcon(icon_path)
-        action = QAction(icon, text, parent)
-        action.triggered.connect(callback)
-        action.setEnabled(enabled_flag)
+    def finish_batch(self):
+        """Mescla os DXF (se for o caso) e mostra o resumo"""
+        done = [job for job in self.jobs if job["status"] == "OK"]
         
-        if status_tip is not None:
-            action.setStatusTip(status_tip)
+        # Lote cancelado: não gerar um DXF mesclado que pareça completo
+        if self.merged and self.cancelled:
+            for job in done:
+                job["status"] = "Não mesclado"
+                job["message"] = "Lote cancelado"
+                self.update_job_row(job)
+            self.show_summary()
+            return
             
-        if whats_this is not None:
-            action.setWhatsThis(whats_this)
+        if self.merged and done:
+            self.progress_bar.setRange(0, 0)
+            self.merge_task = QgsTask.fromFunction(
+                "Mesclando DXF",
+                lambda task, files, output: merge_dxf_files(files, output),
+                [job["output"] for job in done],
+                self.output_path,
+                on_finished=self.on_merge_finished
+            )
+            QgsApplication.taskManager().addTask(self.merge_task)
+            return
             
-        if add_to_toolbar:
-            self.iface.addToolBarIcon(action)
+        self.show_summary()
+        
+    def on_merge_finished(self, exception, result=None):
+        """Chamado quando a mesclagem termina"""
+        self.merge_task = None
+        if self.cancelled:
+            # Cancelado durante a mesclagem: descartar a saída
+            try:
+                os.remove(self.output_path)
+            except OSError:
+                pass
+        if exception is not None or self.cancelled:
+            for job in self.jobs:
+                if job["status"] == "OK":
+                    job["status"] = "Não mesclado" if self.cancelled else "Erro"
+                    job["message"] = "Lote cancelado" if self.cancelled else f"Erro ao mesclar: {exception}"
+                    self.update_job_row(job)
+        self.show_summary()
+        
+    def show_summary(self):
+        """Grava o relatório CSV e mostra o resumo do lote"""
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
             
-        if add_to_menu:
-            self.iface.addPluginToMenu(self.menu, action)
+        report_dir = os.path.dirname(self.output_path) if self.merged else self.output_path
+        report_path = os.path.join(report_dir, "relatorio_conversao.csv")
+        try:
+            with open(report_path, "w", newline="", encoding="utf-8") as report:
+                writer = csv.writer(report)
+                writer.writerow(["fonte", "status", "mensagem"])
+                for job in self.jobs:
+                    writer.writerow([job["name"], job["status"], job["message"]])
+        except OSError as e:
+            report_path = f"(não foi possível gravar: {e})"
             
-        self.actions.append(action)
-        return action
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(100)
+        self.convert_btn.setEnabled(True)
         
-    def initGui(self):
-        """Cria as entradas no menu e toolbar"""
-        icon_path = os.path.join(self.plugin_dir, 'icon.png')
-        self.add_action(
-            icon_path,
-            text=self.tr(u'Converter KML para DXF'),
-            callback=self.run,
-            parent=self.iface.mainWindow()
-        )
+        ok_count = len([job for job in self.jobs if job["status"] == "OK"])
+        failed = [job for job in self.jobs if job["status"] != "OK"]
+        message = f"{ok_count} de {len(self.jobs)} fontes convertidas.\nRelatório: {report_path}"
+        if failed:
+            message += "\n\nFalhas:\n" + "\n".join(
+                f"• {job['name']}: {job['status']} {job['message']}" for job in failed[:20]
+            )
+            QMessageBox.warning(self, "Conversão em lote", message)
+        else:
+            QMessageBox.information(self, "Conversão em lote", message)
+            
+    def is_running(self):
+        """Indica se há um lote em andamento"""
+        return bool(self.pending or self.running or self.merge_task)
         
-    def unload(self):
-        """Remove as entradas do menu e toolbar"""
-        for action in self.actions:
-            self.iface.removePluginMenu(self.tr(u'&KML para DXF'), action)
-            self.iface.removeToolBarIcon(action)
+    def cancel_batch(self):
+        """Cancela os trabalhos pendentes e os em andamento"""
+        self.cancelled = True
+        for job in self.pending:
+            self.finish_job(job, "Cancelado", "")
+        self.pending = []
+        for job in list(self.running):
+            job["task"].cancel()
             
-    def run(self):
-        """Executa o plugin"""
-        dialog = KMLToDXFDialog()
-        dialog.exec_()
-
-
-# Função para criar o plugin
-def classFactory(iface):
-    return KMLToDXFPlugin(iface)
+    def cancel_or_close(self):
+        """Cancela o lote em andamento ou fecha o diálogo"""
+        if self.is_running():
+            self.cancel_batch()
+        else:
+            self.reject()
+            
+    def closeEvent(self, event):
+        """Cancela o lote em andamento ao fechar a janela"""
+        if self.is_running():
+            self.cancel_batch()
+        super(KMLToDXFBatchDialog, self).closeEvent(event)
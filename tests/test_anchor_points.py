@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cálculo vetorizado dos pontos de ancoragem
+"""
+
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anchor_points import anchors_from_wkb
+
+
+def polygon_wkb(*rings):
+    """Polígono WKB little endian com os anéis dados (listas de (x, y), fechadas aqui)"""
+    data = struct.pack("<BII", 1, 3, len(rings))
+    for ring in rings:
+        ring = list(ring) + [ring[0]]
+        data += struct.pack("<I%dd" % (2 * len(ring)), len(ring), *(value for point in ring for value in point))
+    return data
+
+
+def shifted_centroid(ring):
+    """Centroide de referência (float64) calculado com a origem no 1º vértice"""
+    points = np.array(list(ring) + [ring[0]], dtype=np.float64)
+    origin = points[0].copy()
+    points -= origin
+    x0, y0, x1, y1 = points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]
+    cross = x0 * y1 - x1 * y0
+    area = cross.sum() / 2.0
+    return (
+        ((x0 + x1) * cross).sum() / (6.0 * area) + origin[0],
+        ((y0 + y1) * cross).sum() / (6.0 * area) + origin[1]
+    )
+
+
+def test_small_polygons_at_lat_lon_coordinates():
+    """Centroide de polígonos de 1e-4° a 1e-7° em torno de (-46.63, -23.55)"""
+    rings = []
+    for index, side in enumerate([1e-4, 1e-5, 1e-6, 1e-7]):
+        x, y = -46.63 + index * 1e-3, -23.55 - index * 1e-3
+        rings.append([(x, y), (x + side, y), (x + side, y + side), (x + 0.3 * side, y + 0.6 * side), (x, y + side)])
+
+    xs, ys, valid = anchors_from_wkb([polygon_wkb(ring) for ring in rings])
+
+    assert valid.all()
+    for ring, x, y in zip(rings, xs, ys):
+        side = ring[1][0] - ring[0][0]
+        expected_x, expected_y = shifted_centroid(ring)
+        assert abs(x - expected_x) < 1e-6 * side
+        assert abs(y - expected_y) < 1e-6 * side
+
+
+def test_small_polygon_with_hole_at_lat_lon_coordinates():
+    """Buraco centrado em um quadrado de 1e-5°: o centroide continua no centro"""
+    x, y, side = -46.63, -23.55, 1e-5
+    outer = [(x, y), (x + side, y), (x + side, y + side), (x, y + side)]
+    hole = [(x + 0.25 * side, y + 0.25 * side), (x + 0.25 * side, y + 0.75 * side),
+            (x + 0.75 * side, y + 0.75 * side), (x + 0.75 * side, y + 0.25 * side)]
+
+    xs, ys, valid = anchors_from_wkb([polygon_wkb(outer, hole)])
+
+    assert valid[0]
+    assert abs(xs[0] - (x + side / 2)) < 1e-6 * side
+    assert abs(ys[0] - (y + side / 2)) < 1e-6 * side
+
+
+def test_point_on_surface_of_concave_polygons():
+    """Polígonos em U: o centroide cai fora e o ponto vai para a maior corda"""
+    wkbs = []
+    for index in range(50):
+        x, y = -46.63 + index * 1e-3, -23.55
+        wkbs.append(polygon_wkb([
+            (x, y), (x + 3e-4, y), (x + 3e-4, y + 3e-4), (x + 2e-4, y + 3e-4),
+            (x + 2e-4, y + 1e-4), (x + 1e-4, y + 1e-4), (x + 1e-4, y + 3e-4), (x, y + 3e-4)
+        ]))
+
+    xs, ys, valid = anchors_from_wkb(wkbs, "point_on_surface")
+
+    assert valid.all()
+    for index, (x, y) in enumerate(zip(xs, ys)):
+        left = -46.63 + index * 1e-3
+        # Na altura média (y + 1.5e-4) as cordas são as duas pernas do U
+        assert abs(y - (-23.55 + 1.5e-4)) < 1e-12
+        assert abs(x - (left + 0.5e-4)) < 1e-12 or abs(x - (left + 2.5e-4)) < 1e-12
+
+
+def test_empty_polygon_is_invalid_without_failing_the_chunk():
+    """POLYGON EMPTY fica inválido (caminho do QGIS) e não derruba as demais features"""
+    empty = struct.pack("<BII", 1, 3, 0)
+    square = polygon_wkb([(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)])
+
+    for anchor in ("centroid", "point_on_surface", "line_midpoint"):
+        xs, ys, valid = anchors_from_wkb([square, empty, square], anchor)
+        assert valid.tolist() == [True, False, True]
+        assert (xs[0], ys[0]) == (1.0, 1.0)
+        assert (xs[2], ys[2]) == (1.0, 1.0)
+
+    _xs, _ys, valid = anchors_from_wkb([empty], "point_on_surface")
+    assert valid.tolist() == [False]
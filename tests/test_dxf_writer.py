@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do escritor DXF nativo e da junção de arquivos DXF
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dxf_writer import FIRST_HANDLE, DXFPointTextWriter, dxf_header, merge_dxf_files
+
+
+def pairs(path):
+    with open(path, "rb") as dxf:
+        lines = dxf.read().decode("cp1252").split("\n")
+    return list(zip(lines[0::2], lines[1::2]))
+
+
+def handseed(path):
+    values = pairs(path)
+    return int(values[values.index(("9", "$HANDSEED")) + 1][1], 16)
+
+
+def entity_values(path):
+    """Pares (código, valor) da seção ENTITIES, sem os handles"""
+    values = pairs(path)
+    start = values.index(("2", "ENTITIES")) + 1
+    end = values.index(("0", "ENDSEC"), start)
+    return [pair for pair in values[start:end] if pair[0] != "5"]
+
+
+def write_dxf(path, rows):
+    with DXFPointTextWriter(path) as writer:
+        writer.add_many(rows)
+    return path
+
+
+def test_writer_sets_handseed_and_skips_non_finite_points(tmp_path):
+    path = str(tmp_path / "a.dxf")
+    with DXFPointTextWriter(path) as writer:
+        writer.add_many([(1.0, 2.0, "A"), (float("nan"), 0.0, "B"), (3.0, 4.0, "")])
+
+    assert writer.skipped == 1
+    assert writer.count == 3
+    assert handseed(path) == FIRST_HANDLE + 3
+    assert [value for code, value in pairs(path) if code == "5"][1:] == ["100", "101", "102"]
+
+
+def test_merge_renumbers_handles_and_updates_handseed(tmp_path):
+    first = write_dxf(str(tmp_path / "a.dxf"), [(1.0, 2.0, "A"), (3.0, 4.0, "B")])
+    second = write_dxf(str(tmp_path / "b.dxf"), [(5.0, 6.0, "C"), (7.0, 8.0, "")])
+    output = str(tmp_path / "junto.dxf")
+
+    count = merge_dxf_files([first, second], output)
+
+    # Os dois arquivos começam em FIRST_HANDLE; no resultado os handles seguem sem repetir
+    handles = [int(value, 16) for code, value in pairs(output) if code == "5"][1:]
+    assert count == 7
+    assert handles == list(range(FIRST_HANDLE, FIRST_HANDLE + 7))
+    assert handseed(output) == FIRST_HANDLE + 7
+    assert entity_values(output) == entity_values(first) + entity_values(second)
+
+
+def test_merge_rejects_other_dxf_versions(tmp_path):
+    first = write_dxf(str(tmp_path / "a.dxf"), [(1.0, 2.0, "A")])
+    other = tmp_path / "r2000.dxf"
+    other.write_bytes(dxf_header(0).replace("AC1009", "AC1015").encode("cp1252"))
+
+    with pytest.raises(ValueError, match="r2000.dxf"):
+        merge_dxf_files([first, str(other)], str(tmp_path / "junto.dxf"))
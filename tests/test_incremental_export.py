@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da exportação incremental guiada pelo índice saida.dxf.idx
+"""
+
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dxf_writer import FIRST_HANDLE, DXFPointTextWriter
+from incremental_export import INDEX_SUFFIX, IncrementalKMLToDXFConverter
+
+
+def point_wkb(x, y):
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+class FakeFeedback:
+    def isCanceled(self):
+        return False
+
+    def setProgress(self, progress):
+        pass
+
+
+class FakeConverter:
+    """Origem em memória com a interface do KMLToDXFConverter usada pela exportação incremental"""
+
+    text_field = "name"
+    anchor = "centroid"
+    layer_name = "0"
+
+    def __init__(self, output_file, features, text_height=1.0):
+        self.output_file = output_file
+        self.features = features
+        self.text_height = text_height
+        self.feedback = FakeFeedback()
+        self.error = None
+        self.anchored = 0
+
+    def iter_wkb_text(self, progress_span):
+        return iter(self.features)
+
+    def wkb_anchor_points(self, wkbs):
+        self.anchored += len(wkbs)
+        return [struct.unpack_from("<dd", wkb, 5) for wkb in wkbs]
+
+    def report_invalid_features(self):
+        pass
+
+    def invalid_features(self):
+        return []
+
+
+def features(*texts):
+    return [(point_wkb(float(i), float(i)), text) for i, text in enumerate(texts)]
+
+
+def export(output_file, items, text_height=1.0):
+    converter = IncrementalKMLToDXFConverter(FakeConverter(output_file, items, text_height))
+    assert converter.run(), converter.error
+    return converter
+
+
+def reference_dxf(path, items, text_height=1.0):
+    """DXF de uma exportação completa, gravado pelo escritor nativo"""
+    with DXFPointTextWriter(path, text_height=text_height) as writer:
+        writer.add_many((*struct.unpack_from("<dd", wkb, 5), text) for wkb, text in items)
+    with open(path, "rb") as dxf:
+        return dxf.read()
+
+
+def read(path):
+    with open(path, "rb") as dxf:
+        return dxf.read()
+
+
+def entities(data):
+    """Entidades do DXF como dicionários {código: valor}, na ordem do arquivo"""
+    lines = data.decode("cp1252").split("\n")
+    pairs = list(zip(lines[0::2], lines[1::2]))
+    start = pairs.index(("2", "ENTITIES")) + 1
+    result = []
+    for code, value in pairs[start:]:
+        if code == "0":
+            if value in ("ENDSEC", "EOF"):
+                break
+            result.append({"0": value})
+        else:
+            result[-1][code] = value
+    return result
+
+
+def handseed(data):
+    lines = data.decode("cp1252").split("\n")
+    return int(lines[lines.index("$HANDSEED") + 2], 16)
+
+
+def texts(data):
+    return [entity["1"] for entity in entities(data) if entity["0"] == "TEXT"]
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    return str(tmp_path / "saida.dxf")
+
+
+def test_first_export_matches_a_full_native_export(output_file, tmp_path):
+    items = features("A", "B", "C")
+    converter = export(output_file, items)
+
+    assert read(output_file) == reference_dxf(str(tmp_path / "ref.dxf"), items)
+    assert converter.stats == {"unchanged": 0, "converted": 3, "removed": 0}
+    assert os.path.exists(output_file + INDEX_SUFFIX)
+
+
+def test_unchanged_source_leaves_dxf_and_index_untouched(output_file):
+    items = features("A", "B", "C")
+    export(output_file, items)
+    before = read(output_file), os.stat(output_file).st_mtime_ns
+    index_before = read(output_file + INDEX_SUFFIX)
+
+    converter = export(output_file, items)
+
+    assert (read(output_file), os.stat(output_file).st_mtime_ns) == before
+    assert read(output_file + INDEX_SUFFIX) == index_before
+    assert converter.stats == {"unchanged": 3, "converted": 0, "removed": 0}
+    assert converter.converter.anchored == 0
+
+
+def test_edit_in_the_middle_converts_only_that_feature(output_file):
+    items = features("A", "B", "C", "D", "E")
+    export(output_file, items)
+    old = read(output_file)
+
+    items[2] = (items[2][0], "C editado")
+    converter = export(output_file, items)
+    new = read(output_file)
+
+    assert converter.stats == {"unchanged": 4, "converted": 1, "removed": 0}
+    assert converter.converter.anchored == 1
+    assert texts(new) == ["A", "B", "C editado", "D", "E"]
+
+    # As outras entidades são copiadas com os mesmos handles; a editada recebe handles novos
+    old_entities = entities(old)
+    new_entities = entities(new)
+    assert new_entities[:4] == old_entities[:4]
+    assert new_entities[6:] == old_entities[6:]
+    assert [entity["5"] for entity in new_entities[4:6]] == ["%X" % (FIRST_HANDLE + 10), "%X" % (FIRST_HANDLE + 11)]
+    assert handseed(new) == handseed(old) + 2
+
+    # Sem novas mudanças, a próxima execução não regrava nada
+    assert export(output_file, items).stats == {"unchanged": 5, "converted": 0, "removed": 0}
+    assert read(output_file) == new
+
+
+def test_removed_feature(output_file):
+    items = features("A", "B", "C", "D")
+    export(output_file, items)
+    old_entities = entities(read(output_file))
+
+    del items[1]
+    converter = export(output_file, items)
+    new = read(output_file)
+
+    assert converter.stats == {"unchanged": 3, "converted": 0, "removed": 1}
+    assert texts(new) == ["A", "C", "D"]
+    assert entities(new) == old_entities[:2] + old_entities[4:]
+
+
+def test_reordered_features_are_copied_in_the_new_order(output_file):
+    items = features("A", "B", "C", "D")
+    export(output_file, items)
+    old_entities = entities(read(output_file))
+
+    converter = export(output_file, items[::-1])
+    new = read(output_file)
+
+    assert converter.stats == {"unchanged": 4, "converted": 0, "removed": 0}
+    assert converter.converter.anchored == 0
+    assert texts(new) == ["D", "C", "B", "A"]
+    pairs = [old_entities[i:i + 2] for i in range(0, len(old_entities), 2)]
+    assert entities(new) == [entity for pair in pairs[::-1] for entity in pair]
+
+
+def test_changed_option_invalidates_the_index(output_file, tmp_path):
+    items = features("A", "B", "C")
+    export(output_file, items)
+
+    converter = export(output_file, items, text_height=2.5)
+
+    assert converter.stats == {"unchanged": 0, "converted": 3, "removed": 0}
+    assert read(output_file) == reference_dxf(str(tmp_path / "ref.dxf"), items, text_height=2.5)
+
+
+def test_dxf_changed_outside_invalidates_the_index(output_file, tmp_path):
+    items = features("A", "B")
+    export(output_file, items)
+    with open(output_file, "ab") as dxf:
+        dxf.write(b"\n")
+
+    converter = export(output_file, items)
+
+    assert converter.stats == {"unchanged": 0, "converted": 2, "removed": 0}
+    assert read(output_file) == reference_dxf(str(tmp_path / "ref.dxf"), items)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do leitor KML/KMZ em fluxo
+"""
+
+import os
+import struct
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kml_reader import KMLStreamReader
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "amostra.kml")
+
+
+def wkb_type(wkb):
+    return struct.unpack_from("=I", wkb, 1)[0]
+
+
+def read_all(path):
+    reader = KMLStreamReader(path)
+    return reader, list(reader.iter_placemarks())
+
+
+@pytest.fixture
+def kmz_path(tmp_path):
+    path = tmp_path / "amostra.kmz"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("files/leiame.txt", "não é KML")
+        archive.write(FIXTURE, "doc.kml")
+    return str(path)
+
+
+def test_placemarks_in_document_order_including_nested_folders():
+    _reader, placemarks = read_all(FIXTURE)
+    names = [fields["name"] for _wkb, fields in placemarks]
+    assert names == ["Marco 1", "Lote 7", "Rede", "Quebrado", "Depois do erro"]
+
+
+def test_point_geometry_and_description():
+    _reader, placemarks = read_all(FIXTURE)
+    wkb, fields = placemarks[0]
+    assert wkb_type(wkb) == 1
+    assert struct.unpack_from("=2d", wkb, 5) == (-46.63, -23.55)
+    assert fields["description"] == "Ponto no documento"
+
+
+def test_polygon_with_hole_and_extended_data():
+    _reader, placemarks = read_all(FIXTURE)
+    wkb, fields = placemarks[1]
+    assert wkb_type(wkb) == 3
+    assert struct.unpack_from("=I", wkb, 5)[0] == 2
+    assert fields["proprietario"] == "Maria"
+    assert fields["area"] == "125.5"
+
+
+def test_multigeometry_of_lines_is_multilinestring():
+    _reader, placemarks = read_all(FIXTURE)
+    wkb, _fields = placemarks[2]
+    assert wkb_type(wkb) == 5
+    assert struct.unpack_from("=I", wkb, 5)[0] == 2
+
+
+def test_malformed_coordinates_are_reported_without_ending_the_stream():
+    reader, placemarks = read_all(FIXTURE)
+    assert placemarks[3][0] == b""
+    assert struct.unpack_from("=2d", placemarks[4][0], 5) == (1.5, 2.5)
+    assert len(reader.invalid) == 1
+    number, name, _error = reader.invalid[0]
+    assert (number, name) == (4, "Quebrado")
+
+
+def test_kmz_reads_the_main_document(kmz_path):
+    reader, placemarks = read_all(kmz_path)
+    _plain_reader, plain = read_all(FIXTURE)
+    assert placemarks == plain
+    assert reader.progress() == 1.0
+
+
+def test_geometry_text_and_peek_fields():
+    reader = KMLStreamReader(FIXTURE)
+    texts = [text for _wkb, text in reader.iter_geometry_text("Proprietario")]
+    assert texts == ["", "Maria", "", "", ""]
+    assert reader.peek_fields() == ["name", "description", "proprietario", "area"]
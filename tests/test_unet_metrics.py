@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da varredura de thresholds por histograma
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unet_metrics import THRESHOLD_BINS, best_threshold, threshold_sweep
+
+
+def test_sweep_counts_match_the_saved_mask_comparison():
+    rng = np.random.default_rng(0)
+    # Previsões float32 exatamente em cada threshold da grade e um ulp abaixo e acima dele
+    grid = (np.arange(THRESHOLD_BINS) / THRESHOLD_BINS).astype(np.float32)
+    predictions = np.concatenate([
+        np.nextafter(grid[1:], np.float32(0)),
+        grid,
+        np.nextafter(grid, np.float32(1)),
+        rng.random(2000, dtype=np.float32)
+    ]).reshape(-1, 1, 1)
+    masks = (rng.random(predictions.shape) > 0.5).astype(np.uint8)
+
+    sweep = threshold_sweep(predictions, masks)
+
+    for index in range(1, THRESHOLD_BINS):
+        # Mesmo arredondamento e mesma comparação da máscara salva pelo treino
+        predicted = predictions >= round(float(sweep['thresholds'][index]), 3)
+        assert sweep['tp'][index] == np.sum(predicted & (masks > 0))
+        assert sweep['fp'][index] == np.sum(predicted & (masks == 0))
+
+
+def test_best_threshold_skips_zero():
+    predictions = np.array([[0.2, 0.9], [0.1, 0.8]], np.float32)
+    masks = np.array([[0, 1], [0, 1]], np.uint8)
+
+    threshold, index = best_threshold(threshold_sweep(predictions, masks))
+
+    assert index > 0
+    assert np.array_equal(predictions >= threshold, masks > 0)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Gravação das comparações de validação (PNGs individuais e grid)
+
+Os painéis "original | máscara real | máscara prevista" são montados com
+NumPy para um bloco de imagens de cada vez, direto dos arrays uint8 já
+carregados (sem cv2.resize nem conversões por imagem). A codificação dos
+PNGs roda em um pool de threads (o cv2.imwrite libera o GIL) e o grid é
+montado com um único reshape/transpose por página, com limite de imagens
+e paginação para não crescer sem limite.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Imagens por bloco montado em memória
+ARTIFACT_CHUNK = 256
+
+# Colunas do grid (cada coluna é um painel original | real | prevista)
+GRID_COLUMNS = 4
+
+# Painéis por página do grid e máximo de painéis somando todas as páginas
+GRID_PAGE_SIZE = 64
+GRID_LIMIT = 256
+
+
+def comparison_panels(images, masks, predictions, threshold):
+    """Painéis BGR uint8 (N, altura, 3 x largura, 3): original | real | prevista"""
+    originals = np.asarray(images)[..., ::-1]
+    real = np.repeat((np.asarray(masks) > 0).astype(np.uint8) * 255, 3, axis=-1)
+    predicted = np.repeat((np.asarray(predictions) >= threshold).astype(np.uint8) * 255, 3, axis=-1)
+    return np.concatenate([originals, real, predicted], axis=2)
+
+
+def grid_image(panels, columns=GRID_COLUMNS):
+    """Junta os painéis em uma imagem com columns colunas (completa com preto)"""
+    count, height, width, channels = panels.shape
+    rows = -(-count // columns)
+    if rows * columns > count:
+        panels = np.concatenate([panels, np.zeros((rows * columns - count, height, width, channels), panels.dtype)])
+    return panels.reshape(rows, columns, height, width, channels).transpose(0, 2, 1, 3, 4).reshape(
+        rows * height, columns * width, channels
+    )
+
+
+def _write_png(path, image):
+    if not cv2.imwrite(path, image):
+        raise OSError(f"Não foi possível gravar {path}")
+
+
+def write_comparisons(images, masks, predictions, threshold, folder, workers=None):
+    """Grava comparacao_NN.png e imagem_NN/{original,mascara_real,mascara_prevista}.png de cada imagem"""
+    os.makedirs(folder, exist_ok=True)
+    count = len(images)
+    width = np.asarray(images[:1]).shape[2] if count else 0
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for start in range(0, count, ARTIFACT_CHUNK):
+            panels = comparison_panels(
+                images[start:start + ARTIFACT_CHUNK],
+                masks[start:start + ARTIFACT_CHUNK],
+                predictions[start:start + ARTIFACT_CHUNK],
+                threshold
+            )
+            writes = []
+            for offset, panel in enumerate(panels):
+                number = start + offset + 1
+                individual_folder = os.path.join(folder, f'imagem_{number:02d}')
+                os.makedirs(individual_folder, exist_ok=True)
+                files = (
+                    (os.path.join(folder, f'comparacao_{number:02d}.png'), panel),
+                    (os.path.join(individual_folder, 'original.png'), panel[:, :width]),
+                    (os.path.join(individual_folder, 'mascara_real.png'), panel[:, width:2 * width]),
+                    (os.path.join(individual_folder, 'mascara_prevista.png'), panel[:, 2 * width:])
+                )
+                writes.extend(pool.submit(_write_png, path, image) for path, image in files)
+
+            # Esperar o bloco antes de montar o próximo: memória limitada a um bloco
+            for write in writes:
+                write.result()
+
+
+def write_grids(images, masks, predictions, threshold, path, columns=GRID_COLUMNS, page_size=GRID_PAGE_SIZE,
+                limit=GRID_LIMIT):
+    """Grava o grid das primeiras limit imagens em páginas de page_size painéis
+
+    Com uma página só, o arquivo é path; com várias, path_001.png,
+    path_002.png etc. limit None grava todas. Retorna os arquivos gravados.
+    """
+    count = len(images) if limit is None else min(limit, len(images))
+    pages = range(0, count, page_size)
+    base_name, ext = os.path.splitext(path)
+    paths = []
+
+    for page, start in enumerate(pages, 1):
+        end = min(start + page_size, count)
+        panels = comparison_panels(images[start:end], masks[start:end], predictions[start:end], threshold)
+        page_path = path if len(pages) == 1 else f'{base_name}_{page:03d}{ext}'
+        _write_png(page_path, grid_image(panels, min(columns, len(panels))))
+        paths.append(page_path)
+    return paths
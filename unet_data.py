@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de entrada em fluxo (tf.data) para o treino da U-Net
+
+Em vez de ler todas as imagens para listas Python e depois copiá-las para
+np.array, os pares imagem/máscara são lidos do disco sob demanda: a
+decodificação e o redimensionamento rodam em paralelo
+(num_parallel_calls=AUTOTUNE), os lotes são preparados antes de o modelo
+pedir (prefetch) e o resultado pode ser guardado em cache no disco. Assim
+o conjunto de dados não precisa caber na memória.
+
+Imagens e máscaras saem em uint8 (imagem 0-255, máscara 0/1): a
+normalização é a primeira camada do modelo, o que deixa buffers e cache
+4x menores que em float32.
+"""
+
+import os
+
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Tamanho das imagens de entrada do modelo
+IMAGE_SIZE = (128, 128)
+
+# Elementos no buffer de embaralhamento quando os dados já estão em cache
+SHUFFLE_BUFFER = 256
+
+# Extensões que o tf.io.decode_image sabe ler
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+# Extensões que o cv2.imread sabe ler (carregamento em memória e shards)
+CV2_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def list_pairs(images_folder, masks_folder, limit=None, extensions=IMAGE_EXTENSIONS):
+    """Caminhos dos pares imagem/máscara (a máscara de foto.png é foto_mask.png)
+
+    ValueError se houver imagens sem máscara ou em formato que não está em
+    extensions (ex.: .tif no tf.data): o carregamento em memória lia esses
+    arquivos, então ignorá-los mudaria o conjunto de treino em silêncio.
+    """
+    image_paths = []
+    mask_paths = []
+    unsupported = []
+    without_mask = []
+
+    for image_file in sorted(os.listdir(images_folder)):
+        base_name, ext = os.path.splitext(image_file)
+        if ext.lower() not in extensions:
+            if ext.lower() in IMAGE_EXTENSIONS + CV2_IMAGE_EXTENSIONS:
+                unsupported.append(image_file)
+            continue
+
+        mask_path = os.path.join(masks_folder, base_name + '_mask' + ext)
+        if os.path.exists(mask_path):
+            image_paths.append(os.path.join(images_folder, image_file))
+            mask_paths.append(mask_path)
+        else:
+            without_mask.append(image_file)
+
+        if limit is not None and len(image_paths) >= limit:
+            break
+
+    if unsupported:
+        raise ValueError(
+            f"{len(unsupported)} imagens em formato que este pipeline não lê "
+            f"(aceitos: {', '.join(extensions)}), ex.: {', '.join(unsupported[:3])}"
+        )
+    if without_mask:
+        raise ValueError(
+            f"{len(image_paths)} imagens com máscara e {len(without_mask)} sem máscara em {masks_folder}, "
+            f"ex.: {', '.join(without_mask[:3])}"
+        )
+    return image_paths, mask_paths
+
+
+def decode_pair(image_path, mask_path, size=IMAGE_SIZE):
+    """Lê, decodifica e redimensiona um par (imagem RGB 0-255 e máscara 0/1, em uint8)"""
+    image = tf.io.decode_image(tf.io.read_file(image_path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, size, method='bilinear')
+    image = tf.cast(tf.round(tf.clip_by_value(image, 0.0, 255.0)), tf.uint8)
+    image.set_shape((*size, 3))
+
+    mask = tf.io.decode_image(tf.io.read_file(mask_path), channels=1, expand_animations=False)
+    mask = tf.image.resize(mask, size, method='bilinear')
+    mask = tf.cast(mask > 0, tf.uint8)  # Mesmo threshold baixo do carregamento em memória
+    mask.set_shape((*size, 1))
+
+    return image, mask
+
+
+def has_road(image, mask):
+    """Descarta pares com máscara vazia, como o carregamento em memória"""
+    return tf.reduce_max(mask) > 0
+
+
+def make_dataset(image_paths, mask_paths, batch_size=1, shuffle=False, cache=None, size=IMAGE_SIZE, seed=42,
+                 shard=None):
+    """Cria o tf.data.Dataset de lotes (imagens, máscaras)
+
+    cache: None (sem cache), "" (cache em memória) ou caminho de arquivo
+    para guardar as imagens já decodificadas no disco a partir da 2ª época.
+    shard: (número de partes, índice) para ler só uma parte dos pares,
+    antes de decodificar (treino distribuído).
+    """
+    dataset = tf.data.Dataset.from_tensor_slices((list(image_paths), list(mask_paths)))
+    if shard is not None:
+        dataset = dataset.shard(*shard)
+
+    # Sem cache, embaralhar só os caminhos: barato e sem buffer de imagens
+    if shuffle and cache is None:
+        dataset = dataset.shuffle(len(image_paths), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda image_path, mask_path: decode_pair(image_path, mask_path, size),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not shuffle
+    )
+    dataset = dataset.filter(has_road)
+
+    if cache is not None:
+        dataset = dataset.cache(cache)
+        if shuffle:
+            dataset = dataset.shuffle(SHUFFLE_BUFFER, seed=seed, reshuffle_each_iteration=True)
+
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def dataset_to_arrays(dataset):
+    """Junta os lotes de um dataset em dois np.array (imagens, máscaras)"""
+    images = []
+    masks = []
+    for batch_images, batch_masks in dataset.as_numpy_iterator():
+        images.append(batch_images)
+        masks.append(batch_masks)
+
+    if not images:
+        return np.empty((0, *IMAGE_SIZE, 3), np.uint8), np.empty((0, *IMAGE_SIZE, 1), np.uint8)
+    return np.concatenate(images), np.concatenate(masks)
+
+
+def array_dataset(images, masks, indices, batch_size=1, shuffle=False, seed=42):
+    """Cria o dataset de lotes a partir de arrays uint8 (np.memmap ou ShardedArray)
+
+    Só os índices de cada lote são lidos do disco, sem copiar o conjunto
+    inteiro para a memória. Os lotes saem em uint8, como os arrays.
+    """
+    size = images.shape[1:3]
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(indices, np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+
+    def fetch(batch_indices):
+        # Índices ordenados leem os shards em sequência
+        batch_indices = np.sort(batch_indices)
+        return np.asarray(images[batch_indices]), np.asarray(masks[batch_indices])
+
+    def load_batch(batch_indices):
+        batch_images, batch_masks = tf.numpy_function(fetch, [batch_indices], [tf.uint8, tf.uint8])
+        batch_images.set_shape((None, *size, 3))
+        batch_masks.set_shape((None, *size, 1))
+        return batch_images, batch_masks
+
+    dataset = dataset.batch(batch_size).map(load_batch, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    return dataset.prefetch(AUTOTUNE)
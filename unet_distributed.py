@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Treino distribuído da U-Net em vários processos ou máquinas
+
+Usa tf.distribute.MultiWorkerMirroredStrategy: cada trabalhador tem uma
+cópia do modelo, lê só a sua parte dos dados (dataset.shard ou fatia dos
+índices) e os gradientes são somados entre todos a cada passo
+(all-reduce em anel, adequado a CPUs). A configuração do cluster vem da
+variável TF_CONFIG, como em qualquer job do tf.distribute.
+
+Os checkpoints são coordenados pelo BackupAndRestore: todos os
+trabalhadores gravam o estado no fim de cada época e, se um deles cair,
+o job inteiro volta da última época concluída ao ser reiniciado.
+
+Para testar em uma máquina só, este módulo sobe os trabalhadores como
+processos locais, cada um com o seu TF_CONFIG:
+
+    python unet_distributed.py --trabalhadores 2 -- --pipeline shards --batch 4
+
+Os argumentos depois de -- vão para ia_treino_fast_2.py (com --distribuido).
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# Script de treino executado por cada trabalhador local
+TRAINING_SCRIPT = 'ia_treino_fast_2.py'
+
+
+def worker_info():
+    """(número de trabalhadores, índice deste trabalhador) segundo o TF_CONFIG"""
+    config = json.loads(os.environ.get('TF_CONFIG') or '{}')
+    cluster = config.get('cluster', {})
+    task = config.get('task', {})
+    count = sum(len(cluster.get(kind, [])) for kind in ('chief', 'worker')) or 1
+    index = task.get('index', 0)
+    # Com um "chief" explícito, os "worker" vêm depois dele
+    if task.get('type') == 'worker' and cluster.get('chief'):
+        index += len(cluster['chief'])
+    return count, index
+
+
+def is_chief():
+    """Indica se este processo é o coordenador (grava os resultados finais)"""
+    return worker_info()[1] == 0
+
+
+def make_strategy():
+    """MultiWorkerMirroredStrategy com all-reduce em anel (precisa vir antes de qualquer operação do TF)"""
+    import tensorflow as tf
+
+    options = tf.distribute.experimental.CommunicationOptions(
+        implementation=tf.distribute.experimental.CommunicationImplementation.RING
+    )
+    return tf.distribute.MultiWorkerMirroredStrategy(communication_options=options)
+
+
+def sync_workers(strategy):
+    """Barreira: volta só quando todos os trabalhadores chegarem aqui"""
+    import tensorflow as tf
+
+    strategy.reduce(tf.distribute.ReduceOp.SUM, strategy.run(lambda: tf.constant(1.0)), axis=None)
+
+
+def distributed_dataset(dataset):
+    """Dataset já dividido à mão entre os trabalhadores: repetir e desligar a divisão automática"""
+    import tensorflow as tf
+
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    return dataset.repeat().with_options(options)
+
+
+def steps_per_epoch(count, global_batch_size):
+    """Passos por época iguais em todos os trabalhadores (o dataset se repete)"""
+    return max(1, count // global_batch_size)
+
+
+def checkpoint_callbacks(folder):
+    """Callbacks de checkpoint coordenado entre os trabalhadores"""
+    import tensorflow as tf
+
+    return [tf.keras.callbacks.BackupAndRestore(backup_dir=folder)]
+
+
+def free_port():
+    """Porta TCP livre no localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def local_tf_config(addresses, index):
+    """TF_CONFIG do trabalhador index em um cluster de endereços locais"""
+    return json.dumps({
+        'cluster': {'worker': addresses},
+        'task': {'type': 'worker', 'index': index}
+    })
+
+
+def launch_local_workers(count, script_args, log_folder='logs_distribuido', script=TRAINING_SCRIPT):
+    """Sobe count trabalhadores nesta máquina e espera todos; retorna os códigos de saída
+
+    A saída do coordenador vai para o terminal; a dos demais, para
+    trabalhador_N.log em log_folder.
+    """
+    os.makedirs(log_folder, exist_ok=True)
+    addresses = [f'localhost:{free_port()}' for _ in range(count)]
+    processes = []
+    logs = []
+
+    try:
+        for index in range(count):
+            env = dict(os.environ, TF_CONFIG=local_tf_config(addresses, index))
+            stdout = None
+            if index > 0:
+                log = open(os.path.join(log_folder, f'trabalhador_{index}.log'), 'w', encoding='utf-8')
+                logs.append(log)
+                stdout = log
+            processes.append(subprocess.Popen(
+                [sys.executable, script, '--distribuido', *script_args],
+                env=env,
+                stdout=stdout,
+                stderr=subprocess.STDOUT if stdout else None
+            ))
+        # Um trabalhador com erro trava os outros no all-reduce: encerrar todos
+        while True:
+            codes = [process.poll() for process in processes]
+            if all(code is not None for code in codes) or any(codes):
+                break
+            time.sleep(0.5)
+
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+        for log in logs:
+            log.close()
+
+    return [process.returncode for process in processes]
+
+
+def main():
+    argv = sys.argv[1:]
+    script_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, script_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Treino distribuído local (vários processos nesta máquina)")
+    parser.add_argument('--trabalhadores', type=int, default=2, help="número de processos de treino")
+    parser.add_argument('--pasta-logs', default='logs_distribuido', help="logs dos trabalhadores além do coordenador")
+    args = parser.parse_args(argv)
+
+    print(f"🖧 Subindo {args.trabalhadores} trabalhadores locais...")
+    codes = launch_local_workers(args.trabalhadores, script_args, args.pasta_logs)
+    if any(codes):
+        print(f"❌ Trabalhadores com erro: {[index for index, code in enumerate(codes) if code]} "
+              f"(veja {args.pasta_logs}/)")
+        sys.exit(1)
+    print("✅ Treino distribuído concluído")
+
+
+if __name__ == "__main__":
+    main()
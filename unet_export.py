@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação do modelo treinado para formatos leves de inferência
+
+Grava um SavedModel (assinatura serving_default com entrada uint8) e um
+ou mais modelos TFLite:
+
+- float32: mesmo resultado do Keras, só sem a inicialização do Keras;
+- float16: pesos em float16, metade do tamanho;
+- int8: pesos e ativações em int8, calibrados com imagens de validação
+  (quantização pós-treino); entrada e saída continuam em float32.
+
+compare_exports mede, para cada arquivo, o tamanho, o tempo de
+inicialização, a latência por imagem e a diferença em relação ao Keras
+(erro médio da probabilidade e IoU entre as máscaras binárias), e o
+resultado é gravado em exportacao.json ao lado dos modelos.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from unet_inference import predict_masks
+from unet_tflite_runner import TFLiteMaskPredictor
+
+# Quantizações pós-treino disponíveis para o TFLite
+QUANTIZATIONS = ["float16", "int8"]
+
+# Imagens de validação usadas para calibrar a quantização int8
+CALIBRATION_IMAGES = 200
+
+REPORT_NAME = 'exportacao.json'
+
+
+def export_saved_model(model, folder):
+    """Grava o SavedModel com a assinatura serving_default (imagens uint8)"""
+    input_shape = model.input_shape[1:]
+
+    @tf.function(input_signature=[tf.TensorSpec((None, *input_shape), tf.uint8, name='imagens')])
+    def serving_default(images):
+        return {'probabilidade': model(tf.cast(images, tf.float32), training=False)}
+
+    tf.saved_model.save(model, folder, signatures={'serving_default': serving_default})
+    return folder
+
+
+def export_tflite(model, path, quantization=None, calibration_images=None):
+    """Converte o modelo para TFLite (quantization: None, "float16" ou "int8")"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration_images is None or not len(calibration_images):
+            raise ValueError("A quantização int8 precisa de imagens de calibração")
+
+        def representative_dataset():
+            # Faixa 0-255 da entrada: a camada Rescaling faz parte do modelo
+            for image in calibration_images[:CALIBRATION_IMAGES]:
+                yield [np.asarray(image, np.float32)[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization is not None:
+        raise ValueError(f"Quantização inválida: {quantization}")
+
+    with open(path, 'wb') as model_file:
+        model_file.write(converter.convert())
+    return path
+
+
+def mask_iou(a, b):
+    """IoU entre duas máscaras binárias (1.0 se as duas estiverem vazias)"""
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def folder_size(path):
+    """Tamanho em bytes de um arquivo ou de todos os arquivos de uma pasta"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, names in os.walk(path)
+        for name in names
+    )
+
+
+def compare_exports(model, tflite_paths, images, threshold=0.5, batch_size=8):
+    """Tamanho, inicialização, latência e diferença em relação ao Keras de cada TFLite"""
+    reference = predict_masks(model, images, batch_size)
+    reference_mask = reference > threshold
+    results = {}
+
+    for name, path in tflite_paths.items():
+        start = time.perf_counter()
+        predictor = TFLiteMaskPredictor(path, batch_size=batch_size)
+        startup = time.perf_counter() - start
+
+        predictor.predict(images[:batch_size])
+        start = time.perf_counter()
+        predictions = predictor.predict(images)
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            'arquivo': os.path.basename(path),
+            'tamanho_mb': os.path.getsize(path) / 2**20,
+            'inicializacao_s': startup,
+            'latencia_ms_por_imagem': 1000.0 * elapsed / max(len(images), 1),
+            'erro_medio_probabilidade': float(np.abs(predictions - reference).mean()) if len(images) else 0.0,
+            'iou_com_keras': mask_iou(predictions > threshold, reference_mask)
+        }
+    return results
+
+
+def export_model(model, folder, quantizations=(), validation_images=None):
+    """Exporta SavedModel e TFLite (float32 e as quantizações pedidas) para folder
+
+    Com validation_images, mede cada TFLite contra o Keras e grava o
+    relatório em exportacao.json. Retorna o relatório.
+    """
+    os.makedirs(folder, exist_ok=True)
+    saved_model = export_saved_model(model, os.path.join(folder, 'saved_model'))
+
+    tflite_paths = {'float32': export_tflite(model, os.path.join(folder, 'modelo.tflite'))}
+    for quantization in quantizations:
+        tflite_paths[quantization] = export_tflite(
+            model,
+            os.path.join(folder, f'modelo_{quantization}.tflite'),
+            quantization,
+            validation_images
+        )
+
+    report = {'saved_model': {'pasta': os.path.basename(saved_model), 'tamanho_mb': folder_size(saved_model) / 2**20}}
+    if validation_images is not None and len(validation_images):
+        report['tflite'] = compare_exports(model, tflite_paths, validation_images)
+    else:
+        report['tflite'] = {
+            name: {'arquivo': os.path.basename(path), 'tamanho_mb': os.path.getsize(path) / 2**20}
+            for name, path in tflite_paths.items()
+        }
+
+    with open(os.path.join(folder, REPORT_NAME), 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2, ensure_ascii=False)
+    return report
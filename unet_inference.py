@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Inferência em lotes com a U-Net
+
+model.predict imagem a imagem refaz a preparação (dataset, laço de
+predição, cópias) a cada chamada. Aqui o modelo é chamado por um
+tf.function compilado uma vez por modelo, com lotes de tamanho fixo, e as
+previsões são gravadas direto em um único array de saída.
+"""
+
+import weakref
+
+import numpy as np
+import tensorflow as tf
+
+# Imagens por lote na inferência
+PREDICT_BATCH_SIZE = 32
+
+# tf.function de cada modelo (some junto com o modelo)
+_forward_functions = weakref.WeakKeyDictionary()
+
+
+def compiled_forward(model):
+    """tf.function que executa o modelo em modo de inferência (criado uma vez por modelo)"""
+    forward = _forward_functions.get(model)
+    if forward is None:
+        @tf.function
+        def forward(batch):
+            return model(batch, training=False)
+
+        _forward_functions[model] = forward
+    return forward
+
+
+def predict_masks(model, images, batch_size=PREDICT_BATCH_SIZE):
+    """Previsões do modelo para images (array, np.memmap ou ShardedArray)
+
+    Retorna um único array float32 (N, altura, largura, 1). O último lote é
+    completado com zeros para manter o formato e não recompilar a função.
+    """
+    count = len(images)
+    forward = compiled_forward(model)
+    predictions = None
+
+    for start in range(0, count, batch_size):
+        batch = np.asarray(images[start:start + batch_size])
+        size = len(batch)
+        if size < batch_size:
+            batch = np.concatenate([batch, np.zeros((batch_size - size, *batch.shape[1:]), batch.dtype)])
+
+        output = forward(tf.convert_to_tensor(batch)).numpy()
+        if predictions is None:
+            predictions = np.empty((count, *output.shape[1:]), np.float32)
+        predictions[start:start + size] = output[:size]
+
+    if predictions is None:
+        return np.empty((0, *model.output_shape[1:]), np.float32)
+    return predictions
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Escolha do threshold da máscara sobre toda a validação
+
+Em vez de binarizar as previsões uma vez por threshold, as probabilidades
+de cada pixel são contadas em um histograma (separado para pixels de
+estrada e de fundo) em uma única passada, bloco a bloco. As somas
+acumuladas do histograma dão verdadeiros e falsos positivos de todos os
+thresholds da grade de uma vez, e daí precisão, revocação, IoU e F1.
+"""
+
+import numpy as np
+
+# Intervalos do histograma (grade de thresholds com passo 1/THRESHOLD_BINS)
+THRESHOLD_BINS = 1000
+
+# Imagens por bloco na contagem (limita a memória com 100k+ imagens)
+SWEEP_CHUNK = 256
+
+# Métricas que podem escolher o threshold
+THRESHOLD_METRICS = ["f1", "iou", "precision", "recall"]
+
+
+def threshold_index(probabilities, bins=THRESHOLD_BINS):
+    """Intervalo de cada probabilidade: o maior k com probabilidade >= k / bins
+
+    A comparação é feita em float32, como em previsão >= threshold com as
+    previsões do modelo; só o produto por bins arredonda e põe no intervalo
+    k valores logo abaixo de k / bins.
+    """
+    edges = (np.arange(bins) / bins).astype(np.float32)
+    index = np.minimum((probabilities * bins).astype(np.int64), bins - 1)
+    np.maximum(index, 0, out=index)
+    # Corrigir em um intervalo os valores que o produto arredondou para o lado errado
+    index -= (probabilities < edges[index]) & (index > 0)
+    following = np.minimum(index + 1, bins - 1)
+    index += (probabilities >= edges[following]) & (following > index)
+    return index
+
+
+def probability_histograms(predictions, masks, bins=THRESHOLD_BINS, chunk=SWEEP_CHUNK):
+    """Histogramas das probabilidades dos pixels de fundo e de estrada: (fundo, estrada)"""
+    counts = np.zeros(2 * bins, np.int64)
+    for start in range(0, len(predictions), chunk):
+        probabilities = np.asarray(predictions[start:start + chunk], np.float32).ravel()
+        truth = np.asarray(masks[start:start + chunk]).ravel() > 0
+        index = threshold_index(probabilities, bins)
+        # Uma só contagem: intervalo * 2 + (é estrada)
+        counts += np.bincount(index * 2 + truth, minlength=2 * bins)
+    return counts[0::2], counts[1::2]
+
+
+def threshold_sweep(predictions, masks, bins=THRESHOLD_BINS, chunk=SWEEP_CHUNK):
+    """Métricas de cada threshold da grade k / bins (pixel positivo se probabilidade >= threshold)
+
+    Retorna um dicionário de arrays: thresholds, tp, fp, fn, precision,
+    recall, iou e f1.
+    """
+    negatives, positives = probability_histograms(predictions, masks, bins, chunk)
+    # Soma do intervalo k até o fim: pixels com probabilidade >= k / bins
+    tp = np.cumsum(positives[::-1])[::-1]
+    fp = np.cumsum(negatives[::-1])[::-1]
+    fn = positives.sum() - tp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 1.0)
+        iou = np.where(tp + fp + fn > 0, tp / (tp + fp + fn), 1.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return {
+        'thresholds': np.arange(bins) / bins,
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'precision': precision,
+        'recall': recall,
+        'iou': iou,
+        'f1': f1
+    }
+
+
+def best_threshold(sweep, metric='f1'):
+    """Threshold que maximiza metric; retorna (threshold, índice na grade)"""
+    if metric not in THRESHOLD_METRICS:
+        raise ValueError(f"Métrica inválida: {metric}")
+    # O threshold 0 marca tudo como estrada: fica fora da escolha
+    index = 1 + int(np.argmax(sweep[metric][1:]))
+    return float(sweep['thresholds'][index]), index
+
+
+def sweep_at(sweep, threshold):
+    """Métricas da grade no threshold mais próximo de threshold"""
+    index = int(np.argmin(np.abs(sweep['thresholds'] - threshold)))
+    return {name: float(values[index]) for name, values in sweep.items()}
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Arquitetura da U-Net de detecção de estradas
+
+Fica em um módulo próprio para ser importada sem rodar o treino (o script
+ia_treino_fast_2.py executa tudo no nível do módulo): inferência,
+exportação e benchmarks criam o mesmo modelo a partir daqui.
+
+Há duas arquiteturas: "unet" (unet_fast_otimizado, convoluções completas
+de até 512 filtros) e "leve" (unet_leve, convoluções separáveis em
+profundidade com multiplicador de largura, para inferência em CPU).
+"""
+
+import math
+
+from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, UpSampling2D, concatenate, BatchNormalization, Dropout, GroupNormalization, Rescaling, SeparableConv2D
+from tensorflow.keras.models import Model
+
+# Camadas de normalização: batch (padrão), renorm (Batch Renormalization,
+# estável com lotes pequenos) e group (não depende do tamanho do lote)
+NORMALIZATIONS = ["batch", "renorm", "group"]
+
+# Grupos de canais da GroupNormalization (reduzido quando a camada tem menos canais)
+NORMALIZATION_GROUPS = 32
+
+# Arquiteturas disponíveis
+ARCHITECTURES = ["unet", "leve"]
+
+# Multiplicador de largura padrão da arquitetura leve
+LIGHT_WIDTH = 0.5
+
+
+def normalization_layer(kind='batch', channels=None):
+    """Camada de normalização do tipo pedido (channels: canais da entrada, para a group)"""
+    if kind == 'batch':
+        return BatchNormalization()
+    if kind == 'renorm':
+        return BatchNormalization(renorm=True)
+    if kind == 'group':
+        groups = math.gcd(NORMALIZATION_GROUPS, channels) if channels else NORMALIZATION_GROUPS
+        return GroupNormalization(groups=groups)
+    raise ValueError(f"Normalização inválida: {kind}")
+
+
+def unet_fast_otimizado(input_size=(128, 128, 3), normalization='batch'):
+    """U-Net MELHORADA - Mais camadas e skip connections
+
+    Recebe imagens uint8 (0-255): a normalização para [0, 1] é a primeira
+    camada, então os dados ficam em uint8 na memória e no disco.
+    normalization escolhe a camada entre os blocos (NORMALIZATIONS).
+    """
+    inputs = Input(input_size)
+    scaled = Rescaling(1.0 / 255)(inputs)
+    
+    # Encoder - MELHORADO com mais camadas
+    c1 = Conv2D(64, 3, activation='relu', padding='same')(scaled)
+    c1 = Conv2D(64, 3, activation='relu', padding='same')(c1)  # Camada dupla
+    c1 = normalization_layer(normalization)(c1)
+    p1 = MaxPooling2D((2, 2))(c1)
+    
+    c2 = Conv2D(128, 3, activation='relu', padding='same')(p1)
+    c2 = Conv2D(128, 3, activation='relu', padding='same')(c2)  # Camada dupla
+    c2 = normalization_layer(normalization)(c2)
+    p2 = MaxPooling2D((2, 2))(c2)
+    
+    c3 = Conv2D(256, 3, activation='relu', padding='same')(p2)
+    c3 = Conv2D(256, 3, activation='relu', padding='same')(c3)  # Camada dupla
+    c3 = normalization_layer(normalization)(c3)
+    p3 = MaxPooling2D((2, 2))(c3)
+    
+    # Bottleneck - Mais profundo
+    c4 = Conv2D(512, 3, activation='relu', padding='same')(p3)
+    c4 = Conv2D(512, 3, activation='relu', padding='same')(c4)
+    c4 = normalization_layer(normalization)(c4)
+    c4 = Dropout(0.3)(c4)  # Dropout mais forte
+    
+    # Decoder - MELHORADO com skip connections
+    u5 = UpSampling2D((2, 2))(c4)
+    u5 = concatenate([u5, c3])
+    c5 = Conv2D(256, 3, activation='relu', padding='same')(u5)
+    c5 = Conv2D(256, 3, activation='relu', padding='same')(c5)
+    c5 = normalization_layer(normalization)(c5)
+    
+    u6 = UpSampling2D((2, 2))(c5)
+    u6 = concatenate([u6, c2])
+    c6 = Conv2D(128, 3, activation='relu', padding='same')(u6)
+    c6 = Conv2D(128, 3, activation='relu', padding='same')(c6)
+    c6 = normalization_layer(normalization)(c6)
+    
+    u7 = UpSampling2D((2, 2))(c6)
+    u7 = concatenate([u7, c1])
+    c7 = Conv2D(64, 3, activation='relu', padding='same')(u7)
+    c7 = Conv2D(64, 3, activation='relu', padding='same')(c7)
+    
+    # Saída sempre em float32, mesmo com política de precisão mista
+    outputs = Conv2D(1, 1, activation='sigmoid', dtype='float32')(c7)
+    
+    model = Model(inputs=[inputs], outputs=[outputs])
+    return model
+
+
+def unet_leve(input_size=(128, 128, 3), normalization='batch', width=LIGHT_WIDTH):
+    """U-Net LEVE - convoluções separáveis em profundidade
+
+    Mesma estrutura da unet_fast_otimizado (3 níveis, skip connections,
+    entrada uint8), mas com SeparableConv2D (convolução por canal + 1x1),
+    filtros multiplicados por width e gargalo com só 4x os filtros do
+    primeiro nível (em vez de 8x). A primeira convolução continua completa:
+    com 3 canais de entrada a separável não economiza nada.
+    """
+    def filters(base):
+        return max(8, int(round(base * width / 8)) * 8)
+
+    def block(x, channels, normalize=True):
+        x = SeparableConv2D(channels, 3, activation='relu', padding='same')(x)
+        if normalize:
+            x = normalization_layer(normalization, channels)(x)
+        return x
+
+    f1, f2, f3 = filters(64), filters(128), filters(256)
+    bottleneck = filters(256)
+
+    inputs = Input(input_size)
+    scaled = Rescaling(1.0 / 255)(inputs)
+
+    # Encoder
+    c1 = Conv2D(f1, 3, activation='relu', padding='same')(scaled)
+    c1 = block(c1, f1)
+    p1 = MaxPooling2D((2, 2))(c1)
+
+    c2 = block(block(p1, f2, normalize=False), f2)
+    p2 = MaxPooling2D((2, 2))(c2)
+
+    c3 = block(block(p2, f3, normalize=False), f3)
+    p3 = MaxPooling2D((2, 2))(c3)
+
+    # Bottleneck com menos canais
+    c4 = block(block(p3, bottleneck, normalize=False), bottleneck)
+    c4 = Dropout(0.3)(c4)
+
+    # Decoder
+    c5 = block(block(concatenate([UpSampling2D((2, 2))(c4), c3]), f3, normalize=False), f3)
+    c6 = block(block(concatenate([UpSampling2D((2, 2))(c5), c2]), f2, normalize=False), f2)
+    c7 = block(block(concatenate([UpSampling2D((2, 2))(c6), c1]), f1, normalize=False), f1, normalize=False)
+
+    # Saída sempre em float32, mesmo com política de precisão mista
+    outputs = Conv2D(1, 1, activation='sigmoid', dtype='float32')(c7)
+
+    return Model(inputs=[inputs], outputs=[outputs])
+
+
+def build_model(architecture='unet', input_size=(128, 128, 3), normalization='batch', width=LIGHT_WIDTH):
+    """Cria o modelo da arquitetura pedida (ARCHITECTURES); width só vale para a leve"""
+    if architecture == 'unet':
+        return unet_fast_otimizado(input_size, normalization)
+    if architecture == 'leve':
+        return unet_leve(input_size, normalization, width)
+    raise ValueError(f"Arquitetura inválida: {architecture}")
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação das execuções de treino e inferência
+
+RunReport mede o tempo de cada etapa (carregamento, treino, inferência,
+artefatos...) e as imagens por segundo, e grava tudo em um relatório
+JSON junto com a configuração e o ambiente da execução, para comparar
+execuções e achar regressões. EpochThroughput registra o tempo e as
+imagens por segundo de cada época do model.fit, e profiler_callback
+grava um trace do profiler do TensorBoard para uma faixa de passos.
+"""
+
+import json
+import os
+import platform
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+
+import tensorflow as tf
+
+# Versão do formato do relatório
+REPORT_VERSION = 1
+
+REPORT_NAME = 'relatorio_execucao.json'
+
+
+class RunReport:
+    """Tempos por etapa, vazão e configuração de uma execução"""
+
+    def __init__(self, path, config=None):
+        self.path = path
+        self.config = dict(config or {})
+        self.stages = {}
+        self.metrics = {}
+        self._started = {}
+        self.start_time = time.perf_counter()
+        self.created = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    def start(self, name):
+        """Começa a medir a etapa name"""
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name, images=None, **extra):
+        """Termina a etapa name; images é o número de imagens processadas nela"""
+        seconds = time.perf_counter() - self._started.pop(name)
+        stage = {'segundos': round(seconds, 4)}
+        if images is not None:
+            stage['imagens'] = int(images)
+            stage['imagens_por_s'] = round(images / seconds, 2) if seconds > 0 else None
+        stage.update(extra)
+        self.stages[name] = stage
+        return seconds
+
+    def environment(self):
+        return {
+            'host': socket.gethostname(),
+            'python': sys.version.split()[0],
+            'tensorflow': tf.__version__,
+            'plataforma': platform.platform(),
+            'nucleos': os.cpu_count(),
+            'gpus': len(tf.config.list_physical_devices('GPU'))
+        }
+
+    def save(self):
+        """Grava o relatório (pode ser chamado várias vezes; cada chamada sobrescreve)"""
+        report = {
+            'versao': REPORT_VERSION,
+            'inicio': self.created,
+            'total_segundos': round(time.perf_counter() - self.start_time, 4),
+            'etapas': self.stages,
+            'metricas': self.metrics,
+            'configuracao': self.config,
+            'ambiente': self.environment()
+        }
+        temp_name = self.path + '.tmp'
+        with open(temp_name, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2, ensure_ascii=False, default=str)
+        os.replace(temp_name, self.path)
+        return report
+
+
+class EpochThroughput(tf.keras.callbacks.Callback):
+    """Tempo e imagens por segundo de cada época de treino"""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+        self.batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self.start
+        images = self.batches * self.batch_size
+        self.epochs.append({
+            'epoca': epoch + 1,
+            'segundos': round(seconds, 4),
+            'imagens': images,
+            'imagens_por_s': round(images / seconds, 2) if seconds > 0 else None,
+            **{name: float(value) for name, value in (logs or {}).items()}
+        })
+
+
+def parse_step_range(text):
+    """"10,20" -> (10, 20); um número só perfila aquele passo"""
+    parts = [int(part) for part in text.split(',')]
+    if len(parts) == 1:
+        parts *= 2
+    if len(parts) != 2 or parts[0] < 1 or parts[1] < parts[0]:
+        raise ValueError(f"Faixa de passos inválida: {text}")
+    return tuple(parts)
+
+
+def profiler_callback(log_dir, steps):
+    """TensorBoard com trace do profiler nos passos steps (início, fim) da primeira época"""
+    return tf.keras.callbacks.TensorBoard(log_dir=log_dir, profile_batch=steps, histogram_freq=0)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Cache pré-processado do dataset em shards .npy mapeados em memória
+
+Os pares imagem/máscara são decodificados e redimensionados uma única vez,
+em vários processos, e gravados como shards uint8 (images_00000.npy e
+masks_00000.npy) com um manifest.json. O manifest guarda o caminho, a data
+de modificação e o tamanho de cada arquivo de origem: só os shards cujas
+origens mudaram são refeitos. Nas execuções seguintes os shards são
+abertos com np.load(mmap_mode='r'), sem cópia e sem decodificar nada.
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Pares por shard
+SHARD_SIZE = 512
+
+MANIFEST_NAME = 'manifest.json'
+
+# Versão do formato (mudanças no pré-processamento invalidam o cache)
+MANIFEST_VERSION = 1
+
+
+def file_signature(path):
+    """[caminho, data de modificação (ns), tamanho] de um arquivo"""
+    stat = os.stat(path)
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+def _worker_pool(workers):
+    """Pool de processos criado com fork
+
+    O script de treino roda no nível do módulo: com spawn cada processo
+    importaria o script de novo e recomeçaria o treino. Onde não há fork,
+    usa threads (o OpenCV libera o GIL ao decodificar e redimensionar).
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _preprocess_shard(job):
+    """Decodifica e redimensiona um shard (roda em um processo de trabalho)"""
+    size = tuple(job['size'])
+    images = []
+    masks = []
+    skipped = 0
+
+    for image_path, mask_path in job['pairs']:
+        img = cv2.imread(image_path)
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        if img is None or mask is None:
+            skipped += 1
+            continue
+
+        mask = cv2.resize(mask, size)
+        # Máscaras vazias são descartadas, como no carregamento original
+        if mask.max() == 0:
+            skipped += 1
+            continue
+
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        images.append(cv2.resize(img, size))
+        masks.append((mask > 0).astype(np.uint8)[..., np.newaxis])
+
+    images = np.stack(images) if images else np.empty((0, *size, 3), np.uint8)
+    masks = np.stack(masks) if masks else np.empty((0, *size, 1), np.uint8)
+
+    # Gravar em arquivo temporário e trocar: um shard interrompido nunca fica válido
+    for name, array in (('images', images), ('masks', masks)):
+        path = os.path.join(job['folder'], job[name])
+        np.save(path + '.tmp.npy', array)
+        os.replace(path + '.tmp.npy', path)
+
+    return len(images), skipped
+
+
+def build_shards(image_paths, mask_paths, folder, size=(128, 128), workers=None, shard_size=SHARD_SIZE):
+    """Cria ou atualiza os shards de folder; retorna o manifest"""
+    os.makedirs(folder, exist_ok=True)
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
+
+    old_shards = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            old = json.load(manifest_file)
+        if old.get('version') == MANIFEST_VERSION and old.get('size') == list(size):
+            old_shards = {shard['images']: shard for shard in old['shards']}
+
+    pairs = list(zip(image_paths, mask_paths))
+    shards = []
+    jobs = []
+    for index, start in enumerate(range(0, len(pairs), shard_size)):
+        chunk = pairs[start:start + shard_size]
+        sources = [file_signature(image) + file_signature(mask) for image, mask in chunk]
+        shard = {
+            'images': f'images_{index:05d}.npy',
+            'masks': f'masks_{index:05d}.npy',
+            'sources': sources
+        }
+
+        old_shard = old_shards.get(shard['images'])
+        if (old_shard is not None and old_shard['sources'] == sources
+                and os.path.exists(os.path.join(folder, shard['masks']))):
+            shard['count'] = old_shard['count']
+        else:
+            jobs.append((shard, {
+                'pairs': chunk,
+                'size': list(size),
+                'folder': folder,
+                'images': shard['images'],
+                'masks': shard['masks']
+            }))
+        shards.append(shard)
+
+    if jobs:
+        print(f"⚙️ Pré-processando {len(jobs)} de {len(shards)} shards em paralelo...")
+        with _worker_pool(workers or os.cpu_count()) as pool:
+            for (shard, _job), (count, skipped) in zip(jobs, pool.map(_preprocess_shard, [job for _shard, job in jobs])):
+                shard['count'] = count
+                if skipped:
+                    print(f"   ⚠️ {shard['images']}: {skipped} pares vazios ou ilegíveis ignorados")
+
+    # Remover shards que sobraram de um dataset maior
+    valid_files = {shard[name] for shard in shards for name in ('images', 'masks')}
+    for filename in os.listdir(folder):
+        if filename.endswith('.npy') and filename not in valid_files:
+            os.remove(os.path.join(folder, filename))
+
+    manifest = {'version': MANIFEST_VERSION, 'size': list(size), 'shards': shards}
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+class ShardedArray:
+    """Vários .npy mapeados em memória vistos como um único array
+
+    Aceita índice inteiro, fatia ou lista/array de índices; só os
+    elementos pedidos são lidos do disco.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = [array for array in arrays if len(array)]
+        self.offsets = np.cumsum([0] + [len(array) for array in self.arrays])
+        first = self.arrays[0] if self.arrays else np.empty((0,), np.uint8)
+        self.shape = (int(self.offsets[-1]), *first.shape[1:])
+        self.dtype = first.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            shard = int(np.searchsorted(self.offsets, key, side='right')) - 1
+            return self.arrays[shard][key - self.offsets[shard]]
+
+        indices = np.arange(len(self))[key] if isinstance(key, slice) else np.asarray(key)
+        result = np.empty((len(indices), *self.shape[1:]), self.dtype)
+        shards = np.searchsorted(self.offsets, indices, side='right') - 1
+        for shard in np.unique(shards):
+            selected = shards == shard
+            result[selected] = self.arrays[shard][indices[selected] - self.offsets[shard]]
+        return result
+
+
+def open_shards(folder):
+    """Abre os shards de folder sem cópia; retorna (imagens, máscaras) uint8"""
+    with open(os.path.join(folder, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+
+    images = []
+    masks = []
+    for shard in manifest['shards']:
+        if shard['count']:
+            images.append(np.load(os.path.join(folder, shard['images']), mmap_mode='r'))
+            masks.append(np.load(os.path.join(folder, shard['masks']), mmap_mode='r'))
+
+    if len(images) == 1:
+        return images[0], masks[0]
+    return ShardedArray(images), ShardedArray(masks)
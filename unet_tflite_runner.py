@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Inferência com o modelo TFLite, sem Keras
+
+Carrega só o interpretador TFLite (o pacote tflite_runtime, se estiver
+instalado, ou tf.lite do TensorFlow), então a inicialização leva uma
+fração do tempo de load_model do .h5. Funciona com os modelos float32,
+float16 e int8 gerados por unet_export.py.
+
+Uso:
+    python unet_tflite_runner.py modelo.tflite imagem1.png [imagem2.png ...] [--pasta saida] [--threshold 0.5]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:  # Sem o tflite_runtime: interpretador do TensorFlow
+    import tensorflow as tf
+
+    Interpreter = tf.lite.Interpreter
+
+
+class TFLiteMaskPredictor:
+    """Previsões de máscara com um modelo TFLite, em lotes de tamanho fixo"""
+
+    def __init__(self, model_path, batch_size=8, threads=None):
+        self.interpreter = Interpreter(model_path=model_path, num_threads=threads or os.cpu_count())
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = batch_size
+        self.interpreter.resize_tensor_input(self.input['index'], [batch_size, *self.input['shape'][1:]])
+        self.interpreter.allocate_tensors()
+
+    @property
+    def image_size(self):
+        return tuple(int(size) for size in self.input['shape'][1:3])
+
+    def quantize_input(self, batch):
+        """Converte o lote uint8 para o tipo de entrada do modelo"""
+        dtype = self.input['dtype']
+        if dtype == np.uint8 and self.input['quantization'][0] == 0:
+            return batch
+        if np.issubdtype(dtype, np.integer):
+            scale, zero_point = self.input['quantization']
+            info = np.iinfo(dtype)
+            return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+        return batch.astype(dtype)
+
+    def dequantize_output(self, output):
+        """Converte a saída do modelo para probabilidades float32"""
+        if np.issubdtype(output.dtype, np.integer):
+            scale, zero_point = self.output['quantization']
+            return (output.astype(np.float32) - zero_point) * scale
+        return output.astype(np.float32)
+
+    def predict(self, images):
+        """Previsões para images (N, altura, largura, 3) uint8; retorna (N, altura, largura, 1) float32"""
+        count = len(images)
+        predictions = np.empty((count, *self.output['shape'][1:]), np.float32)
+        for start in range(0, count, self.batch_size):
+            batch = np.asarray(images[start:start + self.batch_size])
+            size = len(batch)
+            if size < self.batch_size:
+                batch = np.concatenate([batch, np.zeros((self.batch_size - size, *batch.shape[1:]), batch.dtype)])
+
+            self.interpreter.set_tensor(self.input['index'], self.quantize_input(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output['index'])
+            predictions[start:start + size] = self.dequantize_output(output[:size])
+        return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Máscaras de estrada com o modelo TFLite")
+    parser.add_argument('modelo', help="modelo .tflite")
+    parser.add_argument('imagens', nargs='+', help="imagens RGB")
+    parser.add_argument('--pasta', default='.', help="pasta das máscaras geradas")
+    parser.add_argument('--threshold', type=float, default=0.5, help="limiar da probabilidade")
+    parser.add_argument('--lote', type=int, default=8, help="imagens por lote")
+    args = parser.parse_args()
+
+    import cv2
+
+    predictor = TFLiteMaskPredictor(args.modelo, batch_size=args.lote)
+    height, width = predictor.image_size
+    images = np.stack([
+        cv2.resize(cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB), (width, height))
+        for path in args.imagens
+    ])
+
+    os.makedirs(args.pasta, exist_ok=True)
+    for path, prediction in zip(args.imagens, predictor.predict(images)):
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        mask = (prediction.squeeze() > args.threshold).astype(np.uint8) * 255
+        cv2.imwrite(os.path.join(args.pasta, base_name + '_mask.png'), mask)
+    print(f"✅ {len(images)} máscaras gravadas em {args.pasta}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Inferência da U-Net em ortofotos grandes, por janelas sobrepostas
+
+O raster é percorrido em faixas horizontais da altura de um bloco (128
+pixels). Cada faixa é cortada em blocos 128x128 que se sobrepõem, as
+previsões saem em lotes (predict_masks) e são somadas com pesos que caem
+em rampa nas bordas do bloco, o que suaviza as emendas. Assim que uma
+faixa não recebe mais contribuições, as suas linhas são gravadas na saída.
+
+A memória fica limitada a algumas faixas, qualquer que seja o tamanho do
+raster: a leitura da próxima faixa e a gravação da anterior rodam em
+threads enquanto o TensorFlow usa todos os núcleos nas convoluções.
+
+Entradas: GeoTIFF (ou outro formato do GDAL, com a georreferência copiada
+para a saída) ou .npy (altura, largura, 3) em uint8, lido mapeado em
+memória. Saídas: GeoTIFF ou .npy com a probabilidade de estrada.
+
+Uso:
+    python unet_tiling.py modelo_fast2.h5 ortofoto.tif probabilidade.tif [--sobreposicao 32] [--lote 32]
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from unet_inference import PREDICT_BATCH_SIZE, predict_masks
+
+try:
+    from osgeo import gdal
+except ImportError:  # Sem GDAL: só arrays .npy
+    gdal = None
+
+# Lado dos blocos vistos pelo modelo
+TILE_SIZE = 128
+
+# Pixels de sobreposição entre blocos vizinhos
+TILE_OVERLAP = 32
+
+# Tipos de saída: probabilidade 0-255 (uint8) ou 0-1 (float32)
+OUTPUT_TYPES = ["uint8", "float32"]
+
+
+def tile_origins(length, tile=TILE_SIZE, stride=TILE_SIZE - TILE_OVERLAP):
+    """Início de cada bloco ao longo de um eixo (o último encosta no fim)"""
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, stride))
+    origins.append(length - tile)
+    return origins
+
+
+def blend_weights(tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Pesos do bloco: 1 no centro e rampa linear na faixa de sobreposição"""
+    ramp = np.minimum(np.arange(tile) + 1, np.arange(tile, 0, -1)).astype(np.float32)
+    ramp = np.minimum(ramp / (overlap + 1), 1.0)
+    return np.outer(ramp, ramp)
+
+
+class NpyRaster:
+    """Raster RGB uint8 em .npy, lido mapeado em memória"""
+
+    def __init__(self, path):
+        self.array = np.load(path, mmap_mode='r')
+        if self.array.ndim != 3 or self.array.shape[2] < 3:
+            raise ValueError(f"Esperado array (altura, largura, 3): {path}")
+        self.height, self.width = self.array.shape[:2]
+        self.georeference = None
+
+    def read_rows(self, y, height):
+        return np.asarray(self.array[y:y + height, :, :3], np.uint8)
+
+
+class GDALRaster:
+    """Raster lido pelo GDAL faixa a faixa (três primeiras bandas como RGB)"""
+
+    def __init__(self, path):
+        self.dataset = gdal.Open(path)
+        if self.dataset is None:
+            raise ValueError(f"Não foi possível abrir o raster: {path}")
+        if self.dataset.RasterCount < 3:
+            raise ValueError(f"O raster precisa de 3 bandas (RGB): {path}")
+        self.height = self.dataset.RasterYSize
+        self.width = self.dataset.RasterXSize
+        self.georeference = (self.dataset.GetGeoTransform(), self.dataset.GetProjection())
+
+    def read_rows(self, y, height):
+        bands = [
+            self.dataset.GetRasterBand(band).ReadAsArray(0, y, self.width, height)
+            for band in (1, 2, 3)
+        ]
+        rows = np.stack(bands, axis=-1)
+        if rows.dtype != np.uint8:
+            rows = np.clip(rows, 0, 255).astype(np.uint8)
+        return rows
+
+
+class NpyMaskWriter:
+    """Grava a máscara de probabilidade em um .npy, linha a linha"""
+
+    def __init__(self, path, height, width, dtype, georeference=None):
+        self.array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(height, width))
+
+    def write_rows(self, y, rows):
+        self.array[y:y + len(rows)] = rows
+
+    def close(self):
+        self.array.flush()
+        del self.array
+
+
+class GDALMaskWriter:
+    """Grava a máscara de probabilidade em um GeoTIFF, linha a linha"""
+
+    def __init__(self, path, height, width, dtype, georeference=None):
+        data_type = gdal.GDT_Byte if dtype == 'uint8' else gdal.GDT_Float32
+        options = ['COMPRESS=DEFLATE', 'TILED=YES', 'BIGTIFF=IF_SAFER']
+        self.dataset = gdal.GetDriverByName('GTiff').Create(path, width, height, 1, data_type, options)
+        if self.dataset is None:
+            raise ValueError(f"Não foi possível criar o raster: {path}")
+        if georeference is not None:
+            self.dataset.SetGeoTransform(georeference[0])
+            self.dataset.SetProjection(georeference[1])
+        self.band = self.dataset.GetRasterBand(1)
+
+    def write_rows(self, y, rows):
+        self.band.WriteArray(rows, 0, y)
+
+    def close(self):
+        self.band.FlushCache()
+        self.band = None
+        self.dataset = None
+
+
+def open_raster(path):
+    """Leitor do raster de entrada, conforme a extensão"""
+    if path.lower().endswith('.npy'):
+        return NpyRaster(path)
+    if gdal is None:
+        raise ValueError("Sem o GDAL (osgeo) só é possível ler arrays .npy")
+    return GDALRaster(path)
+
+
+def create_mask_writer(path, height, width, dtype, georeference=None):
+    """Gravador da máscara de saída, conforme a extensão"""
+    if path.lower().endswith('.npy'):
+        return NpyMaskWriter(path, height, width, dtype)
+    if gdal is None:
+        raise ValueError("Sem o GDAL (osgeo) só é possível gravar arrays .npy")
+    return GDALMaskWriter(path, height, width, dtype, georeference)
+
+
+def predict_raster(model, input_path, output_path, overlap=TILE_OVERLAP, batch_size=PREDICT_BATCH_SIZE,
+                   output_type='uint8', tile=TILE_SIZE, progress=None):
+    """Gera a máscara de probabilidade de estrada de um raster inteiro
+
+    progress: função opcional chamada com a porcentagem concluída.
+    """
+    if output_type not in OUTPUT_TYPES:
+        raise ValueError(f"Tipo de saída inválido: {output_type}")
+    if not 0 <= overlap < tile:
+        raise ValueError(f"A sobreposição deve ficar entre 0 e {tile - 1} pixels")
+
+    raster = open_raster(input_path)
+    height, width = raster.height, raster.width
+    stride = tile - overlap
+    ys = tile_origins(height, tile, stride)
+    xs = tile_origins(width, tile, stride)
+    weights = blend_weights(tile, overlap)
+
+    # Acumuladores de uma faixa: soma ponderada das previsões e soma dos pesos
+    padded_width = max(width, tile)
+    accumulated = np.zeros((tile, padded_width), np.float32)
+    weight_sum = np.zeros((tile, padded_width), np.float32)
+
+    def read_strip(y):
+        rows = raster.read_rows(y, min(tile, height - y))
+        if rows.shape[0] < tile or rows.shape[1] < tile:
+            # Raster menor que um bloco: completar com zeros
+            rows = np.pad(rows, ((0, tile - rows.shape[0]), (0, padded_width - rows.shape[1]), (0, 0)))
+        return rows
+
+    def finished_rows(count):
+        rows = accumulated[:count, :width] / np.maximum(weight_sum[:count, :width], 1e-6)
+        if output_type == 'uint8':
+            rows = np.round(rows * 255).astype(np.uint8)
+        return rows
+
+    writer = create_mask_writer(output_path, height, width, output_type, raster.georeference)
+    # Uma thread de leitura e uma de gravação: mantêm a ordem e sobrepõem E/S e inferência
+    with ThreadPoolExecutor(max_workers=1) as reader, ThreadPoolExecutor(max_workers=1) as saver:
+        try:
+            next_strip = reader.submit(read_strip, ys[0])
+            writes = []
+            for index, y in enumerate(ys):
+                strip = next_strip.result()
+                if index + 1 < len(ys):
+                    next_strip = reader.submit(read_strip, ys[index + 1])
+
+                tiles = np.stack([strip[:, x:x + tile] for x in xs])
+                predictions = predict_masks(model, tiles, batch_size)[..., 0]
+                for x, prediction in zip(xs, predictions):
+                    accumulated[:, x:x + tile] += prediction * weights
+                    weight_sum[:, x:x + tile] += weights
+
+                # Linhas acima da próxima faixa não recebem mais contribuições
+                done = (ys[index + 1] if index + 1 < len(ys) else height) - y
+                writes.append(saver.submit(writer.write_rows, y, finished_rows(done)))
+                accumulated[:-done] = accumulated[done:]
+                accumulated[-done:] = 0
+                weight_sum[:-done] = weight_sum[done:]
+                weight_sum[-done:] = 0
+
+                # Não deixar gravações pendentes acumularem memória
+                while len(writes) > 2:
+                    writes.pop(0).result()
+
+                if progress is not None:
+                    progress(100.0 * (index + 1) / len(ys))
+
+            for write in writes:
+                write.result()
+        finally:
+            saver.submit(writer.close).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Máscara de estradas de uma ortofoto inteira com a U-Net")
+    parser.add_argument('modelo', help="modelo treinado (.h5)")
+    parser.add_argument('entrada', help="raster RGB (GeoTIFF ou .npy)")
+    parser.add_argument('saida', help="máscara de probabilidade (GeoTIFF ou .npy)")
+    parser.add_argument('--sobreposicao', type=int, default=TILE_OVERLAP, help="pixels de sobreposição entre blocos")
+    parser.add_argument('--lote', type=int, default=PREDICT_BATCH_SIZE, help="blocos por lote na inferência")
+    parser.add_argument('--tipo', choices=OUTPUT_TYPES, default='uint8',
+                        help="uint8: probabilidade 0-255; float32: probabilidade 0-1")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.modelo, compile=False)
+    print(f"🗺️ {os.path.basename(args.entrada)} → {args.saida}")
+    predict_raster(
+        model, args.entrada, args.saida,
+        overlap=args.sobreposicao,
+        batch_size=args.lote,
+        output_type=args.tipo,
+        progress=lambda percent: print(f"\r   {percent:5.1f}%", end="", flush=True)
+    )
+    print("\n✅ Máscara gravada")
+
+
+if __name__ == "__main__":
+    main()
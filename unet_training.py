@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração do treino da U-Net
+
+compile_model aplica o otimizador, a perda e as métricas usados no
+treino. O modo rápido (opcional) liga a compilação XLA (jit_compile) e,
+onde o hardware tem suporte nativo a bfloat16, a política de precisão
+mista mixed_bfloat16: as convoluções rodam em bfloat16 e os pesos e a
+camada de saída ficam em float32.
+
+Para lotes efetivos grandes com pouca memória, AccumulatingModel soma os
+gradientes de vários micro-lotes e só então aplica o otimizador. Com
+micro-lotes pequenos a BatchNormalization estima mal as estatísticas:
+normalization_for_batch troca por GroupNormalization nesse caso.
+
+TrainingCheckpoint grava pesos, estado do otimizador e época a cada N
+épocas; restore_checkpoint retoma do último checkpoint.
+"""
+
+import tensorflow as tf
+
+# Taxa de aprendizado do Adam
+LEARNING_RATE = 0.0001
+
+# Lote do treino original (uma imagem por passo)
+BASE_BATCH_SIZE = 1
+
+# Menor micro-lote em que a BatchNormalization ainda estima bem média e variância
+MIN_BATCHNORM_BATCH = 8
+
+# Checkpoints mantidos na pasta (os mais antigos são apagados)
+CHECKPOINTS_TO_KEEP = 3
+
+# Instruções de CPU com bfloat16 nativo (sem elas a conversão deixa o treino mais lento)
+BFLOAT16_CPU_FLAGS = {"avx512_bf16", "amx_bf16"}
+
+
+def cpu_supports_bfloat16():
+    """Indica se a CPU tem instruções bfloat16 (lê /proc/cpuinfo; False fora do Linux)"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("flags"):
+                    return bool(BFLOAT16_CPU_FLAGS & set(line.split(":", 1)[1].split()))
+    except OSError:
+        pass
+    return False
+
+
+def gpu_supports_bfloat16():
+    """Indica se todas as GPUs visíveis têm bfloat16 nativo (compute capability 8.0+)"""
+    gpus = tf.config.list_physical_devices("GPU")
+    if not gpus:
+        return False
+    for gpu in gpus:
+        capability = tf.config.experimental.get_device_details(gpu).get("compute_capability")
+        if capability is None or capability < (8, 0):
+            return False
+    return True
+
+
+def configure_precision(fast=False):
+    """Define a política global de precisão; retorna o nome da política
+
+    Precisa ser chamada antes de criar o modelo. No modo rápido usa
+    mixed_bfloat16 só se o hardware suportar; senão fica em float32.
+    """
+    supported = gpu_supports_bfloat16() if tf.config.list_physical_devices("GPU") else cpu_supports_bfloat16()
+    policy = "mixed_bfloat16" if fast and supported else "float32"
+    tf.keras.mixed_precision.set_global_policy(policy)
+    return policy
+
+
+def normalization_for_batch(batch_size, accumulation_steps=1):
+    """Normalização adequada ao micro-lote ("batch" ou "group")
+
+    Sem acumulação o comportamento original (BatchNormalization) é
+    mantido; com acumulação e micro-lotes menores que MIN_BATCHNORM_BATCH,
+    usa GroupNormalization, que não depende das estatísticas do lote.
+    """
+    if accumulation_steps > 1 and batch_size < MIN_BATCHNORM_BATCH:
+        return 'group'
+    return 'batch'
+
+
+def scaled_learning_rate(effective_batch_size, learning_rate=LEARNING_RATE):
+    """Taxa de aprendizado para um lote efetivo maior que o original
+
+    Regra da raiz quadrada (adequada ao Adam): o ruído do gradiente cai
+    com a raiz do lote, então a taxa cresce na mesma proporção.
+    """
+    return learning_rate * (effective_batch_size / BASE_BATCH_SIZE) ** 0.5
+
+
+class AccumulatingModel(tf.keras.Model):
+    """Modelo que aplica o otimizador a cada accumulation_steps micro-lotes
+
+    Criado a partir de um modelo funcional (mesmas camadas e pesos). Os
+    gradientes dos micro-lotes são somados (divididos pelo número de
+    passos, como a média de um lote grande) e aplicados de uma vez.
+    """
+
+    def __init__(self, inputs, outputs, accumulation_steps=1, **kwargs):
+        super().__init__(inputs=inputs, outputs=outputs, **kwargs)
+        self.accumulation_steps = accumulation_steps
+        self.micro_step = tf.Variable(0, trainable=False, dtype=tf.int64, name='micro_step')
+        self.accumulated_gradients = [
+            tf.Variable(tf.zeros_like(variable), trainable=False, name='accumulated_gradient')
+            for variable in self.trainable_variables
+        ]
+
+    @classmethod
+    def from_model(cls, model, accumulation_steps):
+        return cls(model.inputs, model.outputs, accumulation_steps=accumulation_steps)
+
+    def train_step(self, data):
+        x, y, sample_weight = tf.keras.utils.unpack_x_y_sample_weight(data)
+        with tf.GradientTape() as tape:
+            y_pred = self(x, training=True)
+            loss = self.compute_loss(x, y, y_pred, sample_weight)
+        gradients = tape.gradient(loss, self.trainable_variables)
+
+        for accumulated, gradient in zip(self.accumulated_gradients, gradients):
+            accumulated.assign_add(tf.cast(gradient, accumulated.dtype) / self.accumulation_steps)
+        self.micro_step.assign_add(1)
+
+        # Variáveis do otimizador criadas fora do tf.cond (só no primeiro traço)
+        if not getattr(self.optimizer, 'built', getattr(self.optimizer, '_built', True)):
+            self.optimizer.build(self.trainable_variables)
+
+        def apply_gradients():
+            self.optimizer.apply_gradients(zip(
+                [accumulated.read_value() for accumulated in self.accumulated_gradients],
+                self.trainable_variables
+            ))
+            for accumulated in self.accumulated_gradients:
+                accumulated.assign(tf.zeros_like(accumulated))
+            return tf.constant(True)
+
+        tf.cond(self.micro_step % self.accumulation_steps == 0, apply_gradients, lambda: tf.constant(False))
+        return self.compute_metrics(x, y, y_pred, sample_weight)
+
+
+def inference_model(model):
+    """Modelo funcional comum com as mesmas camadas (para salvar e exportar)"""
+    if isinstance(model, AccumulatingModel):
+        return tf.keras.Model(model.inputs, model.outputs)
+    return model
+
+
+def compile_model(model, fast=False, learning_rate=LEARNING_RATE):
+    """Compila o modelo com a configuração do treino (fast: compilação XLA)"""
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='binary_crossentropy',
+        metrics=['accuracy', 'precision', 'recall'],
+        jit_compile=fast
+    )
+    return model
+
+
+def training_checkpoint(model):
+    """tf.train.Checkpoint com o modelo, o otimizador e a última época concluída"""
+    return tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=tf.Variable(0, dtype=tf.int64))
+
+
+class TrainingCheckpoint(tf.keras.callbacks.Callback):
+    """Grava um checkpoint a cada every épocas (pesos, otimizador e época)"""
+
+    def __init__(self, folder, every=1, keep=CHECKPOINTS_TO_KEEP):
+        super().__init__()
+        self.folder = folder
+        self.every = every
+        self.keep = keep
+        self.checkpoint = None
+        self.manager = None
+
+    def on_train_begin(self, logs=None):
+        self.checkpoint = training_checkpoint(self.model)
+        self.manager = tf.train.CheckpointManager(self.checkpoint, self.folder, max_to_keep=self.keep)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every == 0:
+            self.checkpoint.epoch.assign(epoch + 1)
+            self.manager.save(checkpoint_number=epoch + 1)
+
+
+def restore_checkpoint(model, folder):
+    """Carrega o último checkpoint de folder no modelo já compilado
+
+    Retorna a época em que o treino deve continuar (0 se não houver
+    checkpoint). O estado do otimizador é restaurado quando as suas
+    variáveis forem criadas, no primeiro passo de treino.
+    """
+    latest = tf.train.latest_checkpoint(folder)
+    if latest is None:
+        return 0
+    checkpoint = training_checkpoint(model)
+    checkpoint.restore(latest).expect_partial()
+    return int(checkpoint.epoch.numpy())